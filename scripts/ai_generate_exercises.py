@@ -13,13 +13,6 @@ import json
 import argparse
 from pathlib import Path
 
-try:
-    import openai
-except ImportError:
-    print("❌ Le module openai n'est pas installé.")
-    print("📦 Installez-le avec: pip install openai")
-    sys.exit(1)
-
 try:
     from dotenv import load_dotenv
 except ImportError:
@@ -27,6 +20,9 @@ except ImportError:
     print("📦 Installez-le avec: pip install python-dotenv")
     load_dotenv = lambda: None
 
+from generation_scheduler import (DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, DEFAULT_REQUESTS_PER_MINUTE,
+                                  Checkpoint, GenerationScheduler, StubChatClient)
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -79,68 +75,81 @@ Format : [{{"id": "...", "type": "...", ...}}, {{"id": "...", ...}}]
     return prompt
 
 
-def generate_exercises_with_openai(prompt, count):
-    """Appeler l'API OpenAI pour générer les exercices"""
+def create_openai_client():
+    """Client OpenAI (module openai et OPENAI_API_KEY requis)"""
+    try:
+        import openai
+    except ImportError:
+        print("❌ Le module openai n'est pas installé.")
+        print("📦 Installez-le avec: pip install openai")
+        sys.exit(1)
     
     if not OPENAI_API_KEY:
         print("❌ OPENAI_API_KEY non configurée dans .env")
         print("💡 Ajoutez votre clé API OpenAI dans le fichier .env")
         sys.exit(1)
     
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
+    return openai.OpenAI(api_key=OPENAI_API_KEY)
+
+
+def generate_exercises_with_openai(client, template, count, chapter_title, grade, difficulty, exercise_type,
+                                   batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                                   requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, checkpoint_file=None):
+    """
+    Générer `count` exercices en requêtes de batch_size exercices envoyées en
+    parallèle (voir generation_scheduler), sans quasi-doublons.
     
-    print(f"🤖 Appel de l'API OpenAI (modèle: gpt-4)...")
-    print(f"📝 Génération de {count} exercices en cours...\n")
+    Les réponses reçues sont conservées dans checkpoint_file: une génération
+    interrompue reprend là où elle s'était arrêtée. Le fichier n'est pas
+    supprimé ici: l'appelant le retire une fois les exercices sauvegardés.
+    """
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "Tu es un expert en pédagogie mathématique pour collégiens français. Tu génères des exercices au format JSON strict."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            temperature=0.8,
-            max_tokens=4000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Nettoyer la réponse (retirer les balises markdown si présentes)
-        if content.startswith('```json'):
-            content = content[7:]
-        elif content.startswith('```'):
-            content = content[3:]
-        
-        if content.endswith('```'):
-            content = content[:-3]
-        
-        content = content.strip()
-        
-        # Parser le JSON
-        exercises = json.loads(content)
-        
-        # Vérifier que c'est bien un tableau
-        if not isinstance(exercises, list):
-            print("⚠️  La réponse n'est pas un tableau JSON, tentative d'encapsulation...")
-            exercises = [exercises]
-        
-        print(f"✅ {len(exercises)} exercices générés avec succès\n")
-        
-        return exercises
-        
-    except json.JSONDecodeError as e:
-        print(f"❌ Erreur de parsing JSON: {e}")
-        print(f"Réponse reçue:\n{content}")
-        return None
-    except Exception as e:
-        print(f"❌ Erreur lors de l'appel à OpenAI: {e}")
-        return None
+    def make_prompt(size, index):
+        prompt = build_prompt(template, size, chapter_title, grade, difficulty, exercise_type)
+        if index:
+            prompt += f"Série n°{index + 1} : varie les contextes et les nombres par rapport aux séries précédentes.\n"
+        return prompt
+    
+    scheduler = GenerationScheduler(
+        client,
+        make_prompt,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        requests_per_minute=requests_per_minute
+    )
+    checkpoint = None
+    if checkpoint_file:
+        checkpoint = Checkpoint(checkpoint_file, {
+            'chapter': chapter_title,
+            'grade': grade,
+            'difficulty': difficulty,
+            'type': exercise_type,
+            'model': scheduler.model,
+        })
+    
+    requests = -(-count // scheduler.batch_size)
+    print(f"🤖 Appel de l'API OpenAI (modèle: {scheduler.model})...")
+    print(f"📝 Génération de {count} exercices en cours "
+          f"({requests} requête(s) de {scheduler.batch_size}, {scheduler.concurrency} en parallèle)...\n")
+    
+    def on_response(request, received, total):
+        print(f"   ✅ Requête {request + 1}: {received} exercices ({total} reçus)")
+    
+    exercises = scheduler.run(count, checkpoint, on_response)
+    
+    report = scheduler.report
+    if report['resumed']:
+        print(f"♻️  {report['resumed']} réponse(s) reprise(s) depuis {checkpoint_file}")
+    if report['duplicates']:
+        print(f"🔁 {report['duplicates']} doublon(s) écarté(s)")
+    if report['failed']:
+        print(f"⚠️  {report['failed']} requête(s) en échec après {scheduler.max_retries} nouvelles tentatives")
+    if len(exercises) < count:
+        print(f"⚠️  Seulement {len(exercises)} exercices distincts sur {count} demandés")
+    
+    print(f"✅ {len(exercises)} exercices générés avec succès\n")
+    
+    return exercises
 
 
 def save_exercises(exercises, output_file):
@@ -198,6 +207,12 @@ Exemples d'utilisation:
 
   # Générer 15 exercices moyens sur la géométrie
   python scripts/ai_generate_exercises.py --chapter "Géométrie" --grade "4ème" --difficulty "moyen" --type "qcm" --count 15
+
+  # Générer 200 exercices en requêtes de 10, 8 en parallèle (reprise automatique après interruption)
+  python scripts/ai_generate_exercises.py --chapter "Les fractions" --grade "6ème" --difficulty "facile" --type "qcm" --count 200 --concurrency 8
+
+  # Essai hors ligne avec un faux client (sans clé API)
+  python scripts/ai_generate_exercises.py --chapter "Les fractions" --grade "6ème" --difficulty "facile" --type "calcul" --count 50 --stub
         """
     )
     
@@ -246,6 +261,39 @@ Exemples d'utilisation:
         help=f'Fichier de sortie (défaut: {OUTPUT_FILE})'
     )
     
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f'Exercices demandés par requête (défaut: {DEFAULT_BATCH_SIZE})'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Requêtes simultanées (défaut: {DEFAULT_CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--rpm',
+        type=float,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help=f'Requêtes par minute au maximum, 0 pour ne pas limiter (défaut: {DEFAULT_REQUESTS_PER_MINUTE})'
+    )
+    
+    parser.add_argument(
+        '--checkpoint',
+        type=str,
+        help='Fichier de reprise (défaut: <sortie>.checkpoint.jsonl)'
+    )
+    
+    parser.add_argument(
+        '--stub',
+        action='store_true',
+        help='Utiliser un faux client local au lieu de l\'API OpenAI (essais)'
+    )
+    
     args = parser.parse_args()
     
     # Afficher les paramètres
@@ -259,24 +307,29 @@ Exemples d'utilisation:
     print(f"🔢 Nombre: {args.count}")
     print(f"💾 Sortie: {args.output}\n")
     
+    checkpoint_file = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+    
     # Charger le template de prompt
     print("📖 Chargement du template de prompt...")
     template = load_prompt_template()
     print(f"✅ Template chargé depuis {PROMPTS_FILE}\n")
     
-    # Construire le prompt
-    prompt = build_prompt(
+    # Générer les exercices avec OpenAI
+    client = StubChatClient() if args.stub else create_openai_client()
+    exercises = generate_exercises_with_openai(
+        client,
         template,
         args.count,
         args.chapter,
         args.grade,
         args.difficulty,
-        args.type
+        args.type,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        checkpoint_file=checkpoint_file
     )
     
-    # Générer les exercices avec OpenAI
-    exercises = generate_exercises_with_openai(prompt, args.count)
-    
     if not exercises:
         print("❌ Échec de la génération des exercices")
         sys.exit(1)
@@ -289,6 +342,10 @@ Exemples d'utilisation:
         print(f"\n✅ Fichier JSON créé avec succès!")
         print(f"📁 Chemin: {os.path.abspath(args.output)}")
         
+        # La génération complète est sauvegardée: la reprise n'a plus lieu d'être
+        if len(exercises) >= args.count and os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        
         # Afficher les prochaines étapes
         print("\n" + "="*60)
         print("📝 PROCHAINES ÉTAPES")
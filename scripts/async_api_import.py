@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Import asynchrone des exercices via l'API Node de Mathia (POST /api/exercises)
+
+L'API ne crée qu'un exercice par requête: au lieu d'attendre chaque réponse
+avant d'envoyer la suivante, les requêtes partent depuis une boucle asyncio,
+au plus `concurrency` à la fois (sémaphore), sur des connexions HTTP
+keep-alive réutilisées (aiohttp.TCPConnector). Un compteur affiche en
+continu le débit (requêtes/s) et les latences p50/p95.
+
+Usage:
+    python scripts/async_api_import.py --benchmark
+    python scripts/async_api_import.py --benchmark --requests 1696 --latency 0.02 --concurrency 32
+"""
+
+import sys
+import time
+import asyncio
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 30
+REPORT_INTERVAL = 2.0
+
+
+class RequestResult(NamedTuple):
+    """Réponse à une requête (status None si elle n'a pas abouti)"""
+    index: int
+    status: Optional[int]
+    error: str
+    elapsed: float
+
+
+def _percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Percentile par rang le plus proche sur une liste triée"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class ThroughputMeter:
+    """Débit et latences des requêtes terminées"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.start = time.perf_counter()
+
+    def record(self, result: RequestResult):
+        self.latencies.append(result.elapsed)
+        if result.status != 201:
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        """{'done', 'errors', 'elapsed', 'rate', 'p50', 'p95'} (latences en secondes)"""
+        elapsed = time.perf_counter() - self.start
+        ordered = sorted(self.latencies)
+        return {
+            'done': len(ordered),
+            'errors': self.errors,
+            'elapsed': elapsed,
+            'rate': len(ordered) / elapsed if elapsed else 0.0,
+            'p50': _percentile(ordered, 0.50),
+            'p95': _percentile(ordered, 0.95),
+        }
+
+    def format(self) -> str:
+        stats = self.snapshot()
+        return (f"[{stats['elapsed']:6.1f}s] {stats['done']}/{self.total} requetes, "
+                f"{stats['rate']:.0f} req/s, p50 {stats['p50'] * 1000:.0f} ms, "
+                f"p95 {stats['p95'] * 1000:.0f} ms, {stats['errors']} erreurs")
+
+
+def _import_aiohttp():
+    """Import paresseux: seul le mode asynchrone a besoin d'aiohttp"""
+    try:
+        import aiohttp
+    except ImportError:
+        print("Erreur: Le module aiohttp n'est pas installe.")
+        print("Installez-le avec: pip install aiohttp")
+        sys.exit(1)
+    return aiohttp
+
+
+async def _post_all(url: str, payloads: Sequence[Dict[str, Any]], concurrency: int,
+                    timeout: float, meter: ThroughputMeter,
+                    report_interval: float) -> List[RequestResult]:
+    aiohttp = _import_aiohttp()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # Autant de connexions keep-alive que de requêtes simultanées
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def post_one(session, index: int, payload: Dict[str, Any]) -> RequestResult:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=payload) as response:
+                    await response.read()
+                    status, error = response.status, ''
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, error = None, str(e) or type(e).__name__
+            result = RequestResult(index, status, error, time.perf_counter() - start)
+            meter.record(result)
+            return result
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(report_interval)
+            print(meter.format())
+
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        reporter = asyncio.ensure_future(report_progress()) if report_interval > 0 else None
+        try:
+            return await asyncio.gather(*(post_one(session, index, payload)
+                                          for index, payload in enumerate(payloads)))
+        finally:
+            if reporter:
+                reporter.cancel()
+
+
+def post_concurrently(url: str, payloads: Sequence[Dict[str, Any]],
+                      concurrency: int = DEFAULT_CONCURRENCY,
+                      timeout: float = DEFAULT_TIMEOUT,
+                      report_interval: float = REPORT_INTERVAL) -> Dict[str, Any]:
+    """
+    POST de chaque payload sur url, au plus `concurrency` requêtes en vol.
+
+    Retourne {'results': [RequestResult dans l'ordre des payloads],
+    'imported', 'errors', 'elapsed', 'rate', 'p50', 'p95'}.
+    """
+    meter = ThroughputMeter(len(payloads))
+    results = asyncio.run(_post_all(url, payloads, max(1, concurrency), timeout, meter, report_interval))
+
+    stats = meter.snapshot()
+    return {
+        'results': results,
+        'imported': stats['done'] - stats['errors'],
+        'errors': stats['errors'],
+        'elapsed': stats['elapsed'],
+        'rate': stats['rate'],
+        'p50': stats['p50'],
+        'p95': stats['p95'],
+    }
+
+
+def print_errors(report: Dict[str, Any], max_errors: int = 5):
+    """Afficher les premières requêtes en échec"""
+    failed = [result for result in report['results'] if result.status != 201]
+    for result in failed[:max_errors]:
+        detail = f"HTTP {result.status}" if result.status is not None else result.error
+        print(f"Erreur exercice {result.index + 1}: {detail}")
+
+
+def format_rate(report: Dict[str, Any]) -> str:
+    """Débit et latences de l'import, sur une ligne"""
+    return (f"{report['rate']:.0f} requetes/s en {report['elapsed']:.1f}s "
+            f"(p50 {report['p50'] * 1000:.0f} ms, p95 {report['p95'] * 1000:.0f} ms)")
+
+
+def run_benchmark(requests_count: int = 400, latency: float = 0.02, concurrency: int = DEFAULT_CONCURRENCY):
+    """Comparer l'envoi séquentiel (une requête à la fois) et l'envoi asynchrone"""
+    from rest_client import start_stub_server
+
+    server, base_url = start_stub_server(latency)
+    url = f"{base_url}/api/exercises"
+    payloads = [{'courseId': 1, 'type': 'libre', 'body': f'Exercice {i}', 'answer': str(i)}
+                for i in range(requests_count)]
+    print(f"Fausse API sur {url}: {requests_count} requetes, latence {latency * 1000:.0f} ms")
+
+    try:
+        for label, workers in (('Sequentiel', 1), (f'Asynchrone, {concurrency} en vol', concurrency)):
+            report = post_concurrently(url, payloads, workers, report_interval=0)
+            print(f"   {label + ':':<26} {report['elapsed']:.2f}s, {report['rate']:6.0f} req/s, "
+                  f"p50 {report['p50'] * 1000:.0f} ms, p95 {report['p95'] * 1000:.0f} ms, "
+                  f"{report['errors']} erreurs")
+    finally:
+        server.shutdown()
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import asynchrone via l\'API Mathia')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Mesurer le debit contre une fausse API locale')
+    parser.add_argument('--requests', type=int, default=400,
+                       help='Nombre de requetes envoyees')
+    parser.add_argument('--latency', type=float, default=0.02,
+                       help='Temps de reponse simule du serveur, en secondes')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help='Nombre de requetes simultanees')
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    run_benchmark(args.requests, args.latency, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
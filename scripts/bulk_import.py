@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Insertion en masse des exercices dans PostgreSQL pour les scripts d'import
+
+Deux modes remplacent l'aller-retour INSERT ... RETURNING par exercice:
+  - copy:  COPY exercises (...) FROM STDIN, lignes envoyées en flux (JSON en ligne)
+  - batch: INSERT ... VALUES multi-lignes via psycopg2.extras.execute_values
+
+Chaque paquet est protégé par un SAVEPOINT: si le paquet échoue, il est rejoué
+ligne par ligne pour isoler les exercices fautifs, qui sont signalés un par un
+comme avec l'import ligne à ligne.
+
+Chaque ligne porte une empreinte normalisée (content_hash: énoncé, réponse,
+type, cours) indexée en UNIQUE: avec on_conflict, relancer un import
+n'insère que les exercices nouveaux (et ne met à jour que ceux qui ont changé).
+"""
+
+import re
+import sys
+import json
+import hashlib
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import psycopg2
+    from psycopg2.extras import Json, execute_values
+except ImportError:
+    print("Erreur: Le module psycopg2 n'est pas installe.")
+    print("Installez-le avec: pip install psycopg2-binary")
+    sys.exit(1)
+
+from db_connection import DEFAULT_WORKERS, run_sharded
+
+IMPORT_MODES = ('row', 'batch', 'copy')
+CONFLICT_MODES = ('nothing', 'update')
+DEFAULT_PAGE_SIZE = 500
+
+# Colonnes alimentées par exercise_row, dans l'ordre
+EXERCISE_COLUMNS = ('"courseId"', 'type', 'body', 'options', 'answer',
+                    'explanation', 'difficulty', 'tags', 'content_hash')
+JSON_COLUMNS = {'options', 'tags'}
+HASH_INDEX = len(EXERCISE_COLUMNS) - 1
+
+_COLUMN_LIST = ', '.join(EXERCISE_COLUMNS + ('"createdAt"', '"updatedAt"'))
+_VALUES_TEMPLATE = '(' + ', '.join(['%s'] * len(EXERCISE_COLUMNS)) + ', NOW(), NOW())'
+
+# Colonnes hors empreinte, mises à jour par on_conflict='update' si elles ont changé
+_UPDATABLE_COLUMNS = ('options', 'explanation', 'difficulty', 'tags')
+
+_WHITESPACE = re.compile(r'\s+')
+
+# (indice de l'exercice dans le fichier, valeurs de la ligne)
+IndexedRow = Tuple[int, Tuple[Any, ...]]
+
+
+def _normalize_for_hash(value: Any) -> str:
+    text = unicodedata.normalize('NFKC', str(value or ''))
+    return _WHITESPACE.sub(' ', text).strip().lower()
+
+
+def content_hash(body: str, answer: str, exercise_type: str, course_id: int) -> str:
+    """Empreinte SHA-256 de l'énoncé, de la réponse, du type et du cours (casse et espaces ignorés)"""
+    parts = (_normalize_for_hash(body), _normalize_for_hash(answer),
+             _normalize_for_hash(exercise_type), str(course_id))
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def exercise_row(exercise: Dict[str, Any], course_id: int, body: Optional[str] = None) -> Tuple[Any, ...]:
+    """Valeurs d'un exercice dans l'ordre de EXERCISE_COLUMNS (JSON non encore sérialisé)"""
+    exercise_type = exercise.get('type', 'libre')
+    body = exercise.get('body', '') if body is None else body
+    answer = exercise.get('answer', '')
+    return (
+        course_id,
+        exercise_type,
+        body,
+        exercise.get('options') or None,
+        answer,
+        exercise.get('explanation', ''),
+        exercise.get('difficulty', 'moyen'),
+        exercise.get('tags', []),
+        content_hash(body, answer, exercise_type, course_id)
+    )
+
+
+def ensure_content_hash(conn):
+    """
+    Ajouter la colonne content_hash et son index unique s'ils n'existent pas.
+
+    Les exercices déjà présents sans empreinte sont complétés; parmi des
+    doublons existants, seul le plus ancien reçoit l'empreinte.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("ALTER TABLE exercises ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+
+        cursor.execute("SELECT content_hash FROM exercises WHERE content_hash IS NOT NULL")
+        known_hashes = {row[0] for row in cursor.fetchall()}
+
+        cursor.execute(
+            'SELECT id, "courseId", type, body, answer FROM exercises '
+            'WHERE content_hash IS NULL ORDER BY id'
+        )
+        backfill = []
+        for exercise_id, course_id, exercise_type, body, answer in cursor.fetchall():
+            digest = content_hash(body, answer, exercise_type, course_id)
+            if digest not in known_hashes:
+                known_hashes.add(digest)
+                backfill.append((exercise_id, digest))
+
+        if backfill:
+            execute_values(
+                cursor,
+                "UPDATE exercises SET content_hash = v.hash FROM (VALUES %s) AS v (id, hash) "
+                "WHERE exercises.id = v.id",
+                backfill,
+                page_size=DEFAULT_PAGE_SIZE
+            )
+            print(f"Empreintes calculees pour {len(backfill)} exercices existants")
+
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS exercises_content_hash_key ON exercises (content_hash)"
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def dedupe_rows(rows: List[IndexedRow]) -> Tuple[List[IndexedRow], List[int]]:
+    """Retirer les lignes dont l'empreinte apparaît déjà plus haut dans le lot"""
+    seen = set()
+    unique_rows = []
+    duplicates = []
+    for index, row in rows:
+        if row[HASH_INDEX] in seen:
+            duplicates.append(index)
+        else:
+            seen.add(row[HASH_INDEX])
+            unique_rows.append((index, row))
+    return unique_rows, duplicates
+
+
+def _adapt_row(row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    """Envelopper les colonnes JSON pour psycopg2"""
+    return tuple(
+        Json(value) if column in JSON_COLUMNS and value is not None else value
+        for column, value in zip(EXERCISE_COLUMNS, row)
+    )
+
+
+def _copy_field(value: Any) -> str:
+    """Encoder une valeur au format texte de COPY"""
+    if value is None:
+        return '\\N'
+    if not isinstance(value, str):
+        value = str(value)
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+
+def _copy_line(row: Tuple[Any, ...], timestamp: str) -> str:
+    fields = []
+    for column, value in zip(EXERCISE_COLUMNS, row):
+        if column in JSON_COLUMNS and value is not None:
+            value = json.dumps(value, ensure_ascii=False)
+        fields.append(_copy_field(value))
+    fields.append(timestamp)
+    fields.append(timestamp)
+    return '\t'.join(fields) + '\n'
+
+
+class _CopyStream:
+    """Objet fichier en lecture seule qui produit les lignes COPY à la demande"""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _conflict_clause(on_conflict: Optional[str]) -> str:
+    """Clause ON CONFLICT ... RETURNING: une ligne retournée par insertion ou mise à jour"""
+    if on_conflict is None:
+        return " RETURNING TRUE"
+    if on_conflict == 'nothing':
+        return " ON CONFLICT (content_hash) DO NOTHING RETURNING TRUE"
+
+    assignments = ', '.join(f"{column} = EXCLUDED.{column}" for column in _UPDATABLE_COLUMNS)
+    # Les colonnes json n'ont pas d'opérateur d'égalité: comparaison sur leur texte
+    current = ', '.join(f"exercises.{column}::text" for column in _UPDATABLE_COLUMNS)
+    incoming = ', '.join(f"EXCLUDED.{column}::text" for column in _UPDATABLE_COLUMNS)
+    return (
+        f' ON CONFLICT (content_hash) DO UPDATE SET {assignments}, "updatedAt" = NOW()'
+        f" WHERE ({current}) IS DISTINCT FROM ({incoming})"
+        " RETURNING (xmax = 0)"
+    )
+
+
+def _insert_one(cursor, row: Tuple[Any, ...], on_conflict: Optional[str]) -> List[Tuple[bool]]:
+    cursor.execute(
+        f"INSERT INTO exercises ({_COLUMN_LIST}) VALUES {_VALUES_TEMPLATE}"
+        + _conflict_clause(on_conflict),
+        _adapt_row(row)
+    )
+    return cursor.fetchall()
+
+
+def _insert_chunk(cursor, chunk: List[IndexedRow], mode: str, timestamp: str,
+                  on_conflict: Optional[str]) -> List[Tuple[bool]]:
+    if mode == 'copy':
+        lines = (_copy_line(row, timestamp) for _, row in chunk)
+        if on_conflict is None:
+            cursor.copy_expert(f"COPY exercises ({_COLUMN_LIST}) FROM STDIN", _CopyStream(lines))
+            return [(True,)] * len(chunk)
+
+        # COPY ne gère pas ON CONFLICT: passage par une table temporaire
+        cursor.execute("TRUNCATE exercises_staging")
+        cursor.copy_expert(f"COPY exercises_staging ({_COLUMN_LIST}) FROM STDIN", _CopyStream(lines))
+        cursor.execute(
+            f"INSERT INTO exercises ({_COLUMN_LIST}) SELECT {_COLUMN_LIST} FROM exercises_staging"
+            + _conflict_clause(on_conflict)
+        )
+        return cursor.fetchall()
+
+    return execute_values(
+        cursor,
+        f"INSERT INTO exercises ({_COLUMN_LIST}) VALUES %s" + _conflict_clause(on_conflict),
+        [_adapt_row(row) for _, row in chunk],
+        template=_VALUES_TEMPLATE,
+        page_size=len(chunk),
+        fetch=True
+    )
+
+
+def _count_written(result: Dict[str, Any], returned: List[Tuple[bool]], submitted: int):
+    """Répartir les lignes soumises en insérées / mises à jour / ignorées"""
+    inserted = sum(1 for (is_insert,) in returned if is_insert)
+    result['inserted'] += inserted
+    result['updated'] += len(returned) - inserted
+    result['skipped'] += submitted - len(returned)
+
+
+def insert_exercise_rows(conn, rows: List[IndexedRow], mode: str = 'copy',
+                         page_size: int = DEFAULT_PAGE_SIZE,
+                         on_conflict: Optional[str] = 'nothing',
+                         progress: bool = True) -> Dict[str, Any]:
+    """
+    Insérer les lignes par paquets de page_size, dans la transaction courante.
+
+    on_conflict: None (insertion simple), 'nothing' (ignorer les exercices
+    déjà présents) ou 'update' (mettre à jour ceux dont les colonnes hors
+    empreinte ont changé). Les deux derniers supposent ensure_content_hash().
+
+    Retourne {'inserted', 'updated', 'skipped', 'errors': [(indice, message), ...]}.
+    La transaction n'est ni validée ni annulée: c'est à l'appelant de le faire.
+    """
+    if mode not in ('batch', 'copy'):
+        raise ValueError(f"Mode d'import inconnu: {mode}")
+    if on_conflict is not None and on_conflict not in CONFLICT_MODES:
+        raise ValueError(f"Gestion des conflits inconnue: {on_conflict}")
+
+    result: Dict[str, Any] = {'inserted': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+
+    # Un même exercice deux fois dans un paquet ferait échouer ON CONFLICT DO UPDATE
+    if on_conflict is not None:
+        rows, duplicates = dedupe_rows(rows)
+        result['skipped'] += len(duplicates)
+
+    cursor = conn.cursor()
+
+    # Même horodatage que NOW() dans la transaction courante
+    cursor.execute("SELECT NOW()")
+    timestamp = cursor.fetchone()[0].isoformat()
+
+    if mode == 'copy' and on_conflict is not None:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS exercises_staging ON COMMIT DROP AS "
+            f"SELECT {_COLUMN_LIST} FROM exercises WITH NO DATA"
+        )
+
+    try:
+        for start in range(0, len(rows), page_size):
+            chunk = rows[start:start + page_size]
+
+            cursor.execute("SAVEPOINT bulk_chunk")
+            try:
+                returned = _insert_chunk(cursor, chunk, mode, timestamp, on_conflict)
+                cursor.execute("RELEASE SAVEPOINT bulk_chunk")
+                _count_written(result, returned, len(chunk))
+            except psycopg2.Error:
+                # Paquet refusé: rejouer ligne par ligne pour isoler les fautives
+                cursor.execute("ROLLBACK TO SAVEPOINT bulk_chunk")
+                for index, row in chunk:
+                    cursor.execute("SAVEPOINT bulk_row")
+                    try:
+                        returned = _insert_one(cursor, row, on_conflict)
+                        cursor.execute("RELEASE SAVEPOINT bulk_row")
+                        _count_written(result, returned, 1)
+                    except psycopg2.Error as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                        result['errors'].append((index, str(e).strip()))
+                cursor.execute("RELEASE SAVEPOINT bulk_chunk")
+
+            if progress:
+                print(f"Importe {result['inserted'] + result['updated']} exercices "
+                      f"({result['skipped']} deja presents)...")
+    finally:
+        cursor.close()
+
+    return result
+
+
+def insert_exercise_rows_sharded(pool, rows_by_chapter: Dict[int, List[IndexedRow]],
+                                 mode: str = 'copy', page_size: int = DEFAULT_PAGE_SIZE,
+                                 on_conflict: Optional[str] = 'nothing',
+                                 workers: int = DEFAULT_WORKERS) -> Dict[str, Any]:
+    """
+    Insérer les lignes chapitre par chapitre sur plusieurs connexions du pool.
+
+    Chaque chapitre est validé dans sa propre transaction: un chapitre en
+    échec est annulé et ses exercices sont comptés en erreur, les autres
+    restent importés. Les chapitres ont des cours distincts, donc des
+    empreintes distinctes: les threads ne se disputent pas les mêmes clés.
+    """
+    def import_chapter(conn, chapter_num: int, rows: List[IndexedRow]) -> Dict[str, Any]:
+        result = insert_exercise_rows(conn, rows, mode, page_size, on_conflict, progress=False)
+        print(f"Chapitre {chapter_num}: {result['inserted'] + result['updated']} importes, "
+              f"{result['skipped']} deja presents, {len(result['errors'])} erreurs")
+        return result
+
+    total: Dict[str, Any] = {'inserted': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+    results = run_sharded(pool, rows_by_chapter, import_chapter, workers)
+
+    for chapter_num in sorted(results):
+        result = results[chapter_num]
+        if isinstance(result, Exception):
+            print(f"Chapitre {chapter_num} annule: {result}")
+            total['errors'].extend((index, str(result).strip()) for index, _ in rows_by_chapter[chapter_num])
+            continue
+        for key in ('inserted', 'updated', 'skipped'):
+            total[key] += result[key]
+        total['errors'].extend(result['errors'])
+
+    total['errors'].sort()
+    return total
+
+
+# Cours d'un import: (numéro de chapitre, titre, niveau, chapitre, description)
+CourseRow = Tuple[int, str, str, str, str]
+
+# courses n'a pas de contrainte unique sur (title, grade), donc pas de cible
+# pour ON CONFLICT: les cours existants sont lus et les manquants insérés dans
+# une seule instruction. Le verrou, envoyé dans le même aller-retour, empêche
+# deux imports simultanés de créer chacun le même cours (lectures non bloquées).
+_UPSERT_COURSES_SQL = """
+    LOCK TABLE courses IN SHARE ROW EXCLUSIVE MODE;
+    WITH wanted (number, title, grade, chapter, description) AS (VALUES %s),
+    existing AS (
+        SELECT DISTINCT ON (c.title, c.grade) c.id, c.title, c.grade
+        FROM courses c
+        JOIN wanted w ON c.title = w.title AND c.grade = w.grade
+        ORDER BY c.title, c.grade, c.id
+    ),
+    inserted AS (
+        INSERT INTO courses (title, grade, chapter, description, "createdAt", "updatedAt")
+        SELECT title, grade, chapter, description, NOW(), NOW()
+        FROM (
+            SELECT DISTINCT ON (w.title, w.grade) w.*
+            FROM wanted w
+            WHERE NOT EXISTS (SELECT 1 FROM existing e WHERE e.title = w.title AND e.grade = w.grade)
+            ORDER BY w.title, w.grade, w.number
+        ) missing
+        ORDER BY number
+        RETURNING id, title, grade
+    )
+    SELECT w.number, COALESCE(e.id, i.id), e.id IS NULL
+    FROM wanted w
+    LEFT JOIN existing e ON e.title = w.title AND e.grade = w.grade
+    LEFT JOIN inserted i ON i.title = w.title AND i.grade = w.grade
+    ORDER BY w.number
+"""
+
+
+def course_row(chapter: Dict[str, Any], grade: str = '6eme') -> CourseRow:
+    """Valeurs du cours d'un chapitre ({'number', 'title'[, 'grade']})"""
+    number = chapter['number']
+    return (
+        number,
+        chapter['title'],
+        chapter.get('grade', grade),
+        f"Chapitre {number}",
+        f"Chapitre {number} du manuel de mathematiques 6eme"
+    )
+
+
+def upsert_courses(conn, courses: List[CourseRow]) -> List[Tuple[int, int, bool]]:
+    """
+    Retrouver ou créer les cours de tous les chapitres en un aller-retour.
+
+    Un cours existe déjà s'il a le même titre et le même niveau (le plus
+    ancien est retenu parmi des doublons). Retourne (numéro de chapitre,
+    id du cours, créé ou non) par chapitre; la transaction n'est pas validée.
+    """
+    if not courses:
+        return []
+    cursor = conn.cursor()
+    try:
+        return execute_values(cursor, _UPSERT_COURSES_SQL, courses,
+                              page_size=len(courses), fetch=True)
+    finally:
+        cursor.close()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Découpage en flux du manuel par chapitres
+Les pages arrivent une à une; chaque chapitre est produit dès qu'il se termine,
+de sorte que la mémoire reste bornée par la taille d'un chapitre.
+"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# find_headings(texte, titres_deja_vus) -> chapitres trouvés dans le texte,
+# avec 'position' relative au texte fourni
+HeadingFinder = Callable[[str, Set[str]], List[Dict[str, Any]]]
+
+
+def format_page_block(page_num: int, page_text: str) -> str:
+    """Bloc de texte d'une page, identique à celui du mode non streaming"""
+    return f"\n--- PAGE {page_num} ---\n{page_text}\n"
+
+
+def iter_chapter_sections(pages: Iterable[Tuple[int, str]],
+                          find_headings: HeadingFinder) -> Iterator[Tuple[Optional[Dict[str, Any]], str]]:
+    """
+    Produire (chapitre, texte du chapitre) au fur et à mesure de la lecture.
+
+    Les titres sont recherchés page par page (un titre à cheval sur deux pages
+    n'est donc pas détecté). Les positions des chapitres sont absolues, comme
+    dans le texte complet du mode non streaming. Si aucun chapitre n'est
+    trouvé, un unique (None, texte complet) est produit à la fin pour que
+    l'appelant puisse appliquer ses chapitres génériques.
+    """
+    seen_titles: Set[str] = set()
+    current: Optional[Dict[str, Any]] = None
+    buffer: List[str] = []
+    offset = 0
+
+    for page_num, page_text in pages:
+        if not page_text:
+            continue
+
+        block = format_page_block(page_num, page_text)
+        headings = find_headings(block, seen_titles)
+        headings.sort(key=lambda x: x['position'])
+
+        cursor = 0
+        for heading in headings:
+            buffer.append(block[cursor:heading['position']])
+            cursor = heading['position']
+
+            # Le texte précédant le premier chapitre n'appartient à aucun chapitre
+            if current is not None:
+                yield current, "".join(buffer)
+            buffer = []
+
+            heading['position'] += offset
+            current = heading
+
+        buffer.append(block[cursor:])
+        offset += len(block)
+
+    yield current, "".join(buffer)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Import ligne à ligne des exercices, validé par paquets, avec journal de reprise
+
+import_exercise() validait chaque exercice par son propre COMMIT (un
+aller-retour et une écriture du WAL sur disque par ligne). import_in_chunks():
+    - valide la transaction toutes les `commit_every` lignes;
+    - place chaque ligne sous un SAVEPOINT, envoyé avec son INSERT en un seul
+      aller-retour: une ligne refusée n'annule qu'elle-même (ROLLBACK TO
+      SAVEPOINT), ni la transaction ni les lignes du paquet déjà écrites;
+    - après chaque COMMIT, enregistre dans le journal (ImportJournal) le
+      nombre de lignes validées: relancé après une interruption, l'import
+      reprend à cette position au lieu de tout réinsérer.
+
+Utilisé par import_exercises.py et pdf_exercise_importer.py.
+"""
+
+import os
+import sys
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import psycopg2
+    from psycopg2.extras import Json
+except ImportError:
+    print("Erreur: Le module psycopg2 n'est pas installe.")
+    print("Installez-le avec: pip install psycopg2-binary")
+    sys.exit(1)
+
+# Lignes par transaction
+DEFAULT_COMMIT_EVERY = 500
+
+EXERCISE_INSERT_SQL = """
+    INSERT INTO exercises
+    ("courseId", type, body, options, answer, explanation, difficulty, tags, "createdAt", "updatedAt")
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+    RETURNING id
+"""
+
+# Le SAVEPOINT de la ligne précédente est libéré dans le même envoi
+_FIRST_ROW_PREFIX = "SAVEPOINT import_row;"
+_NEXT_ROW_PREFIX = "RELEASE SAVEPOINT import_row; SAVEPOINT import_row;"
+
+
+def exercise_params(exercise: Dict[str, Any], course_id: int) -> Tuple[Any, ...]:
+    """Paramètres de EXERCISE_INSERT_SQL pour un exercice"""
+    # Convertir la liste d'options en dict avec des clés A, B, C, D...
+    options = exercise.get('options')
+    if isinstance(options, list):
+        options = {chr(65 + i): opt for i, opt in enumerate(options)}
+
+    # Préparer les tags
+    tags = exercise.get('tags', [])
+    if isinstance(tags, str):
+        tags = [tags]
+
+    return (
+        course_id,
+        exercise.get('type', 'qcm'),
+        exercise.get('body', ''),
+        Json(options) if options else None,
+        exercise.get('answer', ''),
+        exercise.get('explanation', ''),
+        exercise.get('difficulty', 'moyen'),
+        Json(tags) if tags else None
+    )
+
+
+class ImportJournal:
+    """
+    Fichier JSON de reprise: source, cours et nombre d'exercices de l'import,
+    nombre de lignes validées (offset) et compteurs de succès et d'erreurs.
+
+    Réécrit en entier (fichier temporaire puis renommage) après chaque
+    COMMIT: une interruption pendant l'écriture laisse l'ancienne version.
+    """
+
+    def __init__(self, path: str, source: str, course_id: int, total: int):
+        self.path = path
+        self.key = {'source': os.path.abspath(source), 'course_id': course_id, 'total': total}
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """État enregistré pour ce même import, ou None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if any(state.get(name) != value for name, value in self.key.items()):
+            return None
+        return state
+
+    def save(self, offset: int, success: int, errors: int):
+        state = dict(self.key, offset=offset, success=success, errors=errors)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_in_chunks(conn, exercises: List[Dict[str, Any]], course_id: int,
+                     commit_every: int = DEFAULT_COMMIT_EVERY,
+                     journal: Optional[ImportJournal] = None,
+                     on_row: Optional[Callable[[int, Dict[str, Any], Any, Optional[Exception]], None]] = None
+                     ) -> Dict[str, int]:
+    """
+    Importer les exercices un par un, en validant toutes les commit_every lignes.
+
+    Avec un journal, l'import reprend après la dernière ligne validée d'un
+    import interrompu, et le journal est supprimé à la fin. on_row(position
+    (à partir de 1), exercice, id inséré ou None, erreur ou None) est appelé
+    pour chaque ligne traitée.
+
+    Retourne {'success', 'errors', 'resumed'} (resumed: lignes sautées car
+    déjà validées; leurs succès et erreurs sont inclus dans les compteurs).
+    Une erreur de connexion ou de COMMIT interrompt l'import: les lignes
+    non validées sont perdues, mais le journal permet de reprendre.
+    """
+    commit_every = max(1, commit_every)
+    result = {'success': 0, 'errors': 0, 'resumed': 0}
+
+    offset = 0
+    if journal:
+        state = journal.load()
+        if state:
+            offset = state['offset']
+            result.update(success=state['success'], errors=state['errors'], resumed=offset)
+
+    cursor = conn.cursor()
+    pending = {'success': 0, 'errors': 0}
+    prefix = _FIRST_ROW_PREFIX
+
+    def commit(position: int):
+        conn.commit()
+        result['success'] += pending['success']
+        result['errors'] += pending['errors']
+        pending.update(success=0, errors=0)
+        if journal:
+            journal.save(position, result['success'], result['errors'])
+
+    try:
+        for position in range(offset + 1, len(exercises) + 1):
+            exercise = exercises[position - 1]
+            try:
+                cursor.execute(prefix + EXERCISE_INSERT_SQL, exercise_params(exercise, course_id))
+                exercise_id = cursor.fetchone()[0]
+                error = None
+                pending['success'] += 1
+            except psycopg2.Error as e:
+                if conn.closed:
+                    raise
+                # Annuler la ligne seule; le SAVEPOINT reste ouvert pour la suivante
+                cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+                exercise_id = None
+                error = e
+                pending['errors'] += 1
+            prefix = _NEXT_ROW_PREFIX
+
+            if on_row:
+                on_row(position, exercise, exercise_id, error)
+
+            if position % commit_every == 0:
+                commit(position)
+                prefix = _FIRST_ROW_PREFIX
+
+        commit(len(exercises))
+    finally:
+        cursor.close()
+
+    if journal:
+        journal.remove()
+    return result
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Chargement partagé des fichiers d'exercices JSON (exercices_*.json)
+
+Chaque fichier analysé est conservé dans un instantané pickle
+(.cache/corpus/), associé au chemin absolu du fichier et invalidé dès que sa
+date de modification ou sa taille change: les exécutions suivantes relisent
+l'instantané au lieu de ré-analyser les ~5 Mo de JSON.
+
+iter_corpus() et iter_chapters() ne lisent les fichiers qu'au fil de
+l'itération: un script qui ne traite qu'un chapitre ne charge que les
+fichiers de ce chapitre.
+
+iter_exercise_file() lit un fichier exercice par exercice, sans jamais le
+charger en entier (fichiers trop volumineux pour json.load et le cache).
+
+Usage:
+    python scripts/corpus.py               # résumé du corpus (remplit le cache)
+    python scripts/corpus.py --benchmark
+    python scripts/corpus.py --clear
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# Emplacement du cache (surchargeable par variable d'environnement, '' pour le désactiver)
+DEFAULT_CACHE_DIR = os.getenv('EXERCISE_CORPUS_CACHE', os.path.join('.cache', 'corpus'))
+
+# Taille des blocs lus par iter_exercise_file
+READ_CHUNK_SIZE = 64 * 1024
+
+# Version du format des instantanés (à incrémenter si leur contenu change)
+CACHE_VERSION = 1
+
+# Fichiers du corpus, dans l'ordre des générateurs, avec leur chapitre
+CORPUS_FILES: Tuple[Tuple[str, int], ...] = (
+    ('exercices_6eme.json', 1),  # Par défaut chapitre 1
+    ('exercices_chapitre_1.json', 1),
+    ('exercices_chapitre_2.json', 2),
+    ('exercices_chapitre_3.json', 3),
+    ('exercices_chapitre_4.json', 4),
+    ('exercices_chapitre_5.json', 5),
+    ('exercices_chapitre_6.json', 6),
+    ('exercices_chapitre_7.json', 7),
+    ('exercices_chapitre_8.json', 8),
+    ('exercices_chapitre_9.json', 9),
+)
+
+FILE_TO_CHAPTER: Dict[str, int] = dict(CORPUS_FILES)
+
+_MISSING = object()
+
+# Caractères pouvant prolonger un nombre JSON
+_NUMBER_CHARS = frozenset('0123456789+-.eE')
+
+# Plus long jeton qu'une fin de bloc peut couper avant que le décodeur ne
+# signale l'erreur à son début: « -Infinity », ou « \\uXXXX » dans une chaîne
+_MAX_CUT_TOKEN = len('-Infinity')
+
+
+def _snapshot_path(path: str, cache_dir: str) -> str:
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{key}.pickle")
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    """(mtime en ns, taille): lève FileNotFoundError comme open()"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_snapshot(snapshot: str, signature: Tuple[int, int]) -> Any:
+    """Contenu de l'instantané s'il correspond à signature, sinon _MISSING"""
+    try:
+        with open(snapshot, 'rb') as f:
+            # L'en-tête est lu seul: un instantané périmé n'est pas désérialisé
+            if pickle.load(f) != (CACHE_VERSION, signature):
+                return _MISSING
+            return pickle.load(f)
+    except Exception:
+        return _MISSING
+
+
+def _write_snapshot(snapshot: str, signature: Tuple[int, int], data: Any):
+    """Écrire l'instantané de façon atomique (le cache reste facultatif)"""
+    tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(snapshot) or '.', exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((CACHE_VERSION, signature), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def read_exercise_file(path: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Any:
+    """
+    Contenu JSON de path, comme json.load, lu dans le cache s'il est à jour.
+
+    Lève FileNotFoundError et json.JSONDecodeError comme open() et json.load().
+    Chaque appel retourne de nouveaux objets: les modifier n'affecte ni le
+    cache ni les autres appelants.
+    """
+    signature = _file_signature(path)
+    snapshot = _snapshot_path(path, cache_dir) if cache_dir else None
+
+    if snapshot:
+        data = _read_snapshot(snapshot, signature)
+        if data is not _MISSING:
+            return data
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if snapshot:
+        _write_snapshot(snapshot, signature, data)
+    return data
+
+
+def iter_json_array(f: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Éléments d'un tableau JSON lu par blocs, un à la fois.
+
+    Seuls le bloc courant et l'élément en cours de lecture sont en mémoire.
+    Un document qui n'est pas un tableau est produit comme un seul élément.
+    Lève json.JSONDecodeError si le document est invalide ou tronqué, avec
+    la position (pos, lineno, colno) dans le fichier et non dans le tampon.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    # Caractères et lignes déjà retirés du tampon, début de la dernière ligne retirée
+    offset = 0
+    lines = 0
+    line_start = 0
+
+    def fill(size: int = chunk_size) -> bool:
+        """Ajouter un bloc au tampon (en retirant la partie déjà lue)"""
+        nonlocal buffer, pos, eof, offset, lines, line_start
+        chunk = '' if eof else f.read(size)
+        if not chunk:
+            eof = True
+            return False
+        newline = buffer.rfind('\n', 0, pos)
+        if newline >= 0:
+            lines += buffer.count('\n', 0, pos)
+            line_start = offset + newline + 1
+        offset += pos
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def error(msg: str, index: int) -> json.JSONDecodeError:
+        """Erreur à buffer[index], positionnée dans le fichier"""
+        err = json.JSONDecodeError(msg, buffer, index)
+        newline = buffer.rfind('\n', 0, index)
+        err.pos = offset + index
+        err.lineno = lines + buffer.count('\n', 0, index) + 1
+        err.colno = index - newline if newline >= 0 else err.pos - line_start + 1
+        err.args = ('%s: line %d column %d (char %d)' % (msg, err.lineno, err.colno, err.pos),)
+        return err
+
+    def skip_whitespace() -> str:
+        """Prochain caractère significatif ('' en fin de fichier)"""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\n\r\ufeff':
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return buffer[pos:pos + 1]
+
+    def decode_value() -> Any:
+        """Décoder une valeur, en lisant des blocs tant qu'elle est incomplète"""
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                # Seule une valeur coupée par la fin du tampon justifie une
+                # nouvelle lecture; une erreur avant est définitive
+                truncated = (exc.msg.startswith('Unterminated string')
+                             or len(buffer) - exc.pos <= _MAX_CUT_TOKEN)
+                # Lire au moins autant que ce qui est en attente: un très gros
+                # exercice n'est ainsi ré-analysé qu'un nombre logarithmique de fois
+                if not truncated or not fill(max(chunk_size, len(buffer) - pos)):
+                    raise error(exc.msg, exc.pos) from None
+                continue
+            # Un nombre coupé par la fin du bloc (« 6. » de « 6.5 ») peut continuer dans le suivant
+            if (end == len(buffer) or buffer[end] in _NUMBER_CHARS) and fill():
+                continue
+            pos = end
+            return value
+
+    first = skip_whitespace()
+    if not first:
+        raise error("Expecting value", pos)
+    if first != '[':
+        yield decode_value()
+        return
+
+    pos += 1
+    if skip_whitespace() == ']':
+        return
+    while True:
+        yield decode_value()
+        separator = skip_whitespace()
+        pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise error("Expecting ',' delimiter", pos - 1)
+        skip_whitespace()
+
+
+def iter_exercise_file(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Exercices de path, lus en flux (sans cache: le fichier n'est jamais chargé en entier)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_json_array(f, chunk_size)
+
+
+def as_exercise_list(data: Any) -> List[Dict[str, Any]]:
+    """Un fichier peut contenir un seul exercice au lieu d'une liste"""
+    return data if isinstance(data, list) else [data]
+
+
+def iter_corpus(base_dir: str = '.', files: Iterable[Tuple[str, int]] = CORPUS_FILES,
+                cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Iterator[Tuple[str, int, List[Dict[str, Any]]]]:
+    """(fichier, chapitre, exercices) pour chaque fichier présent, chargé à la demande"""
+    for filename, chapter_num in files:
+        path = os.path.join(base_dir, filename)
+        if os.path.exists(path):
+            yield filename, chapter_num, as_exercise_list(read_exercise_file(path, cache_dir))
+
+
+def iter_chapters(base_dir: str = '.', chapters: Optional[Iterable[int]] = None,
+                  files: Iterable[Tuple[str, int]] = CORPUS_FILES,
+                  cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    (chapitre, exercices) par ordre de chapitre, les fichiers d'un même
+    chapitre étant concaténés. Seuls les fichiers des chapitres demandés
+    (tous par défaut) sont lus, au moment où leur chapitre est produit.
+    """
+    wanted = set(chapters) if chapters is not None else None
+    files_by_chapter: Dict[int, List[str]] = {}
+    for filename, chapter_num in files:
+        if wanted is None or chapter_num in wanted:
+            files_by_chapter.setdefault(chapter_num, []).append(filename)
+
+    for chapter_num in sorted(files_by_chapter):
+        chapter_files = [(filename, chapter_num) for filename in files_by_chapter[chapter_num]]
+        loaded = list(iter_corpus(base_dir, chapter_files, cache_dir))
+        if loaded:
+            yield chapter_num, [exercise for _, _, exercises in loaded for exercise in exercises]
+
+
+def load_corpus(base_dir: str = '.', files: Iterable[Tuple[str, int]] = CORPUS_FILES,
+                cache_dir: Optional[str] = DEFAULT_CACHE_DIR) -> Dict[str, List[Dict[str, Any]]]:
+    """{fichier: exercices} pour tous les fichiers présents"""
+    return {filename: exercises for filename, _, exercises in iter_corpus(base_dir, files, cache_dir)}
+
+
+def clear_cache(cache_dir: str = DEFAULT_CACHE_DIR) -> int:
+    """Supprimer les instantanés; retourne le nombre de fichiers supprimés"""
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith('.pickle') or name.endswith('.tmp'):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+def run_benchmark(base_dir: str = '.', repeat: int = 5, cache_dir: str = DEFAULT_CACHE_DIR):
+    """Comparer json.load et la lecture des instantanés sur le corpus complet"""
+    def best_time(function) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    clear_cache(cache_dir)
+    start = time.perf_counter()
+    corpus = load_corpus(base_dir, cache_dir=cache_dir)
+    cold = time.perf_counter() - start
+    if not corpus:
+        print("Aucun fichier d'exercices trouve (lancer depuis la racine du projet)")
+        sys.exit(1)
+
+    json_time = best_time(lambda: load_corpus(base_dir, cache_dir=None))
+    cached_time = best_time(lambda: load_corpus(base_dir, cache_dir=cache_dir))
+    chapter_time = best_time(lambda: next(iter_chapters(base_dir, chapters=[9], cache_dir=cache_dir)))
+
+    json_bytes = sum(os.path.getsize(os.path.join(base_dir, filename)) for filename in corpus)
+    total = sum(len(exercises) for exercises in corpus.values())
+    print(f"Corpus: {len(corpus)} fichiers, {total} exercices, {json_bytes / 1e6:.1f} Mo de JSON")
+    print(f"   json.load:                     {json_time * 1000:7.1f} ms")
+    print(f"   premier chargement (+ cache):  {cold * 1000:7.1f} ms")
+    print(f"   instantanes:                   {cached_time * 1000:7.1f} ms")
+    print(f"   un seul chapitre (9):          {chapter_time * 1000:7.2f} ms")
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Corpus des exercices JSON et son cache')
+    parser.add_argument('--dir', default='.',
+                       help='Dossier contenant les fichiers exercices_*.json')
+    parser.add_argument('--clear', action='store_true',
+                       help='Vider le cache des instantanes')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer json.load et le cache')
+    parser.add_argument('--repeat', type=int, default=5,
+                       help='Nombre de repetitions du benchmark')
+
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"{clear_cache()} instantanes supprimes de {DEFAULT_CACHE_DIR}")
+        return
+
+    if args.benchmark:
+        run_benchmark(args.dir, args.repeat)
+        return
+
+    for filename, chapter_num, exercises in iter_corpus(args.dir):
+        print(f"[OK] {filename}: {len(exercises)} exercices (chapitre {chapter_num})")
+
+
+if __name__ == '__main__':
+    main()
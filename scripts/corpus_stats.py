@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Statistiques en colonnes sur les exercices (NumPy)
+
+ColumnarSummary lit les exercices une seule fois et range chaque champ
+utile dans un tableau NumPy: type, difficulté et chapitre sous forme de
+codes entiers (avec la liste de leurs libellés), longueurs des textes et
+présence d'explication, de tags, d'options. Comptages, histogrammes,
+percentiles et tableaux croisés (--group-by chapter,type) sont ensuite
+calculés par opérations vectorisées (bincount, histogram, percentile).
+
+Usage:
+    python scripts/corpus_stats.py                          # corpus complet
+    python scripts/corpus_stats.py --file exercices_6eme.json --group-by chapter,type
+    python scripts/corpus_stats.py --benchmark --replicate 100
+"""
+
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    print("Erreur: Le module numpy n'est pas installe.")
+    print("Installez-le avec: pip install numpy")
+    sys.exit(1)
+
+from corpus import as_exercise_list, iter_corpus, read_exercise_file
+
+# Colonnes catégorielles: nom -> champ de l'exercice
+CATEGORICAL_COLUMNS = {
+    'type': 'type',
+    'difficulty': 'difficulty',
+    'chapter': 'chapter_number',
+}
+
+# Champs texte dont la longueur est conservée
+TEXT_FIELDS = ('body', 'answer', 'explanation')
+
+# Champs dont on compte la présence (valeur non vide)
+PRESENCE_FIELDS = ('explanation', 'tags', 'options')
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+def _label_key(label: Any) -> Tuple[int, Any]:
+    """Ordre d'affichage des libellés: nombres d'abord, puis textes"""
+    if isinstance(label, (int, float)) and not isinstance(label, bool):
+        return 0, label
+    return 1, str(label)
+
+
+class ColumnarSummary:
+    """
+    Colonnes NumPy d'un ensemble d'exercices.
+
+    Les libellés d'une colonne catégorielle sont numérotés dans l'ordre de
+    leur première apparition (l'ordre des dictionnaires des anciennes
+    statistiques); une valeur absente vaut 'unknown'.
+    """
+
+    def __init__(self, exercises: Sequence[Dict[str, Any]]):
+        self.size = len(exercises)
+
+        self.labels: Dict[str, List[Any]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for column, field in CATEGORICAL_COLUMNS.items():
+            index: Dict[Any, int] = {}
+            self.codes[column] = np.fromiter(
+                (index.setdefault(exercise.get(field, 'unknown'), len(index)) for exercise in exercises),
+                dtype=np.int32, count=self.size
+            )
+            self.labels[column] = list(index)
+
+        self.lengths: Dict[str, np.ndarray] = {
+            field: np.fromiter((len(exercise.get(field) or '') for exercise in exercises),
+                               dtype=np.int64, count=self.size)
+            for field in TEXT_FIELDS
+        }
+        self.present: Dict[str, np.ndarray] = {
+            field: np.fromiter((bool(exercise.get(field)) for exercise in exercises),
+                               dtype=bool, count=self.size)
+            for field in PRESENCE_FIELDS
+        }
+
+    def counts(self, column: str) -> Dict[Any, int]:
+        """{libellé: nombre d'exercices} pour une colonne catégorielle"""
+        counts = np.bincount(self.codes[column], minlength=len(self.labels[column]))
+        return {label: int(count) for label, count in zip(self.labels[column], counts)}
+
+    def count_present(self, field: str) -> int:
+        return int(np.count_nonzero(self.present[field]))
+
+    def mean_length(self, field: str, present_only: bool = False) -> float:
+        """Longueur moyenne (0 si aucun exercice), éventuellement des seuls champs renseignés"""
+        lengths = self.lengths[field]
+        if present_only:
+            lengths = lengths[self.present[field]]
+        if not len(lengths):
+            return 0
+        # Somme entière puis division en Python: même arrondi que sum() / len()
+        return int(lengths.sum()) / len(lengths)
+
+    def percentiles(self, field: str, q: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[float, float]:
+        if not self.size:
+            return {}
+        return {p: float(value) for p, value in zip(q, np.percentile(self.lengths[field], q))}
+
+    def histogram(self, field: str, bins: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """(effectifs, bornes) des longueurs, sur une échelle logarithmique (longueurs très inégales)"""
+        lengths = self.lengths[field]
+        top = max(int(lengths.max()) if self.size else 1, 1)
+        edges = np.unique(np.concatenate(([0], np.geomspace(1, top + 1, bins).astype(np.int64))))
+        counts, edges = np.histogram(lengths, bins=edges)
+        return counts, edges
+
+    def crosstab(self, columns: Sequence[str]) -> Tuple[List[List[Any]], np.ndarray]:
+        """
+        Tableau croisé des colonnes: (libellés de chaque colonne, effectifs)
+
+        Les effectifs forment un tableau à len(columns) dimensions, indexé par
+        les codes des libellés.
+        """
+        shape = tuple(len(self.labels[column]) for column in columns)
+        if not self.size:
+            return [self.labels[column] for column in columns], np.zeros(shape, dtype=np.int64)
+        flat = np.ravel_multi_index(tuple(self.codes[column] for column in columns), shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+        return [self.labels[column] for column in columns], counts
+
+    def format_crosstab(self, columns: Sequence[str]) -> str:
+        """Tableau croisé en texte: grille pour deux colonnes, liste des combinaisons sinon"""
+        labels, counts = self.crosstab(columns)
+        orders = [sorted(range(len(column_labels)), key=lambda i, l=column_labels: _label_key(l[i]))
+                  for column_labels in labels]
+
+        lines = []
+        if len(columns) == 2:
+            rows, cols = orders
+            corner = f"{columns[0]} / {columns[1]}"
+            header = [str(labels[1][j]) for j in cols] + ['total']
+            width = max([len(h) for h in header] + [len(str(self.size)), 6])
+            first = max([len(str(labels[0][i])) for i in rows] + [len(corner)])
+            lines.append(f"{corner:<{first + 3}}" +
+                         ''.join(f"{h:>{width + 1}}" for h in header))
+            for i in rows:
+                values = [counts[i, j] for j in cols] + [counts[i].sum()]
+                lines.append(f"{str(labels[0][i]):<{first + 3}}" +
+                             ''.join(f"{int(v):>{width + 1}}" for v in values))
+            totals = [counts[:, j].sum() for j in cols] + [counts.sum()]
+            lines.append(f"{'total':<{first + 3}}" + ''.join(f"{int(v):>{width + 1}}" for v in totals))
+        else:
+            for index in zip(*np.nonzero(counts)):
+                combination = ', '.join(f"{column}={labels[k][i]}" for k, (column, i) in enumerate(zip(columns, index)))
+                lines.append(f"   {int(counts[index]):>8}  {combination}")
+        return '\n'.join(lines)
+
+    def report(self, group_by: Optional[Sequence[str]] = None) -> str:
+        """Résumé texte: effectifs, longueurs (percentiles, histogramme), tableau croisé"""
+        lines = [f"Exercices: {self.size}"]
+        for column in CATEGORICAL_COLUMNS:
+            counts = sorted(self.counts(column).items(), key=lambda item: _label_key(item[0]))
+            lines.append(f"Par {column}: " + ', '.join(f"{label}={count}" for label, count in counts))
+        for field in PRESENCE_FIELDS:
+            lines.append(f"Avec {field}: {self.count_present(field)}/{self.size}")
+
+        for field in TEXT_FIELDS:
+            percentiles = self.percentiles(field)
+            lines.append("")
+            lines.append(f"Longueur {field}: moyenne {self.mean_length(field):.1f}, " +
+                         ', '.join(f"p{p}={value:.0f}" for p, value in percentiles.items()) +
+                         (f", max {int(self.lengths[field].max())}" if self.size else ''))
+            counts, edges = self.histogram(field)
+            peak = max(int(counts.max()), 1) if len(counts) else 1
+            for count, low, high in zip(counts, edges[:-1], edges[1:]):
+                lines.append(f"   [{low:>7}, {high:>7}[ {int(count):>8} {'#' * int(40 * count / peak)}")
+
+        if group_by:
+            lines.append("")
+            lines.append(self.format_crosstab(group_by))
+        return '\n'.join(lines)
+
+
+def parse_group_by(value: str) -> List[str]:
+    """'chapter,type' -> ['chapter', 'type'] (colonnes de CATEGORICAL_COLUMNS)"""
+    columns = [column.strip() for column in value.split(',') if column.strip()]
+    unknown = [column for column in columns if column not in CATEGORICAL_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Colonnes inconnues: {', '.join(unknown) or value} "
+                         f"(disponibles: {', '.join(CATEGORICAL_COLUMNS)})")
+    return columns
+
+
+def _python_statistics(exercises: Iterable[Dict[str, Any]], group_by: Sequence[str]) -> Dict[str, Any]:
+    """Mêmes comptages par incréments de dictionnaires, pour le benchmark"""
+    stats: Dict[str, Any] = {column: {} for column in CATEGORICAL_COLUMNS}
+    stats['crosstab'] = {}
+    stats['lengths'] = {field: [] for field in TEXT_FIELDS}
+    for exercise in exercises:
+        for column, field in CATEGORICAL_COLUMNS.items():
+            value = exercise.get(field, 'unknown')
+            stats[column][value] = stats[column].get(value, 0) + 1
+        key = tuple(exercise.get(CATEGORICAL_COLUMNS[column], 'unknown') for column in group_by)
+        stats['crosstab'][key] = stats['crosstab'].get(key, 0) + 1
+        for field in TEXT_FIELDS:
+            stats['lengths'][field].append(len(exercise.get(field) or ''))
+    for field in TEXT_FIELDS:
+        lengths = sorted(stats['lengths'][field])
+        stats['lengths'][field] = [lengths[int(p / 100 * (len(lengths) - 1))] for p in DEFAULT_PERCENTILES]
+    return stats
+
+
+def run_benchmark(exercises: List[Dict[str, Any]], factors: Iterable[int], group_by: Sequence[str]):
+    """Comparer les comptages Python et les colonnes NumPy sur le corpus répété"""
+    print(f"{'exercices':>10} {'python':>10} {'colonnes':>10} {'dont calculs':>13}")
+    for factor in factors:
+        corpus = exercises * factor
+
+        start = time.perf_counter()
+        _python_statistics(corpus, group_by)
+        python_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = ColumnarSummary(corpus)
+        built = time.perf_counter()
+        for column in CATEGORICAL_COLUMNS:
+            summary.counts(column)
+        summary.crosstab(group_by)
+        for field in TEXT_FIELDS:
+            summary.percentiles(field)
+            summary.histogram(field)
+        end = time.perf_counter()
+
+        print(f"{len(corpus):>10} {python_time:>9.3f}s {end - start:>9.3f}s {end - built:>12.4f}s")
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Statistiques en colonnes sur les exercices')
+    parser.add_argument('--file', help='Fichier JSON d\'exercices (par defaut: tout le corpus)')
+    parser.add_argument('--dir', default='.',
+                       help='Dossier contenant les fichiers exercices_*.json')
+    parser.add_argument('--group-by',
+                       help=f"Tableau croise, ex. chapter,type ({', '.join(CATEGORICAL_COLUMNS)})")
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer avec les comptages par dictionnaires')
+    parser.add_argument('--replicate', type=int, default=100,
+                       help='Facteur de replication maximal du corpus pour le benchmark')
+
+    args = parser.parse_args()
+
+    try:
+        group_by = parse_group_by(args.group_by) if args.group_by else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.file:
+        exercises = as_exercise_list(read_exercise_file(args.file))
+    else:
+        exercises = [exercise for _, _, file_exercises in iter_corpus(args.dir) for exercise in file_exercises]
+    if not exercises:
+        print("Aucun exercice trouve (lancer depuis la racine du projet ou utiliser --file)")
+        sys.exit(1)
+
+    if args.benchmark:
+        factors = sorted({f for f in (1, 10, args.replicate) if f <= args.replicate})
+        run_benchmark(exercises, factors, group_by or ['chapter', 'type'])
+        return
+
+    print(ColumnarSummary(exercises).report(group_by))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Connexions PostgreSQL partagées par les scripts d'import Mathia
+
+La configuration est résolue une seule fois: DATABASE_URL si elle est
+définie, sinon DB_CONFIG (variables DB_HOST, DB_PORT...). Chaque connexion
+reçoit un statement_timeout pour qu'une requête bloquée (verrou, index en
+construction) n'immobilise pas l'import indéfiniment.
+
+Pour les imports volumineux, create_pool() ouvre un ThreadedConnectionPool
+et run_sharded() répartit des lots indépendants (un par chapitre) entre
+plusieurs threads, chacun dans sa propre transaction.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, TypeVar
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:
+    print("Erreur: Le module psycopg2 n'est pas installe.")
+    print("Installez-le avec: pip install psycopg2-binary")
+    sys.exit(1)
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Configuration de la base de donnees (utilisée si DATABASE_URL n'est pas définie)
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': os.getenv('DB_PORT', 5432),
+    'database': os.getenv('DB_NAME', 'mathia_db'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', '')
+}
+
+# Durée maximale d'une requête, en millisecondes (0 pour désactiver)
+STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 120000))
+
+DEFAULT_WORKERS = 4
+
+T = TypeVar('T')
+
+
+def connection_kwargs(dsn: Optional[str] = None,
+                      statement_timeout_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Paramètres de psycopg2.connect: dsn explicite, sinon DATABASE_URL,
+    sinon DB_CONFIG, complétés par le statement_timeout.
+    """
+    dsn = dsn or os.getenv('DATABASE_URL')
+    kwargs: Dict[str, Any] = {'dsn': dsn} if dsn else dict(DB_CONFIG)
+
+    timeout = STATEMENT_TIMEOUT_MS if statement_timeout_ms is None else statement_timeout_ms
+    if timeout:
+        kwargs['options'] = f'-c statement_timeout={int(timeout)}'
+    return kwargs
+
+
+def connect(dsn: Optional[str] = None, statement_timeout_ms: Optional[int] = None):
+    """Ouvrir une connexion (lève psycopg2.Error en cas d'échec)"""
+    return psycopg2.connect(**connection_kwargs(dsn, statement_timeout_ms))
+
+
+def get_db_connection(dsn: Optional[str] = None, statement_timeout_ms: Optional[int] = None):
+    """Creer une connexion a la base de donnees PostgreSQL, ou None en cas d'echec"""
+    try:
+        return connect(dsn, statement_timeout_ms)
+    except Exception as e:
+        print(f"Erreur de connexion a la base de donnees: {e}")
+        return None
+
+
+def create_pool(maxconn: int = DEFAULT_WORKERS, dsn: Optional[str] = None,
+                statement_timeout_ms: Optional[int] = None) -> ThreadedConnectionPool:
+    """Pool de connexions partageable entre threads (ouvertes à la demande)"""
+    return ThreadedConnectionPool(1, max(1, maxconn), **connection_kwargs(dsn, statement_timeout_ms))
+
+
+@contextmanager
+def pooled_connection(pool: ThreadedConnectionPool) -> Iterator[Any]:
+    """
+    Emprunter une connexion au pool pour une transaction.
+
+    La transaction est validée en sortie normale et annulée sur exception;
+    une connexion cassée est fermée au lieu d'être rendue au pool.
+    """
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+def run_sharded(pool: ThreadedConnectionPool,
+                shards: Dict[Hashable, List[Any]],
+                task: Callable[[Any, Hashable, List[Any]], T],
+                workers: int = DEFAULT_WORKERS) -> Dict[Hashable, Any]:
+    """
+    Exécuter task(conn, clé, éléments) pour chaque lot, sur `workers` threads.
+
+    Chaque lot s'exécute dans sa propre transaction (pooled_connection): un
+    lot en échec est annulé sans affecter les autres. Retourne {clé: résultat},
+    ou {clé: exception} pour les lots en échec.
+    """
+    results: Dict[Hashable, Any] = {}
+
+    def run(key: Hashable, items: List[Any]) -> T:
+        with pooled_connection(pool) as conn:
+            return task(conn, key, items)
+
+    # Les plus gros lots d'abord, pour équilibrer la fin de l'import
+    ordered = sorted(shards.items(), key=lambda item: len(item[1]), reverse=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(run, key, items): key for key, items in ordered}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                results[key] = e
+
+    return results
@@ -270,35 +270,19 @@ class ExerciseFormatter:
     
     def get_statistics(self):
         """Obtenir des statistiques sur les exercices"""
-        stats = {
-            "total": len(self.exercises),
-            "by_type": {},
-            "by_difficulty": {},
-            "with_explanations": 0,
-            "with_options": 0
+        # Import paresseux: seules les statistiques ont besoin de numpy
+        from corpus_stats import ColumnarSummary
+        summary = ColumnarSummary(self.exercises)
+        return {
+            "total": summary.size,
+            "by_type": summary.counts('type'),
+            "by_difficulty": summary.counts('difficulty'),
+            "with_explanations": summary.count_present('explanation'),
+            "with_options": summary.count_present('options')
         }
-        
-        for exercise in self.exercises:
-            # Par type
-            ex_type = exercise.get('type', 'unknown')
-            stats["by_type"][ex_type] = stats["by_type"].get(ex_type, 0) + 1
-            
-            # Par difficulté
-            difficulty = exercise.get('difficulty', 'unknown')
-            stats["by_difficulty"][difficulty] = stats["by_difficulty"].get(difficulty, 0) + 1
-            
-            # Avec explications
-            if exercise.get('explanation'):
-                stats["with_explanations"] += 1
-            
-            # Avec options (QCM)
-            if exercise.get('options'):
-                stats["with_options"] += 1
-        
-        return stats
     
-    def print_statistics(self):
-        """Afficher les statistiques"""
+    def print_statistics(self, group_by: Optional[List[str]] = None):
+        """Afficher les statistiques (et le tableau croisé des colonnes group_by)"""
         stats = self.get_statistics()
         
         print("\n📊 Statistiques des exercices:")
@@ -315,6 +299,11 @@ class ExerciseFormatter:
         
         print(f"\nAvec explications: {stats['with_explanations']}")
         print(f"Avec options (QCM): {stats['with_options']}")
+        
+        if group_by:
+            from corpus_stats import ColumnarSummary
+            print()
+            print(ColumnarSummary(self.exercises).format_crosstab(group_by))
 
 
 def main():
@@ -326,9 +315,18 @@ def main():
     parser.add_argument('--output', help='Fichier JSON de sortie')
     parser.add_argument('--preview', action='store_true', help='Aperçu des exercices')
     parser.add_argument('--stats', action='store_true', help='Afficher les statistiques')
+    parser.add_argument('--group-by', help='Avec --stats: tableau croisé, ex. chapter,type')
     
     args = parser.parse_args()
     
+    try:
+        group_by = None
+        if args.group_by:
+            from corpus_stats import parse_group_by
+            group_by = parse_group_by(args.group_by)
+    except ValueError as e:
+        parser.error(str(e))
+    
     formatter = ExerciseFormatter()
     
     if args.input:
@@ -343,7 +341,7 @@ def main():
         formatter.preview()
     
     if args.stats:
-        formatter.print_statistics()
+        formatter.print_statistics(group_by)
     
     if args.output:
         formatter.save_to_file(args.output)
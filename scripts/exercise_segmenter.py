@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Découpage linéaire du texte en exercices pour les extracteurs PDF Mathia
+
+Remplace la série de patterns `(.*?)(?=...)` en DOTALL, qui relançait une
+recherche paresseuse à chaque nombre du texte, une fois par pattern, et
+produisait plusieurs fois le même exercice. Ici, les marqueurs d'exercice
+sont repérés en un seul parcours et le texte est coupé en segments disjoints.
+
+Usage:
+    python scripts/exercise_segmenter.py --benchmark
+    python scripts/exercise_segmenter.py --benchmark --file exercices_6eme.json --repeat 5
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_KEYWORDS = ('Exercice',)
+
+_marker_cache: Dict[Tuple[str, ...], 're.Pattern'] = {}
+
+
+def _marker_pattern(keywords: Sequence[str]) -> 're.Pattern':
+    """Pattern unique des marqueurs: « Exercice 3 : » ou un nombre suivi de ':' / '.'"""
+    key = tuple(keywords)
+    if key not in _marker_cache:
+        keyword_alt = '|'.join(re.escape(keyword) for keyword in key)
+        # (?<!\d) ne laisse démarrer un marqueur numérique qu'au début d'une suite
+        # de chiffres: chaque position du texte n'est examinée qu'une fois
+        _marker_cache[key] = re.compile(
+            rf'(?:{keyword_alt})\s+(?P<kw_num>\d+)[:.\s]*'
+            r'|(?<!\d)(?P<num>\d+)[:.]\s*',
+            re.IGNORECASE
+        )
+    return _marker_cache[key]
+
+
+def iter_segments(text: str, keywords: Sequence[str] = DEFAULT_KEYWORDS) -> Iterator[Tuple[str, str]]:
+    """
+    Produire (numéro, contenu) pour chaque exercice, sans chevauchement.
+
+    Si le texte contient des marqueurs à mot-clé (« Exercice 12 »), seuls
+    ceux-ci délimitent les exercices: les nombres « 1. », « 2. » qui suivent
+    sont des sous-questions. Sinon, les nombres suivis de ':' ou '.' servent
+    de délimiteurs, comme le faisait le pattern générique.
+    """
+    keyword_markers = []
+    number_markers = []
+
+    for match in _marker_pattern(keywords).finditer(text):
+        if match.group('kw_num') is not None:
+            keyword_markers.append((match.start(), match.end(), match.group('kw_num')))
+        else:
+            number_markers.append((match.start(), match.end(), match.group('num')))
+
+    markers = keyword_markers or number_markers
+
+    for i, (_, content_start, number) in enumerate(markers):
+        content_end = markers[i + 1][0] if i + 1 < len(markers) else len(text)
+        yield number, text[content_start:content_end].strip()
+
+
+def segment_exercises(text: str, keywords: Sequence[str] = DEFAULT_KEYWORDS,
+                      min_length: int = 0) -> List[Tuple[str, str]]:
+    """Liste des segments (numéro, contenu) dont le contenu dépasse min_length caractères"""
+    return [
+        (number, content)
+        for number, content in iter_segments(text, keywords)
+        if len(content) > min_length
+    ]
+
+
+# Patterns historiques, conservés uniquement pour le benchmark
+LEGACY_PATTERNS = [
+    r'Exercice\s+(\d+)[:.\s]*(.*?)(?=Exercice\s+\d+|$)',
+    r'(\d+)[:.\s]*(.*?)(?=\d+[:.]|$)',
+]
+
+
+def _legacy_segments(text: str) -> List[Tuple[str, str]]:
+    """Découpage d'origine des extracteurs (un finditer par pattern)"""
+    segments = []
+    for pattern in LEGACY_PATTERNS:
+        for match in re.finditer(pattern, text, re.DOTALL | re.IGNORECASE):
+            content = match.group(2).strip()
+            if len(content) > 20:
+                segments.append((match.group(1), content))
+    return segments
+
+
+def _build_benchmark_text(json_path: str, repeat: int) -> str:
+    """Reconstituer un texte de manuel à partir des exercices déjà extraits"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        exercises = json.load(f)
+
+    parts = []
+    for _ in range(repeat):
+        for i, exercise in enumerate(exercises, 1):
+            parts.append(f"Exercice {i} : {exercise.get('body', '')}\n")
+    return "".join(parts)
+
+
+def _build_numeric_text(size: int) -> str:
+    """Page de tableaux de nombres: longues suites de chiffres sans délimiteur"""
+    row = 'Exercice 1 : ' + ' '.join(str(10 ** 12 + i) for i in range(2000)) + '\n'
+    return row * max(1, size // len(row))
+
+
+def _time_both(label: str, text: str):
+    """Chronométrer les deux découpages sur un même texte"""
+    print(f"{label}: {len(text)} caracteres")
+
+    start = time.perf_counter()
+    legacy = _legacy_segments(text)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments = segment_exercises(text, min_length=20)
+    segment_time = time.perf_counter() - start
+
+    print(f"   Patterns historiques: {legacy_time:.3f}s, {len(legacy)} segments "
+          f"({len(set(content for _, content in legacy))} distincts)")
+    print(f"   Decoupage lineaire:   {segment_time:.3f}s, {len(segments)} segments")
+    if segment_time > 0:
+        print(f"   Acceleration: x{legacy_time / segment_time:.1f}")
+
+
+def run_benchmark(json_path: str, repeat: int = 1):
+    """Comparer le découpage historique et le découpage linéaire"""
+    text = _build_benchmark_text(json_path, repeat)
+    _time_both(f"Corpus {os.path.basename(json_path)} x{repeat}", text)
+    _time_both("Tableaux numeriques", _build_numeric_text(len(text)))
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    default_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'exercices_6eme.json')
+
+    parser = argparse.ArgumentParser(description='Decoupage lineaire du texte en exercices')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer avec les patterns historiques')
+    parser.add_argument('--file', default=default_file,
+                       help='Fichier JSON servant a construire le texte de test')
+    parser.add_argument('--repeat', type=int, default=1,
+                       help='Nombre de repetitions du corpus dans le texte de test')
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    run_benchmark(args.file, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
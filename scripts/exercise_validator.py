@@ -2,11 +2,156 @@
 """
 Validateur d'exercices pour Mathia
 Vérifie la qualité et la cohérence des exercices importés
+
+Les motifs sont compilés une fois au chargement du module, et chaque
+exercice n'est mis en minuscules qu'une fois (ExerciseText), pour toutes
+les vérifications. validate_exercises(..., workers=N) répartit la liste
+par tranches sur N processus.
+
+validate_stream() (--stream) lit le fichier exercice par exercice, écrit
+les exercices valides en JSONL au fil de l'eau et ne garde des erreurs que
+des compteurs et quelques exemples: la mémoire reste constante quelle que
+soit la taille du fichier.
 """
 
+import os
 import json
 import re
-from typing import List, Dict, Any, Tuple, Optional
+import sys
+import time
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, NamedTuple, Tuple, Optional
+
+from corpus import iter_exercise_file, read_exercise_file
+
+VALID_TYPES = ('qcm', 'libre', 'vrai-faux', 'calcul')
+VALID_DIFFICULTIES = ('facile', 'moyen', 'difficile')
+QCM_OPTION_KEYS = ['A', 'B', 'C', 'D']
+TRUE_FALSE_ANSWERS = ('vrai', 'faux', 'true', 'false')
+
+# Verbes d'action attendus dans l'énoncé d'un exercice de calcul (énoncé en minuscules)
+MATH_TERMS = re.compile('calculer|résoudre|trouver|déterminer|évaluer')
+
+# Éléments mathématiques attendus dans la réponse d'un exercice de calcul
+MATH_ANSWER = re.compile(r'[\d\+\-\*/\=\(\)]')
+
+# Validation en flux: exemples conservés par type de message, et nombre
+# maximal de messages distincts comptés séparément
+DEFAULT_SAMPLE_SIZE = 20
+MAX_SAMPLE_LENGTH = 300
+MAX_DISTINCT_MESSAGES = 200
+OTHER_MESSAGES = 'Autres messages'
+
+# Parties variables des messages (réponse citée, valeur après « : »), masquées pour les compter par type
+MESSAGE_VALUES = re.compile(r"(?<=La réponse ')[^']*(?=' ne correspond)|(?<=: ).*\Z", re.DOTALL)
+
+# En dessous de cette taille par processus, valider sur place coûte moins cher
+# que d'envoyer les exercices aux processus
+MIN_CHUNK_SIZE = 2000
+
+
+class ExerciseText(NamedTuple):
+    """Champs texte d'un exercice, lus et mis en minuscules une seule fois"""
+    body: str
+    answer: str
+    explanation: str
+    body_lower: str
+    answer_lower: str
+
+    @classmethod
+    def of(cls, exercise: Dict[str, Any]) -> 'ExerciseText':
+        body = exercise.get('body') or ''
+        answer = exercise.get('answer') or ''
+        return cls(body, answer, exercise.get('explanation') or '', body.lower(), answer.lower())
+
+
+class StatisticsCollector:
+    """
+    Statistiques des exercices, accumulées un exercice à la fois
+    
+    Même résultat que _generate_statistics, en mémoire constante (validation
+    en flux); _generate_statistics travaille en colonnes sur une liste.
+    """
+    
+    def __init__(self):
+        self.total = 0
+        self.by_type: Dict[str, int] = {}
+        self.by_difficulty: Dict[str, int] = {}
+        self.with_explanations = 0
+        self.with_tags = 0
+        self.total_body_length = 0
+        self.total_explanation_length = 0
+    
+    def add(self, exercise: Dict[str, Any]):
+        self.total += 1
+        
+        # Par type
+        ex_type = exercise.get('type', 'unknown')
+        self.by_type[ex_type] = self.by_type.get(ex_type, 0) + 1
+        
+        # Par difficulté
+        difficulty = exercise.get('difficulty', 'unknown')
+        self.by_difficulty[difficulty] = self.by_difficulty.get(difficulty, 0) + 1
+        
+        # Avec explications
+        if exercise.get('explanation'):
+            self.with_explanations += 1
+            self.total_explanation_length += len(exercise['explanation'])
+        
+        # Avec tags
+        if exercise.get('tags'):
+            self.with_tags += 1
+        
+        # Longueur moyenne
+        self.total_body_length += len(exercise.get('body') or '')
+    
+    def statistics(self) -> Dict[str, Any]:
+        stats = {
+            'total': self.total,
+            'by_type': self.by_type,
+            'by_difficulty': self.by_difficulty,
+            'with_explanations': self.with_explanations,
+            'with_tags': self.with_tags,
+            'average_body_length': 0,
+            'average_explanation_length': 0
+        }
+        
+        # Calculer les moyennes
+        if self.total:
+            stats['average_body_length'] = round(self.total_body_length / self.total, 1)
+        
+        if self.with_explanations > 0:
+            stats['average_explanation_length'] = round(self.total_explanation_length / self.with_explanations, 1)
+        
+        return stats
+
+
+class MessageSummary:
+    """
+    Messages d'erreur ou d'avertissement comptés par type (valeurs propres à
+    l'exercice masquées), avec les sample_size premiers exemples complets.
+    
+    Au-delà de MAX_DISTINCT_MESSAGES types différents, les nouveaux sont
+    comptés ensemble.
+    """
+    
+    def __init__(self, sample_size: int = DEFAULT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self.samples: List[str] = []
+    
+    def add(self, index: int, message: str):
+        self.total += 1
+        kind = MESSAGE_VALUES.sub('…', message)
+        if kind not in self.counts and len(self.counts) >= MAX_DISTINCT_MESSAGES:
+            kind = OTHER_MESSAGES
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if len(self.samples) < self.sample_size:
+            if len(message) > MAX_SAMPLE_LENGTH:
+                message = message[:MAX_SAMPLE_LENGTH] + '…'
+            self.samples.append(f"Exercice {index}: {message}" if index else message)
 
 
 class ExerciseValidator:
@@ -21,35 +166,36 @@ class ExerciseValidator:
         """Valider un exercice individuel"""
         errors = []
         warnings = []
+        text = ExerciseText.of(exercise)
         
         # Vérifications obligatoires
-        if not exercise.get('body'):
+        if not text.body:
             errors.append("L'énoncé de l'exercice est requis")
         
-        if not exercise.get('answer'):
+        if not text.answer:
             errors.append("La réponse est requise")
         
         if not exercise.get('type'):
             errors.append("Le type d'exercice est requis")
-        elif exercise['type'] not in ['qcm', 'libre', 'vrai-faux', 'calcul']:
+        elif exercise['type'] not in VALID_TYPES:
             errors.append(f"Type d'exercice invalide: {exercise['type']}")
         
         # Vérifications spécifiques par type
         exercise_type = exercise.get('type', '')
         
         if exercise_type == 'qcm':
-            errors.extend(self._validate_qcm(exercise))
+            errors.extend(self._validate_qcm(exercise, text))
         elif exercise_type == 'vrai-faux':
-            errors.extend(self._validate_true_false(exercise))
+            errors.extend(self._validate_true_false(exercise, text))
         elif exercise_type == 'calcul':
-            errors.extend(self._validate_calculation(exercise))
+            errors.extend(self._validate_calculation(exercise, text))
         
         # Vérifications de qualité
-        warnings.extend(self._validate_quality(exercise))
+        warnings.extend(self._validate_quality(exercise, text))
         
         return len(errors) == 0, errors, warnings
     
-    def _validate_qcm(self, exercise: Dict[str, Any]) -> List[str]:
+    def _validate_qcm(self, exercise: Dict[str, Any], text: ExerciseText) -> List[str]:
         """Valider un exercice QCM"""
         errors = []
         
@@ -60,15 +206,14 @@ class ExerciseValidator:
             errors.append("Les options doivent être un objet JSON")
         else:
             # Vérifier les clés des options
-            expected_keys = ['A', 'B', 'C', 'D']
             actual_keys = list(options.keys())
             
-            if not all(key in actual_keys for key in expected_keys):
-                errors.append(f"Options manquantes. Attendu: {expected_keys}, Reçu: {actual_keys}")
+            if not all(key in options for key in QCM_OPTION_KEYS):
+                errors.append(f"Options manquantes. Attendu: {QCM_OPTION_KEYS}, Reçu: {actual_keys}")
             
             # Vérifier que la réponse correspond à une option
-            answer = exercise.get('answer', '').upper()
-            if answer not in actual_keys:
+            answer = text.answer.upper()
+            if answer not in options:
                 errors.append(f"La réponse '{answer}' ne correspond à aucune option")
             
             # Vérifier que les options ne sont pas vides
@@ -78,41 +223,36 @@ class ExerciseValidator:
         
         return errors
     
-    def _validate_true_false(self, exercise: Dict[str, Any]) -> List[str]:
+    def _validate_true_false(self, exercise: Dict[str, Any], text: ExerciseText) -> List[str]:
         """Valider un exercice vrai/faux"""
         errors = []
         
-        answer = exercise.get('answer', '').lower()
-        if answer not in ['vrai', 'faux', 'true', 'false']:
+        if text.answer_lower not in TRUE_FALSE_ANSWERS:
             errors.append("La réponse doit être 'Vrai' ou 'Faux'")
         
         return errors
     
-    def _validate_calculation(self, exercise: Dict[str, Any]) -> List[str]:
+    def _validate_calculation(self, exercise: Dict[str, Any], text: ExerciseText) -> List[str]:
         """Valider un exercice de calcul"""
         errors = []
         
-        body = exercise.get('body', '')
-        answer = exercise.get('answer', '')
-        
         # Vérifier la présence de termes mathématiques
-        math_terms = ['calculer', 'résoudre', 'trouver', 'déterminer', 'évaluer']
-        if not any(term in body.lower() for term in math_terms):
+        if not MATH_TERMS.search(text.body_lower):
             errors.append("L'énoncé d'un exercice de calcul doit contenir un verbe d'action mathématique")
         
         # Vérifier que la réponse contient des éléments mathématiques
-        if not re.search(r'[\d\+\-\*/\=\(\)]', answer):
+        if not MATH_ANSWER.search(text.answer):
             errors.append("La réponse d'un exercice de calcul doit contenir des éléments mathématiques")
         
         return errors
     
-    def _validate_quality(self, exercise: Dict[str, Any]) -> List[str]:
+    def _validate_quality(self, exercise: Dict[str, Any], text: ExerciseText) -> List[str]:
         """Valider la qualité générale de l'exercice"""
         warnings = []
         
-        body = exercise.get('body', '')
-        answer = exercise.get('answer', '')
-        explanation = exercise.get('explanation', '')
+        body = text.body
+        answer = text.answer
+        explanation = text.explanation
         
         # Longueur de l'énoncé
         if len(body) < 10:
@@ -130,7 +270,7 @@ class ExerciseValidator:
         difficulty = exercise.get('difficulty', '')
         if not difficulty:
             warnings.append("Aucune difficulté spécifiée")
-        elif difficulty not in ['facile', 'moyen', 'difficile']:
+        elif difficulty not in VALID_DIFFICULTIES:
             warnings.append(f"Difficulté non standard: {difficulty}")
         
         # Tags
@@ -141,21 +281,20 @@ class ExerciseValidator:
         # Cohérence réponse/énoncé
         if body and answer:
             # Vérifier si la réponse est trop similaire à l'énoncé
-            if answer.lower() in body.lower() and len(answer) > 5:
+            if len(answer) > 5 and text.answer_lower in text.body_lower:
                 warnings.append("La réponse semble contenue dans l'énoncé")
         
         return warnings
     
-    def validate_file(self, file_path: str) -> Dict[str, Any]:
+    def validate_file(self, file_path: str, workers: int = 1) -> Dict[str, Any]:
         """Valider un fichier d'exercices"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                exercises = json.load(f)
+            exercises = read_exercise_file(file_path)
             
             if not isinstance(exercises, list):
                 exercises = [exercises]
             
-            return self.validate_exercises(exercises)
+            return self.validate_exercises(exercises, workers)
             
         except FileNotFoundError:
             return {
@@ -172,8 +311,14 @@ class ExerciseValidator:
                 'statistics': {}
             }
     
-    def validate_exercises(self, exercises: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Valider une liste d'exercices"""
+    def validate_exercises(self, exercises: List[Dict[str, Any]], workers: int = 1) -> Dict[str, Any]:
+        """
+        Valider une liste d'exercices
+        
+        workers > 1: la liste est découpée en tranches validées par autant de
+        processus (au plus une tranche par MIN_CHUNK_SIZE exercices); les
+        messages restent dans l'ordre des exercices.
+        """
         self.errors = []
         self.warnings = []
         self.validated_exercises = []
@@ -181,9 +326,16 @@ class ExerciseValidator:
         valid_count = 0
         invalid_count = 0
         
-        for i, exercise in enumerate(exercises, 1):
-            is_valid, errors, warnings = self.validate_exercise(exercise)
-            
+        chunks = _split_chunks(exercises, workers)
+        if len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                # map() conserve l'ordre des tranches, donc celui des exercices
+                results = [result for chunk_results in executor.map(_validate_chunk_worker, chunks)
+                           for result in chunk_results]
+        else:
+            results = map(self.validate_exercise, exercises)
+        
+        for i, (exercise, (is_valid, errors, warnings)) in enumerate(zip(exercises, results), 1):
             if is_valid:
                 valid_count += 1
                 self.validated_exercises.append(exercise)
@@ -208,53 +360,100 @@ class ExerciseValidator:
         }
     
     def _generate_statistics(self, exercises: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Générer des statistiques sur les exercices"""
+        """Générer des statistiques sur les exercices (colonnes NumPy si disponible)"""
+        if importlib.util.find_spec('numpy') is None:
+            # Sans numpy: même résultat, un exercice à la fois
+            collector = StatisticsCollector()
+            for exercise in exercises:
+                collector.add(exercise)
+            return collector.statistics()
+        
+        from corpus_stats import ColumnarSummary
+        summary = ColumnarSummary(exercises)
         stats = {
-            'total': len(exercises),
-            'by_type': {},
-            'by_difficulty': {},
-            'with_explanations': 0,
-            'with_tags': 0,
+            'total': summary.size,
+            'by_type': summary.counts('type'),
+            'by_difficulty': summary.counts('difficulty'),
+            'with_explanations': summary.count_present('explanation'),
+            'with_tags': summary.count_present('tags'),
             'average_body_length': 0,
             'average_explanation_length': 0
         }
         
-        total_body_length = 0
-        total_explanation_length = 0
-        explanations_count = 0
-        
-        for exercise in exercises:
-            # Par type
-            ex_type = exercise.get('type', 'unknown')
-            stats['by_type'][ex_type] = stats['by_type'].get(ex_type, 0) + 1
-            
-            # Par difficulté
-            difficulty = exercise.get('difficulty', 'unknown')
-            stats['by_difficulty'][difficulty] = stats['by_difficulty'].get(difficulty, 0) + 1
-            
-            # Avec explications
-            if exercise.get('explanation'):
-                stats['with_explanations'] += 1
-                total_explanation_length += len(exercise['explanation'])
-                explanations_count += 1
-            
-            # Avec tags
-            if exercise.get('tags'):
-                stats['with_tags'] += 1
-            
-            # Longueur moyenne
-            body = exercise.get('body', '')
-            total_body_length += len(body)
-        
         # Calculer les moyennes
-        if exercises:
-            stats['average_body_length'] = round(total_body_length / len(exercises), 1)
+        if summary.size:
+            stats['average_body_length'] = round(summary.mean_length('body'), 1)
         
-        if explanations_count > 0:
-            stats['average_explanation_length'] = round(total_explanation_length / explanations_count, 1)
+        if stats['with_explanations'] > 0:
+            stats['average_explanation_length'] = round(summary.mean_length('explanation', present_only=True), 1)
         
         return stats
     
+    def validate_stream(self, file_path: str, output_file: Optional[str] = None,
+                        fix: bool = False, sample_size: int = DEFAULT_SAMPLE_SIZE) -> Dict[str, Any]:
+        """
+        Valider un fichier exercice par exercice, sans le charger en entier
+        
+        Les exercices valides sont écrits au fil de l'eau dans output_file
+        (JSONL, un exercice par ligne); fix applique fix_common_issues à chaque
+        exercice avant sa validation. Les erreurs et avertissements sont
+        comptés par message, avec les sample_size premiers exemples: la
+        mémoire utilisée ne dépend pas de la taille du fichier.
+        """
+        errors = MessageSummary(sample_size)
+        warnings = MessageSummary(sample_size)
+        collector = StatisticsCollector()
+        valid_count = 0
+        invalid_count = 0
+        file_error = False
+        
+        output = open(output_file, 'w', encoding='utf-8') if output_file else None
+        try:
+            for i, exercise in enumerate(iter_exercise_file(file_path), 1):
+                if fix:
+                    exercise = self.fix_common_issues([exercise])[0]
+                
+                is_valid, exercise_errors, exercise_warnings = self.validate_exercise(exercise)
+                collector.add(exercise)
+                
+                if is_valid:
+                    valid_count += 1
+                    if output:
+                        output.write(json.dumps(exercise, ensure_ascii=False) + '\n')
+                else:
+                    invalid_count += 1
+                    for error in exercise_errors:
+                        errors.add(i, error)
+                
+                for warning in exercise_warnings:
+                    warnings.add(i, warning)
+        
+        except FileNotFoundError:
+            file_error = True
+            errors.add(0, f"Fichier non trouvé: {file_path}")
+        except json.JSONDecodeError as e:
+            # Les exercices lus avant l'erreur restent écrits dans output_file
+            file_error = True
+            errors.add(0, f"Erreur de format JSON: {e}")
+        finally:
+            if output:
+                output.close()
+        
+        return {
+            'valid': invalid_count == 0 and not file_error,
+            'valid_count': valid_count,
+            'invalid_count': invalid_count,
+            'total_count': collector.total,
+            'errors': errors.samples,
+            'warnings': warnings.samples,
+            'error_total': errors.total,
+            'warning_total': warnings.total,
+            'error_counts': errors.counts,
+            'warning_counts': warnings.counts,
+            'statistics': collector.statistics(),
+            'validated_exercises': []
+        }
+    
     def fix_common_issues(self, exercises: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Corriger automatiquement les problèmes courants"""
         fixed_exercises = []
@@ -264,12 +463,12 @@ class ExerciseValidator:
             
             # Corriger la casse des types
             ex_type = fixed_exercise.get('type', '').lower()
-            if ex_type in ['qcm', 'libre', 'vrai-faux', 'calcul']:
+            if ex_type in VALID_TYPES:
                 fixed_exercise['type'] = ex_type
             
             # Corriger la casse des difficultés
             difficulty = fixed_exercise.get('difficulty', '').lower()
-            if difficulty in ['facile', 'moyen', 'difficile']:
+            if difficulty in VALID_DIFFICULTIES:
                 fixed_exercise['difficulty'] = difficulty
             
             # Nettoyer les espaces
@@ -310,7 +509,8 @@ class ExerciseValidator:
         report.append(f"   Total d'exercices: {validation_result['total_count']}")
         report.append(f"   ✅ Valides: {validation_result['valid_count']}")
         report.append(f"   ❌ Invalides: {validation_result['invalid_count']}")
-        report.append(f"   ⚠️  Avertissements: {len(validation_result['warnings'])}")
+        warning_total = validation_result.get('warning_total', len(validation_result['warnings']))
+        report.append(f"   ⚠️  Avertissements: {warning_total}")
         report.append("")
         
         # Statistiques
@@ -325,6 +525,19 @@ class ExerciseValidator:
             report.append(f"   Longueur moyenne explication: {stats['average_explanation_length']} caractères")
         report.append("")
         
+        # Messages comptés (validation en flux)
+        for title, key in (("❌ ERREURS PAR TYPE:", 'error_counts'), ("⚠️  AVERTISSEMENTS PAR TYPE:", 'warning_counts')):
+            counts = validation_result.get(key)
+            if counts:
+                report.append(title)
+                for message, count in sorted(counts.items(), key=lambda item: -item[1]):
+                    report.append(f"   {count:>8} × {message}")
+                report.append("")
+        if 'error_counts' in validation_result and (validation_result['errors'] or validation_result['warnings']):
+            report.append(f"   (exemples: les {len(validation_result['errors'])} premières erreurs "
+                          f"et les {len(validation_result['warnings'])} premiers avertissements)")
+            report.append("")
+        
         # Erreurs
         if validation_result['errors']:
             report.append("❌ ERREURS:")
@@ -343,7 +556,7 @@ class ExerciseValidator:
         report.append("💡 RECOMMANDATIONS:")
         if validation_result['invalid_count'] > 0:
             report.append("   • Corriger les erreurs avant l'import")
-        if len(validation_result['warnings']) > validation_result['total_count'] * 0.5:
+        if warning_total > validation_result['total_count'] * 0.5:
             report.append("   • Améliorer la qualité générale des exercices")
         if stats['with_explanations'] < stats['total'] * 0.8:
             report.append("   • Ajouter des explications pour plus d'exercices")
@@ -356,6 +569,79 @@ class ExerciseValidator:
         return "\n".join(report)
 
 
+def _split_chunks(exercises: List[Dict[str, Any]], workers: int) -> List[List[Dict[str, Any]]]:
+    """Découper la liste en tranches contiguës, une par processus (d'au moins MIN_CHUNK_SIZE)"""
+    workers = max(1, min(workers, len(exercises) // MIN_CHUNK_SIZE))
+    chunk_size, remainder = divmod(len(exercises), workers)
+    
+    chunks = []
+    first = 0
+    for i in range(workers):
+        last = first + chunk_size + (1 if i < remainder else 0)
+        chunks.append(exercises[first:last])
+        first = last
+    
+    return chunks
+
+
+def _validate_chunk_worker(exercises: List[Dict[str, Any]]) -> List[Tuple[bool, List[str], List[str]]]:
+    """Point d'entrée d'un processus: résultats de validate_exercise pour la tranche"""
+    validator = ExerciseValidator()
+    return [validator.validate_exercise(exercise) for exercise in exercises]
+
+
+def run_benchmark(file_path: str, size: int = 50000, workers: int = 4):
+    """Valider un corpus de `size` exercices (fichier répété) sur 1 puis `workers` processus"""
+    exercises = read_exercise_file(file_path)
+    if not isinstance(exercises, list):
+        exercises = [exercises]
+    if not exercises:
+        print(f"❌ Aucun exercice dans {file_path}")
+        sys.exit(1)
+    exercises = (exercises * (size // len(exercises) + 1))[:size]
+    
+    validator = ExerciseValidator()
+    print(f"Validation de {len(exercises)} exercices ({file_path} repete)")
+    for worker_count in sorted({1, max(1, workers)}):
+        start = time.perf_counter()
+        result = validator.validate_exercises(exercises, worker_count)
+        elapsed = time.perf_counter() - start
+        print(f"   {worker_count} processus: {elapsed:6.2f}s "
+              f"({result['invalid_count']} invalides, {len(result['warnings'])} avertissements)")
+    
+    # Mémoire: chargement complet (validate_file sans cache) contre validation en flux
+    import tempfile
+    import tracemalloc
+    
+    with tempfile.TemporaryDirectory(prefix='exercise_validator_') as tmp_dir:
+        json_file = os.path.join(tmp_dir, 'corpus.json')
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(exercises, f, ensure_ascii=False)
+        del exercises
+        
+        def load_and_validate():
+            with open(json_file, 'r', encoding='utf-8') as f:
+                return validator.validate_exercises(json.load(f))
+        
+        def stream():
+            return validator.validate_stream(json_file, os.path.join(tmp_dir, 'valides.jsonl'))
+        
+        print(f"Memoire ({os.path.getsize(json_file) / 1e6:.1f} Mo de JSON):")
+        for label, function in (('json.load + validate_exercises', load_and_validate),
+                                ('validate_stream', stream)):
+            tracemalloc.start()
+            try:
+                start = time.perf_counter()
+                function()
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            # Libérer les résultats du premier passage avant de mesurer le suivant
+            validator.__init__()
+            print(f"   {label:<32} pic {peak / 1e6:7.1f} Mo  ({elapsed:.2f}s sous tracemalloc)")
+
+
 def main():
     """Interface en ligne de commande"""
     import argparse
@@ -365,6 +651,16 @@ def main():
     parser.add_argument('--fix', action='store_true', help='Corriger automatiquement les problèmes courants')
     parser.add_argument('--output', help='Fichier de sortie pour les exercices corrigés')
     parser.add_argument('--report', help='Fichier de rapport de validation')
+    parser.add_argument('--stream', action='store_true',
+                       help='Valider en flux (fichiers volumineux): compteurs et exemples d\'erreurs')
+    parser.add_argument('--valid-output',
+                       help='Avec --stream: fichier JSONL recevant les exercices valides')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Nombre de processus de validation (gros fichiers)')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Mesurer la validation d\'un corpus de --size exercices')
+    parser.add_argument('--size', type=int, default=50000,
+                       help='Taille du corpus du benchmark (le fichier est repete)')
     
     args = parser.parse_args()
     
@@ -372,11 +668,28 @@ def main():
         print("❌ Veuillez spécifier un fichier avec --file")
         return
     
+    if args.benchmark:
+        run_benchmark(args.file, args.size, args.workers)
+        return
+    
     validator = ExerciseValidator()
     
+    if args.stream:
+        print(f"🔍 Validation en flux du fichier: {args.file}")
+        result = validator.validate_stream(args.file, args.valid_output, fix=args.fix)
+        report = validator.generate_report(result)
+        print(report)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                f.write(report)
+            print(f"📄 Rapport sauvegardé: {args.report}")
+        if args.valid_output:
+            print(f"✅ {result['valid_count']} exercices valides écrits: {args.valid_output}")
+        return
+    
     # Valider le fichier
     print(f"🔍 Validation du fichier: {args.file}")
-    result = validator.validate_file(args.file)
+    result = validator.validate_file(args.file, args.workers)
     
     # Afficher le rapport
     report = validator.generate_report(result)
@@ -393,8 +706,7 @@ def main():
         print("\n🔧 Correction automatique des problèmes...")
         
         # Charger les exercices originaux
-        with open(args.file, 'r', encoding='utf-8') as f:
-            original_exercises = json.load(f)
+        original_exercises = read_exercise_file(args.file)
         
         if not isinstance(original_exercises, list):
             original_exercises = [original_exercises]
@@ -411,7 +723,7 @@ def main():
         
         # Re-valider les exercices corrigés
         print("\n🔍 Re-validation des exercices corrigés...")
-        fixed_result = validator.validate_exercises(fixed_exercises)
+        fixed_result = validator.validate_exercises(fixed_exercises, args.workers)
         fixed_report = validator.generate_report(fixed_result)
         print(fixed_report)
 
@@ -8,14 +8,7 @@ import os
 import sys
 import json
 import re
-from typing import List, Dict, Any, Tuple, Optional
-
-try:
-    import pdfplumber
-except ImportError:
-    print("❌ Le module pdfplumber n'est pas installé.")
-    print("📦 Installez-le avec: pip install pdfplumber")
-    sys.exit(1)
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Set
 
 try:
     import psycopg2
@@ -31,17 +24,18 @@ except ImportError:
     print("⚠️  Le module python-dotenv n'est pas installé.")
     load_dotenv = lambda: None
 
+from page_cache import PageTextCache, iter_page_texts, open_cache
+from chapter_stream import iter_chapter_sections
+from exercise_segmenter import segment_exercises
+from text_normalizer import normalize_text
+from bulk_import import course_row, upsert_courses
+from db_connection import get_db_connection
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration de la base de données
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', 5432),
-    'database': os.getenv('DB_NAME', 'mathia_db'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', '')
-}
+# Variante du cache de pages pour le texte nettoyé par _clean_text
+CLEAN_VARIANT = 'ligatures-v1'
 
 
 class Manual6emeExtractor:
@@ -52,39 +46,124 @@ class Manual6emeExtractor:
         self.exercises = []
         self.current_chapter = None
         
-    def extract_from_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def extract_from_pdf(self, pdf_path: str, cache: Optional[PageTextCache] = None) -> Dict[str, Any]:
         """Extraire le contenu du PDF et identifier les chapitres"""
         print(f"Extraction du contenu depuis: {pdf_path}")
         
-        with pdfplumber.open(pdf_path) as pdf:
-            all_text = ""
-            page_texts = []
-            
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text()
+        page_texts = []
+        
+        for page_num, page_text in iter_page_texts(pdf_path, cleaner=self._clean_text,
+                                                   variant=CLEAN_VARIANT, cache=cache):
+            if page_text:
+                page_texts.append({
+                    'page': page_num,
+                    'text': page_text
+                })
+        
+        all_text = "".join(
+            f"\n--- PAGE {page['page']} ---\n{page['text']}\n" for page in page_texts
+        )
+        
+        print(f"OK: {len(page_texts)} pages extraites")
+        
+        # Identifier les chapitres
+        chapters = self._identify_chapters(all_text, page_texts)
+        
+        # Extraire les exercices par chapitre
+        exercises_by_chapter = self._extract_exercises_by_chapter(all_text, chapters)
+        
+        return {
+            'chapters': chapters,
+            'exercises_by_chapter': exercises_by_chapter,
+            'total_pages': len(page_texts)
+        }
+    
+    def _clean_text(self, text: str) -> str:
+        """Recoller les ligatures coupées (les accents sont conservés)"""
+        return normalize_text(text, fold_accents=False)
+    
+    def iter_chapters(self, pdf_path: str,
+                      cache: Optional[PageTextCache] = None) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Mode streaming: produire (chapitre, exercices) dès qu'un chapitre est terminé"""
+        self.pages_read = 0
+        
+        def pages():
+            for page_num, page_text in iter_page_texts(pdf_path, cleaner=self._clean_text,
+                                                       variant=CLEAN_VARIANT, cache=cache):
                 if page_text:
-                    page_texts.append({
-                        'page': page_num,
-                        'text': page_text
-                    })
-                    all_text += f"\n--- PAGE {page_num} ---\n{page_text}\n"
-            
-            print(f"OK: {len(page_texts)} pages extraites")
-            
-            # Identifier les chapitres
-            chapters = self._identify_chapters(all_text, page_texts)
+                    self.pages_read += 1
+                yield page_num, page_text
+        
+        for chapter, chapter_text in iter_chapter_sections(pages(), self._find_chapter_headings):
+            if chapter is None:
+                # Aucun chapitre détecté: même repli que le mode complet
+                print("Aucun chapitre detecte, creation de chapitres generiques...")
+                generic_chapters = self._create_generic_chapters(chapter_text)
+                sections = self._split_text_by_chapters(chapter_text, generic_chapters)
+                for generic_chapter in generic_chapters:
+                    section_text = sections[f"chapitre_{generic_chapter['number']}"]
+                    yield generic_chapter, self._extract_closed_chapter(section_text, generic_chapter)
+                return
             
-            # Extraire les exercices par chapitre
-            exercises_by_chapter = self._extract_exercises_by_chapter(all_text, chapters)
+            yield chapter, self._extract_closed_chapter(chapter_text, chapter)
+    
+    def _extract_closed_chapter(self, chapter_text: str, chapter: Dict) -> List[Dict[str, Any]]:
+        """Extraire les exercices d'un chapitre terminé et afficher la progression"""
+        exercises = self._extract_exercises_from_text(chapter_text, chapter) if chapter_text else []
+        print(f"Chapitre {chapter['number']} ({chapter['title']}): {len(exercises)} exercices extraits")
+        return exercises
+    
+    def extract_streaming(self, pdf_path: str, output_dir: Optional[str] = None,
+                          cache: Optional[PageTextCache] = None) -> Dict[str, Any]:
+        """Extraire chapitre par chapitre, en sauvegardant chaque chapitre dès qu'il est prêt"""
+        print(f"Extraction en streaming depuis: {pdf_path}")
+        
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        chapters = []
+        exercise_counts = {}
+        
+        for chapter, exercises in self.iter_chapters(pdf_path, cache=cache):
+            chapter_key = f"chapitre_{chapter['number']}"
+            chapters.append(chapter)
+            exercise_counts[chapter_key] = len(exercises)
             
-            return {
-                'chapters': chapters,
-                'exercises_by_chapter': exercises_by_chapter,
-                'total_pages': len(page_texts)
-            }
+            if output_dir and exercises:
+                self._save_chapter_exercises(chapter_key, exercises, output_dir)
+        
+        print(f"OK: {self.pages_read} pages extraites")
+        
+        if output_dir:
+            self._save_summary(chapters, exercise_counts, output_dir)
+            print(f"Resultats sauvegardes dans: {output_dir}")
+        
+        return {
+            'chapters': chapters,
+            'exercise_counts': exercise_counts,
+            'total_pages': self.pages_read
+        }
     
     def _identify_chapters(self, text: str, page_texts: List[Dict]) -> List[Dict[str, Any]]:
         """Identifier les chapitres dans le manuel"""
+        chapters = self._find_chapter_headings(text, set())
+        
+        # Trier par position dans le texte
+        chapters.sort(key=lambda x: x['position'])
+        
+        # Si pas de chapitres trouvés, créer des chapitres génériques
+        if not chapters:
+            print("Aucun chapitre detecte, creation de chapitres generiques...")
+            chapters = self._create_generic_chapters(text)
+        
+        print(f"{len(chapters)} chapitres identifies:")
+        for chapter in chapters:
+            print(f"   {chapter['number']}. {chapter['title']}")
+        
+        return chapters
+    
+    def _find_chapter_headings(self, text: str, seen_titles: Set[str]) -> List[Dict[str, Any]]:
+        """Trouver les titres de chapitres d'un texte (seen_titles est complété au passage)"""
         chapters = []
         
         # Patterns pour identifier les chapitres
@@ -96,7 +175,6 @@ class Manual6emeExtractor:
             r'Module\s+(\d+)[:.\s]+([^\n]+)'
         ]
         
-        # Rechercher dans tout le texte
         for pattern in chapter_patterns:
             matches = re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE)
             for match in matches:
@@ -107,25 +185,14 @@ class Manual6emeExtractor:
                 chapter_title = re.sub(r'[^\w\s\-àâäéèêëïîôöùûüÿç]', '', chapter_title)
                 chapter_title = ' '.join(chapter_title.split())
                 
-                if len(chapter_title) > 3 and chapter_title not in [ch['title'] for ch in chapters]:
+                if len(chapter_title) > 3 and chapter_title not in seen_titles:
+                    seen_titles.add(chapter_title)
                     chapters.append({
                         'number': int(chapter_num),
                         'title': chapter_title,
                         'position': match.start()
                     })
         
-        # Trier par position dans le texte
-        chapters.sort(key=lambda x: x['position'])
-        
-        # Si pas de chapitres trouvés, créer des chapitres génériques
-        if not chapters:
-            print("Aucun chapitre detecte, creation de chapitres generiques...")
-            chapters = self._create_generic_chapters(text)
-        
-        print(f"{len(chapters)} chapitres identifies:")
-        for chapter in chapters:
-            print(f"   {chapter['number']}. {chapter['title']}")
-        
         return chapters
     
     def _create_generic_chapters(self, text: str) -> List[Dict[str, Any]]:
@@ -153,7 +220,7 @@ class Manual6emeExtractor:
         
         return chapters
     
-    def _extract_exercices_by_chapter(self, text: str, chapters: List[Dict]) -> Dict[str, List[Dict]]:
+    def _extract_exercises_by_chapter(self, text: str, chapters: List[Dict]) -> Dict[str, List[Dict]]:
         """Extraire les exercices organisés par chapitre"""
         exercises_by_chapter = {}
         
@@ -212,23 +279,11 @@ class Manual6emeExtractor:
         """Extraire les exercices d'un texte de chapitre"""
         exercises = []
         
-        # Patterns pour les exercices
-        exercise_patterns = [
-            r'Exercice\s+(\d+)[:.\s]*(.*?)(?=Exercice\s+\d+|$)',
-            r'(\d+)[:.\s]*(.*?)(?=\d+[:.]|$)',
-        ]
-        
-        for pattern in exercise_patterns:
-            matches = re.finditer(pattern, text, re.DOTALL | re.IGNORECASE)
-            
-            for match in matches:
-                exercise_num = match.group(1)
-                content = match.group(2).strip()
-                
-                if len(content) > 20:  # Filtrer les contenus trop courts
-                    exercise = self._format_exercise(content, exercise_num, chapter)
-                    if exercise:
-                        exercises.append(exercise)
+        # Découpage en un seul passage, sans doublons (contenus trop courts filtrés)
+        for exercise_num, content in segment_exercises(text, ('Exercice',), min_length=20):
+            exercise = self._format_exercise(content, exercise_num, chapter)
+            if exercise:
+                exercises.append(exercise)
         
         return exercises
     
@@ -333,99 +388,72 @@ class Manual6emeExtractor:
         """Sauvegarder les résultats"""
         os.makedirs(output_dir, exist_ok=True)
         
-        # Sauvegarder les chapitres
-        chapters_file = os.path.join(output_dir, 'chapitres_6eme.json')
-        with open(chapters_file, 'w', encoding='utf-8') as f:
-            json.dump(results['chapters'], f, ensure_ascii=False, indent=2)
-        
         # Sauvegarder les exercices par chapitre
         for chapter_key, exercises in results['exercises_by_chapter'].items():
             if exercises:
-                exercises_file = os.path.join(output_dir, f'{chapter_key}_exercices.json')
-                with open(exercises_file, 'w', encoding='utf-8') as f:
-                    json.dump(exercises, f, ensure_ascii=False, indent=2)
+                self._save_chapter_exercises(chapter_key, exercises, output_dir)
+        
+        exercise_counts = {
+            chapter_key: len(exercises) 
+            for chapter_key, exercises in results['exercises_by_chapter'].items()
+        }
+        summary = self._save_summary(results['chapters'], exercise_counts, output_dir)
+        
+        print(f"Resultats sauvegardes dans: {output_dir}")
+        return summary
+    
+    def _save_chapter_exercises(self, chapter_key: str, exercises: List[Dict[str, Any]], output_dir: str):
+        """Sauvegarder les exercices d'un chapitre"""
+        exercises_file = os.path.join(output_dir, f'{chapter_key}_exercices.json')
+        with open(exercises_file, 'w', encoding='utf-8') as f:
+            json.dump(exercises, f, ensure_ascii=False, indent=2)
+    
+    def _save_summary(self, chapters: List[Dict], exercise_counts: Dict[str, int], output_dir: str) -> Dict[str, Any]:
+        """Sauvegarder la liste des chapitres et un résumé de l'extraction"""
+        # Sauvegarder les chapitres
+        chapters_file = os.path.join(output_dir, 'chapitres_6eme.json')
+        with open(chapters_file, 'w', encoding='utf-8') as f:
+            json.dump(chapters, f, ensure_ascii=False, indent=2)
         
         # Sauvegarder un résumé
         summary = {
-            'total_chapters': len(results['chapters']),
-            'total_exercises': sum(len(exercises) for exercises in results['exercises_by_chapter'].values()),
-            'exercises_by_chapter': {
-                chapter_key: len(exercises) 
-                for chapter_key, exercises in results['exercises_by_chapter'].items()
-            },
-            'chapters': results['chapters']
+            'total_chapters': len(chapters),
+            'total_exercises': sum(exercise_counts.values()),
+            'exercises_by_chapter': exercise_counts,
+            'chapters': chapters
         }
         
         summary_file = os.path.join(output_dir, 'resume_extraction.json')
         with open(summary_file, 'w', encoding='utf-8') as f:
             json.dump(summary, f, ensure_ascii=False, indent=2)
         
-        print(f"Resultats sauvegardes dans: {output_dir}")
         return summary
 
 
-def get_db_connection():
-    """Créer une connexion à la base de données PostgreSQL"""
-    try:
-        database_url = os.getenv('DATABASE_URL')
-        if database_url:
-            conn = psycopg2.connect(database_url)
-        else:
-            conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        print(f"Erreur de connexion a la base de donnees: {e}")
-        return None
-
-
 def create_courses_for_chapters(chapters: List[Dict], conn) -> Dict[int, int]:
     """Créer les cours correspondants aux chapitres"""
     if not conn:
         print("Pas de connexion a la base de donnees")
         return {}
     
-    cursor = conn.cursor()
     chapter_to_course_id = {}
     
     try:
-        for chapter in chapters:
-            # Vérifier si le cours existe déjà
-            cursor.execute(
-                "SELECT id FROM courses WHERE title = %s AND grade = %s",
-                (chapter['title'], '6ème')
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                course_id = existing[0]
-                print(f"Cours existant trouve: {chapter['title']} (ID: {course_id})")
+        # Tous les chapitres en un seul aller-retour
+        titles = {chapter['number']: chapter['title'] for chapter in chapters}
+        rows = [course_row(chapter) for chapter in chapters]
+        for number, course_id, created in upsert_courses(conn, rows):
+            if created:
+                print(f"Nouveau cours cree: {titles[number]} (ID: {course_id})")
             else:
-                # Créer le nouveau cours
-                cursor.execute(
-                    """
-                    INSERT INTO courses (title, grade, chapter, description, "createdAt", "updatedAt")
-                    VALUES (%s, %s, %s, %s, NOW(), NOW())
-                    RETURNING id
-                    """,
-                    (
-                        chapter['title'],
-                        '6eme',
-                        f"Chapitre {chapter['number']}",
-                        f"Chapitre {chapter['number']} du manuel de mathematiques 6eme"
-                    )
-                )
-                course_id = cursor.fetchone()[0]
-                print(f"Nouveau cours cree: {chapter['title']} (ID: {course_id})")
-            
-            chapter_to_course_id[chapter['number']] = course_id
+                print(f"Cours existant trouve: {titles[number]} (ID: {course_id})")
+            chapter_to_course_id[number] = course_id
         
         conn.commit()
-        cursor.close()
         return chapter_to_course_id
         
     except Exception as e:
         conn.rollback()
-        cursor.close()
         print(f"Erreur lors de la creation des cours: {e}")
         return {}
 
@@ -510,9 +538,16 @@ def main():
                        help='Importer directement dans la base de données')
     parser.add_argument('--no-save', action='store_true', 
                        help='Ne pas sauvegarder les fichiers JSON')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ne pas utiliser le cache du texte des pages')
+    parser.add_argument('--stream', action='store_true',
+                       help='Traiter le manuel chapitre par chapitre (mémoire bornée par un chapitre)')
     
     args = parser.parse_args()
     
+    if args.stream and args.import_db:
+        parser.error("--stream ne conserve pas les exercices en mémoire: importez les fichiers JSON produits")
+    
     print('='*60)
     print('Extracteur du manuel de mathematiques 6eme')
     print('='*60 + '\n')
@@ -524,25 +559,42 @@ def main():
     
     # Extraire le contenu
     extractor = Manual6emeExtractor()
-    results = extractor.extract_from_pdf(args.pdf)
+    cache = open_cache(not args.no_cache)
+    try:
+        if args.stream:
+            output_dir = None if args.no_save else args.output
+            results = extractor.extract_streaming(args.pdf, output_dir, cache=cache)
+        else:
+            results = extractor.extract_from_pdf(args.pdf, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
     
     # Afficher le résumé
     print(f"\nRESUME DE L'EXTRACTION:")
     print(f"   Pages analysees: {results['total_pages']}")
     print(f"   Chapitres identifies: {len(results['chapters'])}")
     
-    total_exercises = sum(len(exercises) for exercises in results['exercises_by_chapter'].values())
+    if 'exercise_counts' in results:
+        exercise_counts = results['exercise_counts']
+    else:
+        exercise_counts = {
+            chapter_key: len(exercises)
+            for chapter_key, exercises in results['exercises_by_chapter'].items()
+        }
+    
+    total_exercises = sum(exercise_counts.values())
     print(f"   Exercices extraits: {total_exercises}")
     
     # Détail par chapitre
     print(f"\nDETAIL PAR CHAPITRE:")
     for chapter in results['chapters']:
         chapter_key = f"chapitre_{chapter['number']}"
-        exercises_count = len(results['exercises_by_chapter'].get(chapter_key, []))
+        exercises_count = exercise_counts.get(chapter_key, 0)
         print(f"   {chapter['number']}. {chapter['title']}: {exercises_count} exercices")
     
-    # Sauvegarder les résultats
-    if not args.no_save:
+    # Sauvegarder les résultats (déjà fait au fil de l'eau en mode streaming)
+    if not args.no_save and not args.stream:
         summary = extractor.save_results(results, args.output)
         print(f"\nFichiers sauvegardes dans: {args.output}")
     
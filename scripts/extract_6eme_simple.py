@@ -8,7 +8,8 @@ import os
 import sys
 import json
 import re
-from typing import List, Dict, Any, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Set
 
 try:
     import pdfplumber
@@ -30,6 +31,11 @@ try:
 except ImportError:
     load_dotenv = lambda: None
 
+from page_cache import PageTextCache, file_sha256, iter_page_texts, open_cache
+from chapter_stream import iter_chapter_sections
+from exercise_segmenter import segment_exercises
+from text_normalizer import normalize_text
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -42,6 +48,9 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', '')
 }
 
+# Variante du cache de pages pour le texte nettoyé par _clean_text
+CLEAN_VARIANT = 'ascii-v2'
+
 
 class Simple6emeExtractor:
     """Extracteur simplifié pour le manuel de mathématiques 6ème"""
@@ -50,68 +59,172 @@ class Simple6emeExtractor:
         self.chapters = []
         self.exercises = []
         
-    def extract_from_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def extract_from_pdf(self, pdf_path: str, workers: int = 1,
+                         cache: Optional[PageTextCache] = None) -> Dict[str, Any]:
         """Extraire le contenu du PDF et identifier les chapitres"""
         print(f"Extraction du contenu depuis: {pdf_path}")
         
-        with pdfplumber.open(pdf_path) as pdf:
-            all_text = ""
-            page_texts = []
-            
-            for page_num, page in enumerate(pdf.pages, 1):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        # Nettoyer le texte des caractères problématiques
-                        page_text = self._clean_text(page_text)
-                        page_texts.append({
-                            'page': page_num,
-                            'text': page_text
-                        })
-                        all_text += f"\n--- PAGE {page_num} ---\n{page_text}\n"
-                except Exception as e:
-                    print(f"Erreur page {page_num}: {e}")
-                    continue
-            
-            print(f"OK: {len(page_texts)} pages extraites")
-            
-            # Identifier les chapitres
-            chapters = self._identify_chapters(all_text)
+        digest = file_sha256(pdf_path) if cache is not None else None
+        
+        if workers > 1:
+            page_texts = self._extract_pages_parallel(pdf_path, workers, cache, digest)
+        else:
+            page_texts = self._extract_pages(pdf_path, 1, None, cache, digest)
+        
+        all_text = "".join(
+            f"\n--- PAGE {page['page']} ---\n{page['text']}\n" for page in page_texts
+        )
+        
+        print(f"OK: {len(page_texts)} pages extraites")
+        
+        # Identifier les chapitres
+        chapters = self._identify_chapters(all_text)
+        
+        # Extraire les exercices par chapitre
+        exercises_by_chapter = self._extract_exercises_by_chapter(all_text, chapters)
+        
+        return {
+            'chapters': chapters,
+            'exercises_by_chapter': exercises_by_chapter,
+            'total_pages': len(page_texts)
+        }
+    
+    def _extract_pages(self, pdf_path: str, first_page: int, last_page: Optional[int],
+                       cache: Optional[PageTextCache] = None,
+                       digest: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Extraire et nettoyer le texte des pages first_page..last_page (incluses)"""
+        page_texts = []
+        
+        # Le nettoyage des caractères problématiques est mis en cache avec le texte
+        for page_num, page_text in iter_page_texts(pdf_path, cleaner=self._clean_text,
+                                                   variant=CLEAN_VARIANT, cache=cache,
+                                                   first_page=first_page, last_page=last_page,
+                                                   digest=digest):
+            if page_text:
+                page_texts.append({
+                    'page': page_num,
+                    'text': page_text
+                })
+        
+        return page_texts
+    
+    def _extract_pages_parallel(self, pdf_path: str, workers: int,
+                                cache: Optional[PageTextCache] = None,
+                                digest: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Répartir les pages entre plusieurs processus, puis les remettre dans l'ordre"""
+        total_pages = cache.get_page_count(digest) if cache is not None else None
+        if total_pages is None:
+            with pdfplumber.open(pdf_path) as pdf:
+                total_pages = len(pdf.pages)
+        
+        # Tout est déjà en cache: inutile de lancer des processus
+        if cache is not None and cache.has_pages(digest, 1, total_pages, CLEAN_VARIANT):
+            return self._extract_pages(pdf_path, 1, total_pages, cache, digest)
+        
+        page_ranges = _split_page_range(total_pages, workers)
+        print(f"Extraction parallele: {total_pages} pages sur {len(page_ranges)} processus")
+        
+        cache_path = cache.path if cache is not None else None
+        page_texts = []
+        with ProcessPoolExecutor(max_workers=len(page_ranges)) as executor:
+            # map() conserve l'ordre des plages, donc l'ordre des pages
+            for chunk in executor.map(_extract_page_range_worker,
+                                      [pdf_path] * len(page_ranges),
+                                      [first for first, _ in page_ranges],
+                                      [last for _, last in page_ranges],
+                                      [cache_path] * len(page_ranges),
+                                      [digest] * len(page_ranges)):
+                page_texts.extend(chunk)
+        
+        return page_texts
+    
+    def iter_chapters(self, pdf_path: str,
+                      cache: Optional[PageTextCache] = None) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """Mode streaming: produire (chapitre, exercices) dès qu'un chapitre est terminé"""
+        self.pages_read = 0
+        
+        def pages():
+            for page_num, page_text in iter_page_texts(pdf_path, cleaner=self._clean_text,
+                                                       variant=CLEAN_VARIANT, cache=cache):
+                if page_text:
+                    self.pages_read += 1
+                yield page_num, page_text
+        
+        for chapter, chapter_text in iter_chapter_sections(pages(), self._find_chapter_headings):
+            if chapter is None:
+                # Aucun chapitre détecté: même repli que le mode complet
+                print("Aucun chapitre detecte, creation de chapitres generiques...")
+                generic_chapters = self._create_generic_chapters()
+                sections = self._split_text_by_chapters(chapter_text, generic_chapters)
+                for generic_chapter in generic_chapters:
+                    section_text = sections[f"chapitre_{generic_chapter['number']}"]
+                    yield generic_chapter, self._extract_closed_chapter(section_text, generic_chapter)
+                return
             
-            # Extraire les exercices par chapitre
-            exercises_by_chapter = self._extract_exercises_by_chapter(all_text, chapters)
+            yield chapter, self._extract_closed_chapter(chapter_text, chapter)
+    
+    def _extract_closed_chapter(self, chapter_text: str, chapter: Dict) -> List[Dict[str, Any]]:
+        """Extraire les exercices d'un chapitre terminé et afficher la progression"""
+        exercises = self._extract_exercises_from_text(chapter_text, chapter) if chapter_text else []
+        print(f"Chapitre {chapter['number']} ({chapter['title']}): {len(exercises)} exercices extraits")
+        return exercises
+    
+    def extract_streaming(self, pdf_path: str, output_dir: Optional[str] = None,
+                          cache: Optional[PageTextCache] = None) -> Dict[str, Any]:
+        """Extraire chapitre par chapitre, en sauvegardant chaque chapitre dès qu'il est prêt"""
+        print(f"Extraction en streaming depuis: {pdf_path}")
+        
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        
+        chapters = []
+        exercise_counts = {}
+        
+        for chapter, exercises in self.iter_chapters(pdf_path, cache=cache):
+            chapter_key = f"chapitre_{chapter['number']}"
+            chapters.append(chapter)
+            exercise_counts[chapter_key] = len(exercises)
             
-            return {
-                'chapters': chapters,
-                'exercises_by_chapter': exercises_by_chapter,
-                'total_pages': len(page_texts)
-            }
+            if output_dir and exercises:
+                self._save_chapter_exercises(chapter_key, exercises, output_dir)
+        
+        print(f"OK: {self.pages_read} pages extraites")
+        
+        if output_dir:
+            self._save_summary(chapters, exercise_counts, output_dir)
+            print(f"Resultats sauvegardes dans: {output_dir}")
+        
+        return {
+            'chapters': chapters,
+            'exercise_counts': exercise_counts,
+            'total_pages': self.pages_read
+        }
     
     def _clean_text(self, text: str) -> str:
         """Nettoyer le texte des caractères problématiques"""
-        # Remplacer les caractères problématiques
-        replacements = {
-            'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
-            'à': 'a', 'â': 'a', 'ä': 'a',
-            'ù': 'u', 'û': 'u', 'ü': 'u',
-            'ô': 'o', 'ö': 'o',
-            'î': 'i', 'ï': 'i',
-            'ç': 'c',
-            'É': 'E', 'È': 'E', 'Ê': 'E', 'Ë': 'E',
-            'À': 'A', 'Â': 'A', 'Ä': 'A',
-            'Ù': 'U', 'Û': 'U', 'Ü': 'U',
-            'Ô': 'O', 'Ö': 'O',
-            'Î': 'I', 'Ï': 'I',
-            'Ç': 'C'
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        # Accents repliés et ligatures recollées en une seule table partagée
+        return normalize_text(text)
     
     def _identify_chapters(self, text: str) -> List[Dict[str, Any]]:
         """Identifier les chapitres dans le manuel"""
+        chapters = self._find_chapter_headings(text, set())
+        
+        # Trier par position dans le texte
+        chapters.sort(key=lambda x: x['position'])
+        
+        # Si pas de chapitres trouvés, créer des chapitres génériques
+        if not chapters:
+            print("Aucun chapitre detecte, creation de chapitres generiques...")
+            chapters = self._create_generic_chapters()
+        
+        print(f"{len(chapters)} chapitres identifies:")
+        for chapter in chapters:
+            print(f"   {chapter['number']}. {chapter['title']}")
+        
+        return chapters
+    
+    def _find_chapter_headings(self, text: str, seen_titles: Set[str]) -> List[Dict[str, Any]]:
+        """Trouver les titres de chapitres d'un texte (seen_titles est complété au passage)"""
         chapters = []
         
         # Patterns pour identifier les chapitres
@@ -121,7 +234,6 @@ class Simple6emeExtractor:
             r'(\d+)[:.\s]+([^\n]+)',  # Pattern générique
         ]
         
-        # Rechercher dans tout le texte
         for pattern in chapter_patterns:
             matches = re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE)
             for match in matches:
@@ -132,25 +244,14 @@ class Simple6emeExtractor:
                 chapter_title = re.sub(r'[^\w\s\-]', '', chapter_title)
                 chapter_title = ' '.join(chapter_title.split())
                 
-                if len(chapter_title) > 3 and chapter_title not in [ch['title'] for ch in chapters]:
+                if len(chapter_title) > 3 and chapter_title not in seen_titles:
+                    seen_titles.add(chapter_title)
                     chapters.append({
                         'number': int(chapter_num),
                         'title': chapter_title,
                         'position': match.start()
                     })
         
-        # Trier par position dans le texte
-        chapters.sort(key=lambda x: x['position'])
-        
-        # Si pas de chapitres trouvés, créer des chapitres génériques
-        if not chapters:
-            print("Aucun chapitre detecte, creation de chapitres generiques...")
-            chapters = self._create_generic_chapters()
-        
-        print(f"{len(chapters)} chapitres identifies:")
-        for chapter in chapters:
-            print(f"   {chapter['number']}. {chapter['title']}")
-        
         return chapters
     
     def _create_generic_chapters(self) -> List[Dict[str, Any]]:
@@ -229,23 +330,11 @@ class Simple6emeExtractor:
         """Extraire les exercices d'un texte de chapitre"""
         exercises = []
         
-        # Patterns pour les exercices
-        exercise_patterns = [
-            r'Exercice\s+(\d+)[:.\s]*(.*?)(?=Exercice\s+\d+|$)',
-            r'(\d+)[:.\s]*(.*?)(?=\d+[:.]|$)',
-        ]
-        
-        for pattern in exercise_patterns:
-            matches = re.finditer(pattern, text, re.DOTALL | re.IGNORECASE)
-            
-            for match in matches:
-                exercise_num = match.group(1)
-                content = match.group(2).strip()
-                
-                if len(content) > 20:  # Filtrer les contenus trop courts
-                    exercise = self._format_exercise(content, exercise_num, chapter)
-                    if exercise:
-                        exercises.append(exercise)
+        # Découpage en un seul passage, sans doublons (contenus trop courts filtrés)
+        for exercise_num, content in segment_exercises(text, ('Exercice',), min_length=20):
+            exercise = self._format_exercise(content, exercise_num, chapter)
+            if exercise:
+                exercises.append(exercise)
         
         return exercises
     
@@ -350,37 +439,76 @@ class Simple6emeExtractor:
         """Sauvegarder les résultats"""
         os.makedirs(output_dir, exist_ok=True)
         
-        # Sauvegarder les chapitres
-        chapters_file = os.path.join(output_dir, 'chapitres_6eme.json')
-        with open(chapters_file, 'w', encoding='utf-8') as f:
-            json.dump(results['chapters'], f, ensure_ascii=False, indent=2)
-        
         # Sauvegarder les exercices par chapitre
         for chapter_key, exercises in results['exercises_by_chapter'].items():
             if exercises:
-                exercises_file = os.path.join(output_dir, f'{chapter_key}_exercices.json')
-                with open(exercises_file, 'w', encoding='utf-8') as f:
-                    json.dump(exercises, f, ensure_ascii=False, indent=2)
+                self._save_chapter_exercises(chapter_key, exercises, output_dir)
+        
+        exercise_counts = {
+            chapter_key: len(exercises) 
+            for chapter_key, exercises in results['exercises_by_chapter'].items()
+        }
+        summary = self._save_summary(results['chapters'], exercise_counts, output_dir)
+        
+        print(f"Resultats sauvegardes dans: {output_dir}")
+        return summary
+    
+    def _save_chapter_exercises(self, chapter_key: str, exercises: List[Dict[str, Any]], output_dir: str):
+        """Sauvegarder les exercices d'un chapitre"""
+        exercises_file = os.path.join(output_dir, f'{chapter_key}_exercices.json')
+        with open(exercises_file, 'w', encoding='utf-8') as f:
+            json.dump(exercises, f, ensure_ascii=False, indent=2)
+    
+    def _save_summary(self, chapters: List[Dict], exercise_counts: Dict[str, int], output_dir: str) -> Dict[str, Any]:
+        """Sauvegarder la liste des chapitres et un résumé de l'extraction"""
+        # Sauvegarder les chapitres
+        chapters_file = os.path.join(output_dir, 'chapitres_6eme.json')
+        with open(chapters_file, 'w', encoding='utf-8') as f:
+            json.dump(chapters, f, ensure_ascii=False, indent=2)
         
         # Sauvegarder un résumé
         summary = {
-            'total_chapters': len(results['chapters']),
-            'total_exercises': sum(len(exercises) for exercises in results['exercises_by_chapter'].values()),
-            'exercises_by_chapter': {
-                chapter_key: len(exercises) 
-                for chapter_key, exercises in results['exercises_by_chapter'].items()
-            },
-            'chapters': results['chapters']
+            'total_chapters': len(chapters),
+            'total_exercises': sum(exercise_counts.values()),
+            'exercises_by_chapter': exercise_counts,
+            'chapters': chapters
         }
         
         summary_file = os.path.join(output_dir, 'resume_extraction.json')
         with open(summary_file, 'w', encoding='utf-8') as f:
             json.dump(summary, f, ensure_ascii=False, indent=2)
         
-        print(f"Resultats sauvegardes dans: {output_dir}")
         return summary
 
 
+def _split_page_range(total_pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Découper 1..total_pages en plages contiguës, une par processus"""
+    workers = max(1, min(workers, total_pages))
+    chunk_size, remainder = divmod(total_pages, workers)
+    
+    ranges = []
+    first = 1
+    for i in range(workers):
+        last = first + chunk_size - 1 + (1 if i < remainder else 0)
+        ranges.append((first, last))
+        first = last + 1
+    
+    return ranges
+
+
+def _extract_page_range_worker(pdf_path: str, first_page: int, last_page: int,
+                               cache_path: Optional[str] = None,
+                               digest: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Point d'entrée d'un processus: chaque worker ouvre le PDF (et le cache) de son côté"""
+    extractor = Simple6emeExtractor()
+    cache = PageTextCache(cache_path) if cache_path else None
+    try:
+        return extractor._extract_pages(pdf_path, first_page, last_page, cache, digest)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
 def main():
     """Fonction principale"""
     import argparse
@@ -392,6 +520,12 @@ def main():
                        help='Dossier de sortie pour les resultats')
     parser.add_argument('--no-save', action='store_true', 
                        help='Ne pas sauvegarder les fichiers JSON')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Nombre de processus pour l\'extraction des pages (defaut: 1)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ne pas utiliser le cache du texte des pages')
+    parser.add_argument('--stream', action='store_true',
+                       help='Traiter le manuel chapitre par chapitre (memoire bornee par un chapitre)')
     
     args = parser.parse_args()
     
@@ -406,25 +540,42 @@ def main():
     
     # Extraire le contenu
     extractor = Simple6emeExtractor()
-    results = extractor.extract_from_pdf(args.pdf)
+    cache = open_cache(not args.no_cache)
+    try:
+        if args.stream:
+            output_dir = None if args.no_save else args.output
+            results = extractor.extract_streaming(args.pdf, output_dir, cache=cache)
+        else:
+            results = extractor.extract_from_pdf(args.pdf, workers=args.workers, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
     
     # Afficher le résumé
     print(f"\nRESUME DE L'EXTRACTION:")
     print(f"   Pages analysees: {results['total_pages']}")
     print(f"   Chapitres identifies: {len(results['chapters'])}")
     
-    total_exercises = sum(len(exercises) for exercises in results['exercises_by_chapter'].values())
+    if 'exercise_counts' in results:
+        exercise_counts = results['exercise_counts']
+    else:
+        exercise_counts = {
+            chapter_key: len(exercises)
+            for chapter_key, exercises in results['exercises_by_chapter'].items()
+        }
+    
+    total_exercises = sum(exercise_counts.values())
     print(f"   Exercices extraits: {total_exercises}")
     
     # Détail par chapitre
     print(f"\nDETAIL PAR CHAPITRE:")
     for chapter in results['chapters']:
         chapter_key = f"chapitre_{chapter['number']}"
-        exercises_count = len(results['exercises_by_chapter'].get(chapter_key, []))
+        exercises_count = exercise_counts.get(chapter_key, 0)
         print(f"   {chapter['number']}. {chapter['title']}: {exercises_count} exercices")
     
-    # Sauvegarder les résultats
-    if not args.no_save:
+    # Sauvegarder les résultats (déjà fait au fil de l'eau en mode streaming)
+    if not args.no_save and not args.stream:
         summary = extractor.save_results(results, args.output)
         print(f"\nFichiers sauvegardes dans: {args.output}")
     
@@ -10,16 +10,8 @@ import json
 import re
 from typing import List, Dict, Any, Optional
 
-try:
-    import pdfplumber
-except ImportError:
-    print("Erreur: Le module pdfplumber n'est pas installe.")
-    print("Installez-le avec: pip install pdfplumber")
-    sys.exit(1)
-
 try:
     import psycopg2
-    from psycopg2.extras import Json
 except ImportError:
     print("Erreur: Le module psycopg2 n'est pas installe.")
     print("Installez-le avec: pip install psycopg2-binary")
@@ -30,17 +22,18 @@ try:
 except ImportError:
     load_dotenv = lambda: None
 
+from page_cache import PageTextCache, iter_page_texts, open_cache
+from exercise_segmenter import segment_exercises
+from text_normalizer import normalize_text
+from bulk_import import (DEFAULT_PAGE_SIZE, course_row, ensure_content_hash, exercise_row,
+                         insert_exercise_rows, upsert_courses)
+from db_connection import get_db_connection
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration de la base de données
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', 5432),
-    'database': os.getenv('DB_NAME', 'mathia_db'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', '')
-}
+# Variante du cache de pages pour le texte nettoyé par _clean_text
+CLEAN_VARIANT = 'ascii-v2'
 
 
 class ExerciseExtractor:
@@ -60,71 +53,35 @@ class ExerciseExtractor:
             {"number": 9, "title": "Statistiques et probabilites", "grade": "6eme"}
         ]
     
-    def extract_from_pdf(self, pdf_path: str) -> str:
+    def extract_from_pdf(self, pdf_path: str, cache: Optional[PageTextCache] = None) -> str:
         """Extraire le texte du PDF"""
         print(f"Extraction du texte depuis: {pdf_path}")
         
-        all_text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        # Nettoyer le texte
-                        page_text = self._clean_text(page_text)
-                        all_text += f"\n--- PAGE {page_num} ---\n{page_text}\n"
-                except Exception as e:
-                    print(f"Erreur page {page_num}: {e}")
-                    continue
+        # Le texte nettoyé est mis en cache page par page
+        all_text = "".join(
+            f"\n--- PAGE {page_num} ---\n{page_text}\n"
+            for page_num, page_text in iter_page_texts(pdf_path, cleaner=self._clean_text,
+                                                       variant=CLEAN_VARIANT, cache=cache)
+            if page_text
+        )
         
         print(f"Extraction terminee: {len(all_text)} caracteres extraits")
         return all_text
     
     def _clean_text(self, text: str) -> str:
         """Nettoyer le texte des caracteres problematiques"""
-        # Remplacer les caracteres accentues
-        replacements = {
-            'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
-            'à': 'a', 'â': 'a', 'ä': 'a',
-            'ù': 'u', 'û': 'u', 'ü': 'u',
-            'ô': 'o', 'ö': 'o',
-            'î': 'i', 'ï': 'i',
-            'ç': 'c',
-            'É': 'E', 'È': 'E', 'Ê': 'E', 'Ë': 'E',
-            'À': 'A', 'Â': 'A', 'Ä': 'A',
-            'Ù': 'U', 'Û': 'U', 'Ü': 'U',
-            'Ô': 'O', 'Ö': 'O',
-            'Î': 'I', 'Ï': 'I',
-            'Ç': 'C'
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        # Accents repliés et ligatures recollées en une seule table partagée
+        return normalize_text(text)
     
     def find_exercises_in_text(self, text: str) -> List[Dict[str, Any]]:
         """Trouver et extraire les exercices dans le texte"""
         exercises = []
         
-        # Patterns pour identifier les exercices
-        exercise_patterns = [
-            r'Exercice\s+(\d+)[:.\s]*(.*?)(?=Exercice\s+\d+|$)',
-            r'(\d+)[:.\s]*(.*?)(?=\d+[:.]|$)',
-            r'Question\s+(\d+)[:.\s]*(.*?)(?=Question\s+\d+|$)',
-        ]
-        
-        for pattern in exercise_patterns:
-            matches = re.finditer(pattern, text, re.DOTALL | re.IGNORECASE)
-            
-            for match in matches:
-                exercise_num = match.group(1)
-                content = match.group(2).strip()
-                
-                if len(content) > 30:  # Filtrer les contenus trop courts
-                    exercise = self._convert_to_app_format(content, exercise_num)
-                    if exercise:
-                        exercises.append(exercise)
+        # Découpage en un seul passage, sans doublons (contenus trop courts filtrés)
+        for exercise_num, content in segment_exercises(text, ('Exercice', 'Question'), min_length=30):
+            exercise = self._convert_to_app_format(content, exercise_num)
+            if exercise:
+                exercises.append(exercise)
         
         print(f"Trouve {len(exercises)} exercices dans le texte")
         return exercises
@@ -284,127 +241,62 @@ class ExerciseExtractor:
             print("Pas de connexion a la base de donnees")
             return {}
         
-        cursor = conn.cursor()
         chapter_to_course_id = {}
         
         try:
-            for chapter in self.chapters:
-                # Verifier si le cours existe deja
-                cursor.execute(
-                    "SELECT id FROM courses WHERE title = %s AND grade = %s",
-                    (chapter['title'], chapter['grade'])
-                )
-                existing = cursor.fetchone()
-                
-                if existing:
-                    course_id = existing[0]
-                    print(f"Cours existant trouve: {chapter['title']} (ID: {course_id})")
+            # Tous les chapitres en un seul aller-retour
+            titles = {chapter['number']: chapter['title'] for chapter in self.chapters}
+            rows = [course_row(chapter) for chapter in self.chapters]
+            for number, course_id, created in upsert_courses(conn, rows):
+                if created:
+                    print(f"Nouveau cours cree: {titles[number]} (ID: {course_id})")
                 else:
-                    # Creer le nouveau cours
-                    cursor.execute(
-                        """
-                        INSERT INTO courses (title, grade, chapter, description, "createdAt", "updatedAt")
-                        VALUES (%s, %s, %s, %s, NOW(), NOW())
-                        RETURNING id
-                        """,
-                        (
-                            chapter['title'],
-                            chapter['grade'],
-                            f"Chapitre {chapter['number']}",
-                            f"Chapitre {chapter['number']} du manuel de mathematiques 6eme"
-                        )
-                    )
-                    course_id = cursor.fetchone()[0]
-                    print(f"Nouveau cours cree: {chapter['title']} (ID: {course_id})")
-                
-                chapter_to_course_id[chapter['number']] = course_id
+                    print(f"Cours existant trouve: {titles[number]} (ID: {course_id})")
+                chapter_to_course_id[number] = course_id
             
             conn.commit()
-            cursor.close()
             return chapter_to_course_id
             
         except Exception as e:
             conn.rollback()
-            cursor.close()
             print(f"Erreur lors de la creation des cours: {e}")
             return {}
     
     def import_exercises_to_db(self, exercises: List[Dict[str, Any]], 
                               chapter_to_course_id: Dict[int, int], 
                               conn):
-        """Importer les exercices dans la base de donnees"""
+        """Importer les exercices dans la base de donnees (les exercices deja presents sont ignores)"""
         if not conn:
             print("Pas de connexion a la base de donnees")
             return
         
-        cursor = conn.cursor()
-        total_imported = 0
-        total_errors = 0
+        rows = []
+        for i, exercise in enumerate(exercises):
+            chapter_num = exercise.get('chapter_number', 1)
+            course_id = chapter_to_course_id.get(chapter_num)
+            
+            if not course_id:
+                print(f"Pas de cours trouve pour le chapitre {chapter_num}")
+                continue
+            
+            rows.append((i, exercise_row(exercise, course_id)))
         
         try:
-            for exercise in exercises:
-                try:
-                    chapter_num = exercise.get('chapter_number', 1)
-                    course_id = chapter_to_course_id.get(chapter_num)
-                    
-                    if not course_id:
-                        print(f"Pas de cours trouve pour le chapitre {chapter_num}")
-                        continue
-                    
-                    cursor.execute(
-                        """
-                        INSERT INTO exercises 
-                        ("courseId", type, body, options, answer, explanation, difficulty, tags, "createdAt", "updatedAt")
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-                        RETURNING id
-                        """,
-                        (
-                            course_id,
-                            exercise.get('type', 'libre'),
-                            exercise.get('body', ''),
-                            Json(exercise.get('options')) if exercise.get('options') else None,
-                            exercise.get('answer', ''),
-                            exercise.get('explanation', ''),
-                            exercise.get('difficulty', 'moyen'),
-                            Json(exercise.get('tags', []))
-                        )
-                    )
-                    
-                    exercise_id = cursor.fetchone()[0]
-                    total_imported += 1
-                    
-                    if total_imported % 10 == 0:
-                        print(f"Importe {total_imported} exercices...")
-                    
-                except Exception as e:
-                    total_errors += 1
-                    print(f"Erreur exercice: {e}")
-            
+            ensure_content_hash(conn)
+            result = insert_exercise_rows(conn, rows, 'batch', DEFAULT_PAGE_SIZE, on_conflict='nothing')
             conn.commit()
-            cursor.close()
             
-            print(f"Import termine: {total_imported} exercices importes, {total_errors} erreurs")
+            for i, error in result['errors'][:5]:
+                print(f"Erreur exercice {i}: {error}")
+            
+            print(f"Import termine: {result['inserted']} exercices importes, "
+                  f"{result['skipped']} deja presents, {len(result['errors'])} erreurs")
             
         except Exception as e:
             conn.rollback()
-            cursor.close()
             print(f"Erreur lors de l'import: {e}")
 
 
-def get_db_connection():
-    """Creer une connexion a la base de donnees PostgreSQL"""
-    try:
-        database_url = os.getenv('DATABASE_URL')
-        if database_url:
-            conn = psycopg2.connect(database_url)
-        else:
-            conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        print(f"Erreur de connexion a la base de donnees: {e}")
-        return None
-
-
 def main():
     """Fonction principale"""
     import argparse
@@ -418,6 +310,8 @@ def main():
                        help='Importer directement dans la base de donnees')
     parser.add_argument('--no-save', action='store_true', 
                        help='Ne pas sauvegarder le fichier JSON')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Ne pas utiliser le cache du texte des pages')
     
     args = parser.parse_args()
     
@@ -434,7 +328,12 @@ def main():
     extractor = ExerciseExtractor()
     
     # Extraire le texte du PDF
-    text = extractor.extract_from_pdf(args.pdf)
+    cache = open_cache(not args.no_cache)
+    try:
+        text = extractor.extract_from_pdf(args.pdf, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
     
     # Trouver et convertir les exercices
     exercises = extractor.find_exercises_in_text(text)
@@ -7,35 +7,22 @@ Pour ajouter à un fichier SQL existant
 import os
 import json
 import sys
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 from datetime import datetime
 
+from corpus import CORPUS_FILES, FILE_TO_CHAPTER, as_exercise_list, read_exercise_file
+from sql_writer import write_sql
+
 def load_all_exercise_files() -> Dict[str, List[Dict[str, Any]]]:
-    """Charger tous les fichiers d'exercices JSON"""
-    exercise_files = {
-        'exercices_6eme.json': '6ème',
-        'exercices_chapitre_1.json': '6ème - Chapitre 1',
-        'exercices_chapitre_2.json': '6ème - Chapitre 2',
-        'exercices_chapitre_3.json': '6ème - Chapitre 3',
-        'exercices_chapitre_4.json': '6ème - Chapitre 4',
-        'exercices_chapitre_5.json': '6ème - Chapitre 5',
-        'exercices_chapitre_6.json': '6ème - Chapitre 6',
-        'exercices_chapitre_7.json': '6ème - Chapitre 7',
-        'exercices_chapitre_8.json': '6ème - Chapitre 8',
-        'exercices_chapitre_9.json': '6ème - Chapitre 9'
-    }
-    
+    """Charger tous les fichiers d'exercices JSON (via le cache du corpus)"""
     all_exercises = {}
     
-    for filename, description in exercise_files.items():
+    for filename, _ in CORPUS_FILES:
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    exercises = json.load(f)
-                    if not isinstance(exercises, list):
-                        exercises = [exercises]
-                    all_exercises[filename] = exercises
-                    print(f"[OK] Charge {len(exercises)} exercices depuis {filename}")
+                exercises = as_exercise_list(read_exercise_file(filename))
+                all_exercises[filename] = exercises
+                print(f"[OK] Charge {len(exercises)} exercices depuis {filename}")
             except Exception as e:
                 print(f"[ERREUR] Erreur chargement {filename}: {e}")
         else:
@@ -58,33 +45,19 @@ def escape_sql_string(text: str) -> str:
     
     return f"'{text}'"
 
-def generate_exercises_sql_only(all_exercises: Dict[str, List[Dict[str, Any]]]) -> str:
-    """Générer seulement les instructions SQL pour les exercices"""
-    sql = "-- ============================================\n"
-    sql += "-- EXERCICES - Insertion de tous les exercices\n"
-    sql += "-- ============================================\n\n"
-    
-    # Mapping des fichiers vers les chapitres
-    file_to_chapter = {
-        'exercices_6eme.json': 1,  # Par défaut chapitre 1
-        'exercices_chapitre_1.json': 1,
-        'exercices_chapitre_2.json': 2,
-        'exercices_chapitre_3.json': 3,
-        'exercices_chapitre_4.json': 4,
-        'exercices_chapitre_5.json': 5,
-        'exercices_chapitre_6.json': 6,
-        'exercices_chapitre_7.json': 7,
-        'exercices_chapitre_8.json': 8,
-        'exercices_chapitre_9.json': 9
-    }
+def iter_exercises_sql_only(all_exercises: Dict[str, List[Dict[str, Any]]]) -> Iterator[str]:
+    """Générer seulement les instructions SQL pour les exercices, une à une"""
+    yield ("-- ============================================\n"
+           "-- EXERCICES - Insertion de tous les exercices\n"
+           "-- ============================================\n\n")
     
     total_exercises = 0
     
     for filename, exercises in all_exercises.items():
-        chapter_num = file_to_chapter.get(filename, 1)
+        chapter_num = FILE_TO_CHAPTER.get(filename, 1)
         
-        sql += f"-- Exercices du fichier: {filename} (Chapitre {chapter_num})\n"
-        sql += f"-- Nombre d'exercices: {len(exercises)}\n\n"
+        yield (f"-- Exercices du fichier: {filename} (Chapitre {chapter_num})\n"
+               f"-- Nombre d'exercices: {len(exercises)}\n\n")
         
         for i, exercise in enumerate(exercises, 1):
             # Déterminer le type d'exercice
@@ -109,7 +82,7 @@ def generate_exercises_sql_only(all_exercises: Dict[str, List[Dict[str, Any]]])
             if exercise.get('chapter_title'):
                 title += f" - {exercise['chapter_title']}"
             
-            sql += f"""SELECT insert_exercise_if_not_exists(
+            yield f"""SELECT insert_exercise_if_not_exists(
     {chapter_num},
     {escape_sql_string(title)},
     {escape_sql_string(exercise.get('body', ''))},
@@ -126,28 +99,14 @@ def generate_exercises_sql_only(all_exercises: Dict[str, List[Dict[str, Any]]])
             
             total_exercises += 1
     
-    sql += f"-- Total d'exercices générés: {total_exercises}\n"
-    return sql
+    yield f"-- Total d'exercices générés: {total_exercises}\n"
 
-def main():
-    """Fonction principale"""
-    print('=' * 60)
-    print('GENERATEUR EXERCICES SEULEMENT - MATHIA')
-    print('=' * 60)
-    print()
-    
-    # Charger tous les exercices
-    all_exercises = load_all_exercise_files()
-    
-    if not all_exercises:
-        print("Aucun fichier d'exercices trouve!")
-        return ""
-    
-    # Générer le SQL des exercices seulement
-    exercises_sql = generate_exercises_sql_only(all_exercises)
+def iter_exercises_script(all_exercises: Dict[str, List[Dict[str, Any]]]) -> Iterator[str]:
+    """Script complet: exercices puis nettoyage et requêtes de vérification"""
+    yield from iter_exercises_sql_only(all_exercises)
     
     # Ajouter la fin du script
-    final_sql = exercises_sql + """
+    yield """
 -- Réactiver les contraintes
 SET session_replication_role = DEFAULT;
 
@@ -199,12 +158,25 @@ SELECT 'Total exercices' as type, COUNT(*) as nombre FROM public.exercises;
 -- BIBLIOTHÈQUE SQL GÉNÉRÉE AVEC SUCCÈS !
 -- ============================================
 """
+
+def main():
+    """Fonction principale"""
+    print('=' * 60)
+    print('GENERATEUR EXERCICES SEULEMENT - MATHIA')
+    print('=' * 60)
+    print()
+    
+    # Charger tous les exercices
+    all_exercises = load_all_exercise_files()
+    
+    if not all_exercises:
+        print("Aucun fichier d'exercices trouve!")
+        return ""
     
-    # Sauvegarder dans un fichier
+    # Générer et écrire le SQL des exercices au fil de l'eau
     output_file = "exercices_only.sql"
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(final_sql)
+        write_sql(output_file, iter_exercises_script(all_exercises))
         
         print(f"[SUCCESS] Exercices SQL generes avec succes!")
         print(f"[FILE] Fichier cree: {output_file}")
@@ -7,40 +7,29 @@ Générateur de fichiers SQL petits directement depuis les JSON
 import os
 import json
 import sys
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from corpus import CORPUS_FILES, as_exercise_list, read_exercise_file
+from generate_sql_library import exercise_row
+from sql_writer import (MULTI_ROW_SIZE, OUTPUT_FORMATS, iter_copy_loader, iter_copy_rows,
+                        iter_multirow_inserts, write_sql)
+
 def load_exercises_by_chapter() -> Dict[int, List[Dict[str, Any]]]:
-    """Charger les exercices organisés par chapitre"""
-    exercise_files = {
-        'exercices_6eme.json': 1,
-        'exercices_chapitre_1.json': 1,
-        'exercices_chapitre_2.json': 2,
-        'exercices_chapitre_3.json': 3,
-        'exercices_chapitre_4.json': 4,
-        'exercices_chapitre_5.json': 5,
-        'exercices_chapitre_6.json': 6,
-        'exercices_chapitre_7.json': 7,
-        'exercices_chapitre_8.json': 8,
-        'exercices_chapitre_9.json': 9
-    }
-    
+    """Charger les exercices organisés par chapitre (via le cache du corpus)"""
     exercises_by_chapter = {}
     
-    for filename, chapter_num in exercise_files.items():
+    for filename, chapter_num in CORPUS_FILES:
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    exercises = json.load(f)
-                    if not isinstance(exercises, list):
-                        exercises = [exercises]
-                    
-                    if chapter_num not in exercises_by_chapter:
-                        exercises_by_chapter[chapter_num] = []
-                    
-                    exercises_by_chapter[chapter_num].extend(exercises)
-                    print(f"[OK] {filename}: {len(exercises)} exercices (chapitre {chapter_num})")
-                    
+                exercises = as_exercise_list(read_exercise_file(filename))
+                
+                if chapter_num not in exercises_by_chapter:
+                    exercises_by_chapter[chapter_num] = []
+                
+                exercises_by_chapter[chapter_num].extend(exercises)
+                print(f"[OK] {filename}: {len(exercises)} exercices (chapitre {chapter_num})")
+                
             except Exception as e:
                 print(f"[ERROR] Erreur {filename}: {e}")
         else:
@@ -207,8 +196,16 @@ def generate_courses_sql() -> str:
     
     return sql
 
-def generate_exercises_sql_for_chapter(chapter_num: int, exercises: List[Dict[str, Any]]) -> str:
-    """Générer le SQL pour les exercices d'un chapitre"""
+def generate_exercises_sql_for_chapter(chapter_num: int, exercises: List[Dict[str, Any]],
+                                       output_format: str = 'insert',
+                                       batch_size: int = MULTI_ROW_SIZE,
+                                       copy_file: Optional[str] = None) -> str:
+    """
+    Générer le SQL pour les exercices d'un chapitre
+    
+    output_format: 'insert' (un INSERT par exercice), 'multirow' (INSERT de
+    batch_size lignes) ou 'copy' (script psql qui charge copy_file).
+    """
     sql = f"""-- ============================================
 -- EXERCICES CHAPITRE {chapter_num}
 -- ============================================
@@ -216,6 +213,12 @@ def generate_exercises_sql_for_chapter(chapter_num: int, exercises: List[Dict[st
 
 """
     
+    if output_format == 'multirow':
+        rows = (exercise_row(exercise, chapter_num, i) for i, exercise in enumerate(exercises, 1))
+        return sql + "".join(iter_multirow_inserts(chapter_num, rows, batch_size))
+    if output_format == 'copy':
+        return sql + "".join(iter_copy_loader(copy_file))
+    
     for i, exercise in enumerate(exercises, 1):
         # Déterminer le type d'exercice
         exercise_type = exercise.get('type', 'libre')
@@ -281,6 +284,17 @@ def generate_exercises_sql_for_chapter(chapter_num: int, exercises: List[Dict[st
 
 def main():
     """Fonction principale"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Generer les fichiers SQL par chapitre')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='insert',
+                       help='insert: un INSERT par exercice, multirow: INSERT multi-lignes, '
+                            'copy: fichiers .copy charges par \\copy (psql)')
+    parser.add_argument('--batch-size', type=int, default=MULTI_ROW_SIZE,
+                       help='Lignes par INSERT en format multirow')
+    
+    args = parser.parse_args()
+    
     print('=' * 60)
     print('GÉNÉRATEUR DE FICHIERS SQL PETITS - MATHIA')
     print('=' * 60)
@@ -306,15 +320,26 @@ def main():
     print("[OK] Fichier créé: 02_courses.sql")
     
     # Générer un fichier par chapitre
+    file_sizes = {}
     for chapter_num in sorted(exercises_by_chapter.keys()):
         exercises = exercises_by_chapter[chapter_num]
-        exercises_sql = generate_exercises_sql_for_chapter(chapter_num, exercises)
+        
+        copy_file = None
+        if args.format == 'copy':
+            copy_file = f"03_chapitre_{chapter_num:02d}.copy"
+            rows = (exercise_row(exercise, chapter_num, i) for i, exercise in enumerate(exercises, 1))
+            write_sql(copy_file, iter_copy_rows(chapter_num, rows))
+            print(f"[OK] Fichier créé: {copy_file} ({os.path.getsize(copy_file) / (1024*1024):.1f} MB)")
+        
+        exercises_sql = generate_exercises_sql_for_chapter(chapter_num, exercises, args.format,
+                                                           args.batch_size, copy_file)
         
         filename = f"03_chapitre_{chapter_num:02d}.sql"
         with open(filename, 'w', encoding='utf-8') as f:
             f.write(exercises_sql)
         
         file_size = len(exercises_sql.encode('utf-8'))
+        file_sizes[chapter_num] = file_size + (os.path.getsize(copy_file) if copy_file else 0)
         print(f"[OK] Fichier créé: {filename} ({file_size / (1024*1024):.1f} MB, {len(exercises)} exercices)")
     
     # Créer les instructions
@@ -338,10 +363,16 @@ Exécutez les fichiers dans l'ordre :
 
 """
     
+    if args.format == 'copy':
+        instructions += ("Format COPY: les fichiers 03_chapitre_XX.sql chargent les fichiers .copy "
+                         "avec \\copy et s'exécutent avec psql (pas dans le SQL Editor), "
+                         "depuis le dossier qui les contient :\n"
+                         "`psql \"$DATABASE_URL\" -f 03_chapitre_01.sql`\n\n")
+    
     for chapter_num in sorted(exercises_by_chapter.keys()):
         exercises = exercises_by_chapter[chapter_num]
         filename = f"03_chapitre_{chapter_num:02d}.sql"
-        file_size = len(generate_exercises_sql_for_chapter(chapter_num, exercises).encode('utf-8'))
+        file_size = file_sizes[chapter_num]
         instructions += f"**{filename}** ({file_size / (1024*1024):.1f} MB, {len(exercises)} exercices)\n"
     
     instructions += """
@@ -7,35 +7,23 @@ Transforme tous les fichiers JSON en instructions SQL INSERT
 import os
 import json
 import sys
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime
 
+from corpus import CORPUS_FILES, FILE_TO_CHAPTER, as_exercise_list, read_exercise_file
+from sql_writer import (MULTI_ROW_SIZE, OUTPUT_FORMATS, copy_file_for, iter_copy_loader,
+                        iter_copy_rows, iter_multirow_inserts, write_sql)
+
 def load_all_exercise_files() -> Dict[str, List[Dict[str, Any]]]:
-    """Charger tous les fichiers d'exercices JSON"""
-    exercise_files = {
-        'exercices_6eme.json': '6ème',
-        'exercices_chapitre_1.json': '6ème - Chapitre 1',
-        'exercices_chapitre_2.json': '6ème - Chapitre 2',
-        'exercices_chapitre_3.json': '6ème - Chapitre 3',
-        'exercices_chapitre_4.json': '6ème - Chapitre 4',
-        'exercices_chapitre_5.json': '6ème - Chapitre 5',
-        'exercices_chapitre_6.json': '6ème - Chapitre 6',
-        'exercices_chapitre_7.json': '6ème - Chapitre 7',
-        'exercices_chapitre_8.json': '6ème - Chapitre 8',
-        'exercices_chapitre_9.json': '6ème - Chapitre 9'
-    }
-    
+    """Charger tous les fichiers d'exercices JSON (via le cache du corpus)"""
     all_exercises = {}
     
-    for filename, description in exercise_files.items():
+    for filename, _ in CORPUS_FILES:
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    exercises = json.load(f)
-                    if not isinstance(exercises, list):
-                        exercises = [exercises]
-                    all_exercises[filename] = exercises
-                    print(f"[OK] Charge {len(exercises)} exercices depuis {filename}")
+                exercises = as_exercise_list(read_exercise_file(filename))
+                all_exercises[filename] = exercises
+                print(f"[OK] Charge {len(exercises)} exercices depuis {filename}")
             except Exception as e:
                 print(f"[ERREUR] Erreur chargement {filename}: {e}")
         else:
@@ -58,8 +46,69 @@ def escape_sql_string(text: str) -> str:
     
     return f"'{text}'"
 
-def generate_courses_sql() -> str:
-    """Générer les instructions SQL pour créer les cours"""
+def clean_sql_text(text: str) -> Optional[str]:
+    """Texte stocké par escape_sql_string, sans les apostrophes SQL (None si vide)"""
+    if not text:
+        return None
+    
+    text = text.replace('\n', '\\n').replace('\r', '\\r')
+    if len(text) > 2000:
+        text = text[:1997] + "..."
+    
+    return text
+
+def exercise_row(exercise: Dict[str, Any], chapter_num: int, order_num: int) -> Tuple[Any, ...]:
+    """Valeurs d'un exercice pour les formats multirow et copy (ordre de EXERCISE_COLUMNS)"""
+    exercise_type = exercise.get('type', 'libre')
+    if exercise_type not in ['qcm', 'libre', 'vrai-faux', 'calcul']:
+        exercise_type = 'libre'
+    
+    options = exercise.get('options')
+    options_json = None
+    if options and isinstance(options, dict):
+        options_json = json.dumps(options, ensure_ascii=False)
+    
+    hints = exercise.get('hints', [])
+    if not isinstance(hints, list):
+        hints = []
+    
+    title = f"Exercice {exercise.get('exercise_number', order_num)}"
+    if exercise.get('chapter_title'):
+        title += f" - {exercise['chapter_title']}"
+    
+    difficulty = exercise.get('difficulty', 'moyen')
+    points = 10 if difficulty == 'facile' else 15 if difficulty == 'moyen' else 20
+    
+    return (
+        clean_sql_text(title),
+        clean_sql_text(f"Exercice du chapitre {chapter_num}"),
+        clean_sql_text(exercise.get('body', '')),
+        clean_sql_text(exercise.get('answer', '')),
+        clean_sql_text(exercise.get('explanation', '')),
+        difficulty,
+        points,
+        300,
+        exercise_type,
+        json.dumps(hints, ensure_ascii=False),
+        options_json,
+        False,
+        order_num,
+        True,
+    )
+
+def iter_exercise_rows(chapter_num: int, exercises: List[Dict[str, Any]]) -> Iterator[Tuple[Any, ...]]:
+    """Lignes des exercices d'un fichier, numérotées à partir de 1"""
+    for i, exercise in enumerate(exercises, 1):
+        yield exercise_row(exercise, chapter_num, i)
+
+def iter_library_copy_rows(all_exercises: Dict[str, List[Dict[str, Any]]]) -> Iterator[str]:
+    """Contenu du fichier .copy de la bibliothèque"""
+    for filename, exercises in all_exercises.items():
+        chapter_num = FILE_TO_CHAPTER.get(filename, 1)
+        yield from iter_copy_rows(chapter_num, iter_exercise_rows(chapter_num, exercises))
+
+def iter_courses_sql() -> Iterator[str]:
+    """Générer les instructions SQL pour créer les cours, une à une"""
     courses = [
         (1, "Nombres entiers", "Arithmétique", "6ème"),
         (2, "Nombres décimaux", "Arithmétique", "6ème"),
@@ -72,12 +121,12 @@ def generate_courses_sql() -> str:
         (9, "Statistiques et probabilités", "Statistiques", "6ème")
     ]
     
-    sql = "-- ============================================\n"
-    sql += "-- COURS - Insertion des cours de 6ème\n"
-    sql += "-- ============================================\n\n"
+    yield ("-- ============================================\n"
+           "-- COURS - Insertion des cours de 6ème\n"
+           "-- ============================================\n\n")
     
     for chapter_num, title, topic, grade in courses:
-        sql += f"""INSERT INTO public.courses (
+        yield f"""INSERT INTO public.courses (
     id,
     title,
     description,
@@ -98,36 +147,38 @@ def generate_courses_sql() -> str:
     {chapter_num},
     true
 );\n\n"""
-    
-    return sql
 
-def generate_exercises_sql(all_exercises: Dict[str, List[Dict[str, Any]]]) -> str:
-    """Générer les instructions SQL pour tous les exercices"""
-    sql = "-- ============================================\n"
-    sql += "-- EXERCICES - Insertion de tous les exercices\n"
-    sql += "-- ============================================\n\n"
+def iter_exercises_sql(all_exercises: Dict[str, List[Dict[str, Any]]],
+                       output_format: str = 'insert',
+                       batch_size: int = MULTI_ROW_SIZE,
+                       copy_file: Optional[str] = None) -> Iterator[str]:
+    """
+    Générer les instructions SQL pour tous les exercices, une à une.
+
+    output_format: 'insert' (un INSERT par exercice), 'multirow' (INSERT de
+    batch_size lignes) ou 'copy' (chargement de copy_file par \\copy).
+    """
+    yield ("-- ============================================\n"
+           "-- EXERCICES - Insertion de tous les exercices\n"
+           "-- ============================================\n\n")
     
-    # Mapping des fichiers vers les chapitres
-    file_to_chapter = {
-        'exercices_6eme.json': 1,  # Par défaut chapitre 1
-        'exercices_chapitre_1.json': 1,
-        'exercices_chapitre_2.json': 2,
-        'exercices_chapitre_3.json': 3,
-        'exercices_chapitre_4.json': 4,
-        'exercices_chapitre_5.json': 5,
-        'exercices_chapitre_6.json': 6,
-        'exercices_chapitre_7.json': 7,
-        'exercices_chapitre_8.json': 8,
-        'exercices_chapitre_9.json': 9
-    }
+    total_exercises = sum(len(exercises) for exercises in all_exercises.values())
     
-    total_exercises = 0
+    if output_format == 'copy':
+        yield f"-- Chargement de {total_exercises} exercices depuis {copy_file} (psql)\n"
+        yield from iter_copy_loader(copy_file)
+        yield f"-- Total d'exercices générés: {total_exercises}\n"
+        return
     
     for filename, exercises in all_exercises.items():
-        chapter_num = file_to_chapter.get(filename, 1)
+        chapter_num = FILE_TO_CHAPTER.get(filename, 1)
+        
+        yield (f"-- Exercices du fichier: {filename} (Chapitre {chapter_num})\n"
+               f"-- Nombre d'exercices: {len(exercises)}\n\n")
         
-        sql += f"-- Exercices du fichier: {filename} (Chapitre {chapter_num})\n"
-        sql += f"-- Nombre d'exercices: {len(exercises)}\n\n"
+        if output_format == 'multirow':
+            yield from iter_multirow_inserts(chapter_num, iter_exercise_rows(chapter_num, exercises), batch_size)
+            continue
         
         for i, exercise in enumerate(exercises, 1):
             # Déterminer le type d'exercice
@@ -152,7 +203,7 @@ def generate_exercises_sql(all_exercises: Dict[str, List[Dict[str, Any]]]) -> st
             if exercise.get('chapter_title'):
                 title += f" - {exercise['chapter_title']}"
             
-            sql += f"""INSERT INTO public.exercises (
+            yield f"""INSERT INTO public.exercises (
     id,
     course_id,
     title,
@@ -187,25 +238,20 @@ def generate_exercises_sql(all_exercises: Dict[str, List[Dict[str, Any]]]) -> st
     {i},
     true
 );\n\n"""
-            
-            total_exercises += 1
     
-    sql += f"-- Total d'exercices générés: {total_exercises}\n"
-    return sql
+    yield f"-- Total d'exercices générés: {total_exercises}\n"
 
-def generate_complete_sql_library() -> str:
-    """Générer la bibliothèque SQL complète"""
-    print("Génération de la bibliothèque SQL complète...")
-    
-    # Charger tous les exercices
-    all_exercises = load_all_exercise_files()
-    
-    if not all_exercises:
-        print("Aucun fichier d'exercices trouvé!")
-        return ""
-    
-    # Générer le SQL
-    sql = f"""-- ============================================
+def iter_sql_library(all_exercises: Dict[str, List[Dict[str, Any]]],
+                     output_format: str = 'insert',
+                     batch_size: int = MULTI_ROW_SIZE,
+                     copy_file: Optional[str] = None) -> Iterator[str]:
+    """
+    Générer la bibliothèque SQL complète, instruction par instruction.
+
+    Le script n'est jamais assemblé en mémoire: write_sql() écrit chaque
+    morceau dans le fichier dès qu'il est produit.
+    """
+    yield f"""-- ============================================
 -- BIBLIOTHÈQUE SQL MATHIA - EXERCICES 6ÈME
 -- ============================================
 -- Généré automatiquement le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -223,13 +269,13 @@ SET session_replication_role = replica;
 """
     
     # Ajouter les cours
-    sql += generate_courses_sql()
+    yield from iter_courses_sql()
     
     # Ajouter les exercices
-    sql += generate_exercises_sql(all_exercises)
+    yield from iter_exercises_sql(all_exercises, output_format, batch_size, copy_file)
     
     # Réactiver les contraintes
-    sql += """-- Réactiver les contraintes
+    yield """-- Réactiver les contraintes
 SET session_replication_role = DEFAULT;
 
 -- ============================================
@@ -276,37 +322,59 @@ SELECT 'Total exercices' as type, COUNT(*) as nombre FROM public.exercises;
 -- BIBLIOTHÈQUE SQL GÉNÉRÉE AVEC SUCCÈS !
 -- ============================================
 """
-    
-    return sql
 
 def main():
     """Fonction principale"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Generer la bibliotheque SQL des exercices')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='insert',
+                       help='insert: un INSERT par exercice, multirow: INSERT multi-lignes, '
+                            'copy: fichier .copy charge par \\copy (psql)')
+    parser.add_argument('--batch-size', type=int, default=MULTI_ROW_SIZE,
+                       help='Lignes par INSERT en format multirow')
+    parser.add_argument('--output', default='mathia_exercises_library.sql',
+                       help='Fichier SQL genere')
+    
+    args = parser.parse_args()
+    
     print('=' * 60)
     print('GÉNÉRATEUR DE BIBLIOTHÈQUE SQL - MATHIA')
     print('=' * 60)
     print()
     
-    # Générer la bibliothèque SQL
-    sql_library = generate_complete_sql_library()
+    print("Génération de la bibliothèque SQL complète...")
+    
+    # Charger tous les exercices
+    all_exercises = load_all_exercise_files()
     
-    if not sql_library:
+    if not all_exercises:
+        print("Aucun fichier d'exercices trouvé!")
         print("Erreur: Impossible de générer la bibliothèque SQL")
         sys.exit(1)
     
-    # Sauvegarder dans un fichier
-    output_file = "mathia_exercises_library.sql"
+    # Générer et écrire le SQL au fil de l'eau
+    output_file = args.output
+    copy_file = copy_file_for(output_file) if args.format == 'copy' else None
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(sql_library)
+        if copy_file:
+            write_sql(copy_file, iter_library_copy_rows(all_exercises))
+            print(f"[FILE] Donnees COPY: {copy_file} ({os.path.getsize(copy_file) / (1024*1024):.1f} MB)")
+        write_sql(output_file, iter_sql_library(all_exercises, args.format, args.batch_size, copy_file))
         
         print(f"[SUCCESS] Bibliotheque SQL generee avec succes!")
-        print(f"[FILE] Fichier cree: {output_file}")
+        print(f"[FILE] Fichier cree: {output_file} ({os.path.getsize(output_file) / (1024*1024):.1f} MB)")
         print()
         print("[INSTRUCTIONS] UTILISATION:")
-        print("1. Ouvrez le SQL Editor dans votre projet Supabase")
-        print("2. Copiez-collez le contenu du fichier mathia_exercises_library.sql")
-        print("3. Executez le script")
-        print("4. Verifiez les resultats avec les requetes de test incluses")
+        if copy_file:
+            print(f"1. Placez-vous dans le dossier de {copy_file}")
+            print(f"2. Executez: psql \"$DATABASE_URL\" -f {output_file}")
+            print("3. Verifiez les resultats avec les requetes de test incluses")
+        else:
+            print("1. Ouvrez le SQL Editor dans votre projet Supabase")
+            print(f"2. Copiez-collez le contenu du fichier {output_file}")
+            print("3. Executez le script")
+            print("4. Verifiez les resultats avec les requetes de test incluses")
         print()
         print("[INFO] Cette bibliotheque contient TOUS vos exercices JSON transformes en SQL!")
         
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Planification des appels de génération d'exercices (OpenAI ou client local)
+
+Une réponse de chat.completions est limitée par max_tokens: au lieu d'un
+seul appel pour --count exercices, GenerationScheduler envoie des requêtes
+de batch_size exercices:
+    - au plus `concurrency` requêtes simultanées (threads), et au plus
+      `requests_per_minute` démarrées par minute (RateLimiter);
+    - une requête en échec (erreur API, JSON invalide) est rejouée après un
+      délai aléatoire croissant, jusqu'à max_retries fois;
+    - les réponses sont fusionnées dans l'ordre des requêtes et les
+      quasi-doublons écartés (near_duplicates); tant qu'il manque des
+      exercices, de nouvelles requêtes sont envoyées (au plus max_rounds);
+    - chaque réponse est ajoutée au fichier de reprise (JSONL) dès son
+      arrivée: relancé après un arrêt, le générateur repart des réponses
+      déjà reçues et ne demande que les exercices manquants.
+
+Le client n'est utilisé que par client.chat.completions.create(...):
+StubChatClient le remplace pour les essais hors ligne.
+
+Usage:
+    python scripts/generation_scheduler.py --benchmark
+    python scripts/generation_scheduler.py --benchmark --count 500 --latency 0.5 --concurrency 8
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from near_duplicates import DEFAULT_THRESHOLD, NearDuplicateIndex, exercise_text
+
+DEFAULT_MODEL = 'gpt-4'
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_MAX_TOKENS = 4000
+
+SYSTEM_PROMPT = ("Tu es un expert en pédagogie mathématique pour collégiens français. "
+                 "Tu génères des exercices au format JSON strict.")
+
+
+def parse_exercises_response(content: str) -> List[Dict[str, Any]]:
+    """
+    Exercices d'une réponse du modèle (tableau JSON, éventuellement entre
+    balises markdown). Lève json.JSONDecodeError si la réponse n'est pas du JSON.
+    """
+    content = content.strip()
+
+    # Nettoyer la réponse (retirer les balises markdown si présentes)
+    if content.startswith('```json'):
+        content = content[7:]
+    elif content.startswith('```'):
+        content = content[3:]
+
+    if content.endswith('```'):
+        content = content[:-3]
+
+    exercises = json.loads(content.strip())
+
+    # Un exercice seul est accepté comme un tableau d'un élément
+    if not isinstance(exercises, list):
+        exercises = [exercises]
+    return [exercise for exercise in exercises if isinstance(exercise, dict)]
+
+
+class RateLimiter:
+    """Espacer les départs de requêtes: au plus `per_minute` par minute (0: sans limite)"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Checkpoint:
+    """
+    Fichier de reprise JSONL: une ligne d'en-tête (paramètres de la
+    génération), puis une ligne par réponse reçue {"request": n, "exercises": [...]}.
+    """
+
+    def __init__(self, path: str, params: Dict[str, Any]):
+        self.path = path
+        self.params = params
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[int, List[Dict[str, Any]]]:
+        """Réponses déjà reçues (vide si le fichier n'existe pas ou concerne d'autres paramètres)"""
+        responses: Dict[int, List[Dict[str, Any]]] = {}
+        if not self.path or not os.path.exists(self.path):
+            return responses
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = iter(f)
+            try:
+                header = json.loads(next(lines))
+            except (StopIteration, json.JSONDecodeError):
+                return responses
+            if header.get('params') != self.params:
+                print(f"⚠️  {self.path} concerne une autre génération: ignoré")
+                return responses
+
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    break
+                responses[record['request']] = record['exercises']
+        return responses
+
+    def start(self, resumed: bool):
+        """Créer le fichier (en-tête), sauf si l'on reprend un fichier compatible"""
+        if not self.path or resumed:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'params': self.params}, ensure_ascii=False) + '\n')
+
+    def append(self, request: int, exercises: List[Dict[str, Any]]):
+        if not self.path:
+            return
+        line = json.dumps({'request': request, 'exercises': exercises}, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class GenerationScheduler:
+    """
+    Générer `count` exercices distincts en plusieurs requêtes concurrentes.
+
+    make_prompt(nombre d'exercices, numéro de la requête) construit le prompt
+    de chaque requête; le numéro permet de varier les demandes.
+    """
+
+    def __init__(self, client: Any, make_prompt: Callable[[int, int], str],
+                 model: str = DEFAULT_MODEL, batch_size: int = DEFAULT_BATCH_SIZE,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries: int = 3, max_rounds: int = 3,
+                 dedup_threshold: float = DEFAULT_THRESHOLD,
+                 temperature: float = 0.8, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 backoff_base: float = 1.0, backoff_cap: float = 30.0):
+        self.client = client
+        self.make_prompt = make_prompt
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(requests_per_minute)
+        self.max_retries = max_retries
+        self.max_rounds = max(1, max_rounds)
+        self.dedup_threshold = dedup_threshold
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self.report = {'requests': 0, 'retries': 0, 'failed': 0, 'received': 0,
+                       'duplicates': 0, 'resumed': 0}
+
+    def _request(self, index: int, count: int) -> List[Dict[str, Any]]:
+        """Une requête, rejouée en cas d'échec; lève la dernière erreur"""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            with self._lock:
+                self.report['requests'] += 1
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": self.make_prompt(count, index)},
+                    ],
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
+                return parse_exercises_response(response.choices[0].message.content or '')
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                with self._lock:
+                    self.report['retries'] += 1
+                time.sleep(self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+                attempt += 1
+
+    def _merge(self, responses: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Exercices des réponses, dans l'ordre des requêtes, sans quasi-doublons"""
+        index = NearDuplicateIndex(self.dedup_threshold)
+        merged = []
+        duplicates = 0
+        for request in sorted(responses):
+            for position, exercise in enumerate(responses[request]):
+                if index.add((request, position), exercise_text(exercise)) is None:
+                    merged.append(exercise)
+                else:
+                    duplicates += 1
+        self.report['duplicates'] = duplicates
+        return merged
+
+    def run(self, count: int, checkpoint: Optional[Checkpoint] = None,
+            on_response: Optional[Callable[[int, int, int], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Au plus `count` exercices distincts (moins si max_rounds ne suffit pas).
+
+        on_response(numéro de requête, exercices reçus, total reçu) est appelé
+        à chaque réponse.
+        """
+        responses = checkpoint.load() if checkpoint else {}
+        self.report['resumed'] = len(responses)
+        if checkpoint:
+            checkpoint.start(resumed=bool(responses))
+        next_request = max(responses, default=-1) + 1
+
+        merged = self._merge(responses)
+        for _ in range(self.max_rounds):
+            missing = count - len(merged)
+            if missing <= 0:
+                break
+
+            # Découper le manque en requêtes de batch_size exercices
+            plan: List[Tuple[int, int]] = []
+            while missing > 0:
+                size = min(self.batch_size, missing)
+                plan.append((next_request, size))
+                next_request += 1
+                missing -= size
+
+            def run_one(request: int, size: int):
+                try:
+                    exercises = self._request(request, size)
+                except Exception as e:
+                    with self._lock:
+                        self.report['failed'] += 1
+                    print(f"❌ Requête {request + 1} abandonnée: {e}")
+                    return
+                if checkpoint:
+                    checkpoint.append(request, exercises)
+                with self._lock:
+                    responses[request] = exercises
+                    self.report['received'] += len(exercises)
+                    if on_response:
+                        on_response(request, len(exercises), self.report['received'])
+
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(plan))) as executor:
+                for request, size in plan:
+                    executor.submit(run_one, request, size)
+
+            merged = self._merge(responses)
+
+        return merged[:count]
+
+
+class StubChatClient:
+    """
+    Client local au format de openai.OpenAI (chat.completions.create), pour
+    les essais sans clé ni réseau.
+
+    Chaque appel attend `latency` secondes et retourne le nombre d'exercices
+    demandé dans le prompt (« Génère exactement N exercices »); une part
+    duplicate_rate reprend un énoncé déjà produit, et failure_rate des
+    appels lèvent une erreur.
+    """
+
+    _COUNT = re.compile(r'exactement (\d+) exercices')
+
+    def __init__(self, latency: float = 0.2, duplicate_rate: float = 0.1,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.duplicate_rate = duplicate_rate
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._serial = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model: str, messages: List[Dict[str, str]], **kwargs) -> Any:
+        time.sleep(self.latency)
+        match = self._COUNT.search(messages[-1]['content'])
+        count = int(match.group(1)) if match else 1
+
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.failure_rate:
+                raise RuntimeError("erreur simulée de l'API")
+            exercises = []
+            for _ in range(count):
+                if self._serial and self._random.random() < self.duplicate_rate:
+                    number = self._random.randrange(1, self._serial + 1)
+                else:
+                    self._serial += 1
+                    number = self._serial
+                exercises.append({
+                    'id': f'stub-{number}',
+                    'type': 'calcul',
+                    'body': f"Calculer la somme de {number} et de {number * 7 % 97} "
+                            f"puis donner le resultat arrondi a l'unite (serie {number}).",
+                    'answer': str(number + number * 7 % 97),
+                    'explanation': 'On additionne les deux nombres.',
+                    'difficulty': 'facile',
+                    'tags': ['stub'],
+                })
+
+        content = '```json\n' + json.dumps(exercises, ensure_ascii=False) + '\n```'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _stub_prompt(count: int, index: int) -> str:
+    return f"Série {index + 1}. Génère exactement {count} exercices différents au format JSON."
+
+
+def run_benchmark(count: int = 200, latency: float = 0.2, concurrency: int = 8,
+                  batch_size: int = DEFAULT_BATCH_SIZE):
+    """Comparer une requête à la fois et les requêtes concurrentes, puis une reprise"""
+    import tempfile
+
+    print(f"Client local: {count} exercices par requetes de {batch_size}, latence {latency * 1000:.0f} ms")
+    for label, workers in (('une requete a la fois', 1), (f'{concurrency} requetes simultanees', concurrency)):
+        scheduler = GenerationScheduler(StubChatClient(latency, failure_rate=0.05), _stub_prompt,
+                                        batch_size=batch_size, concurrency=workers,
+                                        requests_per_minute=0, backoff_base=0.01)
+        start = time.perf_counter()
+        exercises = scheduler.run(count)
+        elapsed = time.perf_counter() - start
+        report = scheduler.report
+        print(f"   {label:<26} {elapsed:6.2f}s  {len(exercises)} exercices, "
+              f"{report['requests']} requetes ({report['retries']} rejouees), "
+              f"{report['duplicates']} doublons ecartes")
+
+    with tempfile.TemporaryDirectory(prefix='generation_') as tmp_dir:
+        checkpoint = Checkpoint(os.path.join(tmp_dir, 'reprise.jsonl'), {'count': count})
+        half = GenerationScheduler(StubChatClient(latency), _stub_prompt, batch_size=batch_size,
+                                   concurrency=concurrency, requests_per_minute=0, max_rounds=1)
+        # Arrêt simulé: seule la moitié des exercices est demandée
+        half.run(count // 2, checkpoint)
+        resumed = GenerationScheduler(StubChatClient(latency, seed=1), _stub_prompt, batch_size=batch_size,
+                                      concurrency=concurrency, requests_per_minute=0)
+        exercises = resumed.run(count, checkpoint)
+        print(f"   reprise: {resumed.report['resumed']} reponses relues, "
+              f"{resumed.report['requests']} nouvelles requetes, {len(exercises)} exercices")
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generation concurrente d\'exercices (client local)')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Mesurer le gain des requetes concurrentes avec un faux client')
+    parser.add_argument('--count', type=int, default=200,
+                       help='Nombre d\'exercices a generer')
+    parser.add_argument('--latency', type=float, default=0.2,
+                       help='Temps de reponse simule par requete, en secondes')
+    parser.add_argument('--concurrency', type=int, default=8,
+                       help='Nombre de requetes simultanees')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='Exercices demandes par requete')
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    run_benchmark(args.count, args.latency, args.concurrency, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
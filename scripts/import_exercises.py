@@ -7,14 +7,12 @@ Usage:
     python scripts/import_exercises.py --file backend/data/generated_exercises.json --course-id 1
 """
 
-import os
 import sys
 import json
 import argparse
 
 try:
     import psycopg2
-    from psycopg2.extras import Json
 except ImportError:
     print("❌ Le module psycopg2 n'est pas installé.")
     print("📦 Installez-le avec: pip install psycopg2-binary")
@@ -26,29 +24,18 @@ except ImportError:
     print("⚠️  Le module python-dotenv n'est pas installé.")
     load_dotenv = lambda: None
 
+from corpus import read_exercise_file
+from chunked_import import DEFAULT_COMMIT_EVERY, ImportJournal, import_in_chunks
+from db_connection import connect
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration de la base de données
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', 5432),
-    'database': os.getenv('DB_NAME', 'mathia_db'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', '')
-}
-
 
 def get_db_connection():
-    """Créer une connexion à la base de données PostgreSQL"""
+    """Créer une connexion à la base de données PostgreSQL (DATABASE_URL ou DB_CONFIG)"""
     try:
-        # Essayer d'abord avec DATABASE_URL si disponible
-        database_url = os.getenv('DATABASE_URL')
-        if database_url:
-            conn = psycopg2.connect(database_url)
-        else:
-            conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return connect()
     except Exception as e:
         print(f"❌ Erreur de connexion à la base de données: {e}")
         sys.exit(1)
@@ -57,8 +44,7 @@ def get_db_connection():
 def load_exercises(file_path):
     """Charger les exercices depuis le fichier JSON"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
+        exercises = read_exercise_file(file_path)
         
         if not isinstance(exercises, list):
             print("⚠️  Le fichier ne contient pas un tableau, encapsulation...")
@@ -89,70 +75,30 @@ def verify_course_exists(conn, course_id):
         return False
 
 
-def import_exercise(conn, exercise, course_id):
-    """Importer un exercice dans la base de données"""
-    cursor = conn.cursor()
-    
-    try:
-        # Convertir les options en JSON si c'est une liste
-        options = exercise.get('options')
-        if isinstance(options, list):
-            # Convertir la liste en dict avec des clés A, B, C, D...
-            options = {chr(65 + i): opt for i, opt in enumerate(options)}
-        
-        # Préparer les tags
-        tags = exercise.get('tags', [])
-        if isinstance(tags, str):
-            tags = [tags]
-        
-        cursor.execute(
-            """
-            INSERT INTO exercises 
-            ("courseId", type, body, options, answer, explanation, difficulty, tags, "createdAt", "updatedAt")
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            RETURNING id
-            """,
-            (
-                course_id,
-                exercise.get('type', 'qcm'),
-                exercise.get('body', ''),
-                Json(options) if options else None,
-                exercise.get('answer', ''),
-                exercise.get('explanation', ''),
-                exercise.get('difficulty', 'moyen'),
-                Json(tags) if tags else None
-            )
-        )
-        
-        exercise_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        
-        return exercise_id
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        raise e
-
-
-def import_all_exercises(conn, exercises, course_id):
-    """Importer tous les exercices"""
-    success_count = 0
-    error_count = 0
+def import_all_exercises(conn, exercises, course_id, commit_every=DEFAULT_COMMIT_EVERY, journal=None):
+    """
+    Importer tous les exercices, validés par paquets de commit_every
     
+    Un exercice refusé n'annule que lui-même (SAVEPOINT par ligne). Avec un
+    journal (ImportJournal), un import interrompu reprend après le dernier
+    paquet validé.
+    """
     print("📥 Import des exercices en cours...\n")
     
-    for i, exercise in enumerate(exercises, 1):
-        try:
-            exercise_id = import_exercise(conn, exercise, course_id)
+    def on_row(i, exercise, exercise_id, error):
+        if error is None:
             print(f"✅ [{i}/{len(exercises)}] Exercice importé (ID: {exercise_id})")
             print(f"   📝 {exercise.get('body', 'N/A')[:60]}...")
-            success_count += 1
-        except Exception as e:
-            print(f"❌ [{i}/{len(exercises)}] Erreur: {e}")
-            error_count += 1
+        else:
+            print(f"❌ [{i}/{len(exercises)}] Erreur: {error}")
+    
+    result = import_in_chunks(conn, exercises, course_id, commit_every, journal, on_row)
+    success_count = result['success']
+    error_count = result['errors']
     
     print(f"\n{'='*60}")
+    if result['resumed']:
+        print(f"♻️  Reprise après {result['resumed']} exercices déjà traités")
     print(f"✅ Import terminé: {success_count} succès, {error_count} erreurs")
     print(f"{'='*60}\n")
     
@@ -188,6 +134,25 @@ Exemples d'utilisation:
         help='ID du cours auquel associer les exercices'
     )
     
+    parser.add_argument(
+        '--commit-every',
+        type=int,
+        default=DEFAULT_COMMIT_EVERY,
+        help=f'Exercices validés par transaction (défaut: {DEFAULT_COMMIT_EVERY})'
+    )
+    
+    parser.add_argument(
+        '--journal',
+        type=str,
+        help='Journal de reprise (défaut: <fichier>.import-journal.json)'
+    )
+    
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Ignorer le journal et reprendre l\'import depuis le début'
+    )
+    
     args = parser.parse_args()
     
     print('📥 ' + '='*58)
@@ -207,8 +172,12 @@ Exemples d'utilisation:
         conn.close()
         sys.exit(1)
     
-    # Importer les exercices
-    success, errors = import_all_exercises(conn, exercises, args.course_id)
+    # Importer les exercices (reprise après le dernier paquet validé si le journal existe)
+    journal = ImportJournal(args.journal or f"{args.file}.import-journal.json",
+                            args.file, args.course_id, len(exercises))
+    if args.restart:
+        journal.remove()
+    success, errors = import_all_exercises(conn, exercises, args.course_id, args.commit_every, journal)
     
     # Fermer la connexion
     conn.close()
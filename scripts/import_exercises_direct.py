@@ -10,11 +10,12 @@ import json
 import subprocess
 from typing import List, Dict, Any
 
+from corpus import read_exercise_file
+
 def load_exercises(file_path: str) -> List[Dict[str, Any]]:
     """Charger les exercices depuis le fichier JSON"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
+        exercises = read_exercise_file(file_path)
         
         if not isinstance(exercises, list):
             exercises = [exercises]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Rapport de vérification d'un import d'exercices, en une seule requête
+
+verify_import() comptait les exercices par quatre requêtes (total, par
+cours, par type, par difficulté), soit quatre parcours de la table.
+fetch_import_report() calcule tous ces comptages, plus le tableau croisé
+cours x type x difficulté, en un seul parcours avec GROUPING SETS.
+
+expected_counts() compte les mêmes cellules dans le JSON source (mêmes
+valeurs par défaut et même dédoublonnage par content_hash que l'import) et
+compare_with_source() liste les écarts entre la base et le fichier.
+
+Utilisé par import_to_database.py et import_fixed.py.
+"""
+
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from bulk_import import HASH_INDEX, exercise_row
+
+# (numéro de chapitre, type, difficulté)
+Cell = Tuple[int, str, str]
+
+# GROUPING("courseId", type, difficulty): bit à 1 pour chaque colonne agrégée
+_TOTAL, _BY_COURSE, _BY_TYPE, _BY_DIFFICULTY, _BY_CELL = 7, 3, 5, 6, 0
+
+# Agrégation sur les seules colonnes d'exercises (clés étroites), puis jointure
+# avec courses; les cours sans exercice sont ajoutés avec un nombre nul
+IMPORT_REPORT_SQL = """
+    WITH counts AS (
+        SELECT GROUPING("courseId", type, difficulty) AS grouping,
+               "courseId", type, difficulty, COUNT(*) AS n
+        FROM exercises
+        GROUP BY GROUPING SETS (
+            (),
+            ("courseId"),
+            (type),
+            (difficulty),
+            ("courseId", type, difficulty)
+        )
+    )
+    SELECT k.grouping, k."courseId", c.title, c.grade, c.chapter, k.type, k.difficulty, k.n
+    FROM counts k
+    LEFT JOIN courses c ON c.id = k."courseId"
+    UNION ALL
+    SELECT 3, c.id, c.title, c.grade, c.chapter, NULL, NULL, 0
+    FROM courses c
+    WHERE NOT EXISTS (SELECT 1 FROM counts k WHERE k.grouping = 3 AND k."courseId" = c.id)
+"""
+
+_CHAPTER_NUMBER = re.compile(r'Chapitre (\d+)')
+
+
+def fetch_import_report(conn) -> Dict[str, Any]:
+    """
+    Comptages des exercices en base, en un seul parcours.
+
+    Retourne {'total', 'courses': [(id, titre, niveau, chapitre, nombre)]
+    par id, 'types' et 'difficulties': [(valeur, nombre)] par nombre
+    décroissant, 'cells': {(id du cours, type, difficulté): nombre}}.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(IMPORT_REPORT_SQL)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    report: Dict[str, Any] = {'total': 0, 'courses': [], 'types': [], 'difficulties': [], 'cells': {}}
+    for grouping, course_id, title, grade, chapter, ex_type, difficulty, count in rows:
+        if grouping == _TOTAL:
+            report['total'] = count
+        elif grouping == _BY_COURSE:
+            if course_id is not None:
+                report['courses'].append((course_id, title, grade, chapter, count))
+        elif grouping == _BY_TYPE:
+            report['types'].append((ex_type, count))
+        elif grouping == _BY_DIFFICULTY:
+            report['difficulties'].append((difficulty, count))
+        elif grouping == _BY_CELL:
+            report['cells'][(course_id, ex_type, difficulty)] = count
+
+    report['courses'].sort()
+    report['types'].sort(key=lambda item: -item[1])
+    report['difficulties'].sort(key=lambda item: -item[1])
+    return report
+
+
+def expected_counts(exercises: List[Dict[str, Any]]) -> Counter:
+    """
+    Nombre d'exercices attendus par (chapitre, type, difficulté) dans le JSON.
+
+    Les doublons (même content_hash dans un chapitre) ne sont comptés
+    qu'une fois, comme l'import qui les ignore.
+    """
+    counts: Counter = Counter()
+    seen = set()
+    for exercise in exercises:
+        chapter_num = exercise.get('chapter_number', 1)
+        # Le numéro de chapitre tient lieu d'id de cours: un cours par chapitre
+        row = exercise_row(exercise, chapter_num)
+        if row[HASH_INDEX] in seen:
+            continue
+        seen.add(row[HASH_INDEX])
+        counts[(chapter_num, row[1], row[6])] += 1
+    return counts
+
+
+def course_chapters(report: Dict[str, Any], grade: str = '6eme') -> Dict[int, int]:
+    """Numéro de chapitre ('Chapitre N') des cours du niveau, par id de cours"""
+    chapters = {}
+    for course_id, _, course_grade, chapter, _ in report['courses']:
+        match = _CHAPTER_NUMBER.fullmatch(chapter or '')
+        if course_grade == grade and match:
+            chapters[course_id] = int(match.group(1))
+    return chapters
+
+
+def compare_with_source(report: Dict[str, Any], expected: Counter,
+                        grade: str = '6eme') -> List[Tuple[Cell, int, int]]:
+    """Cellules dont le nombre en base diffère du JSON: [(cellule, en base, attendus)]"""
+    chapters = course_chapters(report, grade)
+    actual: Counter = Counter()
+    for (course_id, ex_type, difficulty), count in report['cells'].items():
+        if course_id in chapters:
+            actual[(chapters[course_id], ex_type, difficulty)] += count
+
+    differences = []
+    for cell in sorted(set(actual) | set(expected), key=lambda c: (c[0], str(c[1]), str(c[2]))):
+        if actual[cell] != expected[cell]:
+            differences.append((cell, actual[cell], expected[cell]))
+    return differences
+
+
+def print_cross_tab(report: Dict[str, Any], grade: Optional[str] = '6eme'):
+    """Afficher le tableau croisé cours x type x difficulté"""
+    titles = {course_id: title for course_id, title, course_grade, _, _ in report['courses']
+              if grade is None or course_grade == grade}
+    by_course: Dict[Any, Dict[str, Dict[str, int]]] = {}
+    for (course_id, ex_type, difficulty), count in report['cells'].items():
+        if course_id in titles:
+            by_course.setdefault(course_id, {}).setdefault(ex_type, {})[difficulty] = count
+
+    for course_id in sorted(by_course):
+        print(f"  {titles[course_id]}:")
+        for ex_type in sorted(by_course[course_id], key=str):
+            difficulties = by_course[course_id][ex_type]
+            details = ', '.join(f"{difficulty} {count}" for difficulty, count in
+                                sorted(difficulties.items(), key=lambda item: str(item[0])))
+            print(f"    - {ex_type}: {sum(difficulties.values())} ({details})")
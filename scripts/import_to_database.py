@@ -3,10 +3,9 @@
 Script pour importer les exercices extraits dans la base de données
 """
 
-import os
 import sys
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 try:
     import psycopg2
@@ -21,32 +20,16 @@ try:
 except ImportError:
     load_dotenv = lambda: None
 
+from bulk_import import (DEFAULT_PAGE_SIZE, IMPORT_MODES, CONFLICT_MODES, content_hash,
+                         course_row, ensure_content_hash, exercise_row, insert_exercise_rows,
+                         insert_exercise_rows_sharded, upsert_courses)
+from corpus import read_exercise_file
+from db_connection import create_pool, get_db_connection
+from import_report import compare_with_source, expected_counts, fetch_import_report, print_cross_tab
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration de la base de données
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', 5432),
-    'database': os.getenv('DB_NAME', 'mathia_db'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', '')
-}
-
-
-def get_db_connection():
-    """Creer une connexion a la base de donnees PostgreSQL"""
-    try:
-        database_url = os.getenv('DATABASE_URL')
-        if database_url:
-            conn = psycopg2.connect(database_url)
-        else:
-            conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        print(f"Erreur de connexion a la base de donnees: {e}")
-        return None
-
 
 def create_courses(conn) -> Dict[int, int]:
     """Creer les cours dans la base de donnees"""
@@ -54,7 +37,6 @@ def create_courses(conn) -> Dict[int, int]:
         print("Pas de connexion a la base de donnees")
         return {}
     
-    cursor = conn.cursor()
     chapter_to_course_id = {}
     
     # Chapitres de 6eme
@@ -71,44 +53,21 @@ def create_courses(conn) -> Dict[int, int]:
     ]
     
     try:
-        for chapter in chapters:
-            # Verifier si le cours existe deja
-            cursor.execute(
-                "SELECT id FROM courses WHERE title = %s AND grade = %s",
-                (chapter['title'], chapter['grade'])
-            )
-            existing = cursor.fetchone()
-            
-            if existing:
-                course_id = existing[0]
-                print(f"Cours existant trouve: {chapter['title']} (ID: {course_id})")
+        # Tous les chapitres en un seul aller-retour
+        titles = {chapter['number']: chapter['title'] for chapter in chapters}
+        rows = [course_row(chapter) for chapter in chapters]
+        for number, course_id, created in upsert_courses(conn, rows):
+            if created:
+                print(f"Nouveau cours cree: {titles[number]} (ID: {course_id})")
             else:
-                # Creer le nouveau cours
-                cursor.execute(
-                    """
-                    INSERT INTO courses (title, grade, chapter, description, "createdAt", "updatedAt")
-                    VALUES (%s, %s, %s, %s, NOW(), NOW())
-                    RETURNING id
-                    """,
-                    (
-                        chapter['title'],
-                        chapter['grade'],
-                        f"Chapitre {chapter['number']}",
-                        f"Chapitre {chapter['number']} du manuel de mathematiques 6eme"
-                    )
-                )
-                course_id = cursor.fetchone()[0]
-                print(f"Nouveau cours cree: {chapter['title']} (ID: {course_id})")
-            
-            chapter_to_course_id[chapter['number']] = course_id
+                print(f"Cours existant trouve: {titles[number]} (ID: {course_id})")
+            chapter_to_course_id[number] = course_id
         
         conn.commit()
-        cursor.close()
         return chapter_to_course_id
         
     except Exception as e:
         conn.rollback()
-        cursor.close()
         print(f"Erreur lors de la creation des cours: {e}")
         return {}
 
@@ -116,8 +75,7 @@ def create_courses(conn) -> Dict[int, int]:
 def load_exercises(file_path: str) -> List[Dict[str, Any]]:
     """Charger les exercices depuis le fichier JSON"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
+        exercises = read_exercise_file(file_path)
         
         if not isinstance(exercises, list):
             exercises = [exercises]
@@ -134,14 +92,23 @@ def load_exercises(file_path: str) -> List[Dict[str, Any]]:
 
 def import_exercises_to_db(exercises: List[Dict[str, Any]], 
                           chapter_to_course_id: Dict[int, int], 
-                          conn):
-    """Importer les exercices dans la base de donnees"""
+                          conn,
+                          mode: str = 'batch',
+                          page_size: int = DEFAULT_PAGE_SIZE,
+                          on_conflict: str = 'nothing',
+                          pool=None):
+    """Importer les exercices dans la base de donnees (les exercices deja presents sont ignores)"""
     if not conn:
         print("Pas de connexion a la base de donnees")
         return
     
+    if mode != 'row':
+        return import_exercises_bulk(exercises, chapter_to_course_id, conn, mode, page_size, on_conflict,
+                                     pool)
+    
     cursor = conn.cursor()
     total_imported = 0
+    total_skipped = 0
     total_errors = 0
     
     try:
@@ -160,8 +127,9 @@ def import_exercises_to_db(exercises: List[Dict[str, Any]],
                 cursor.execute(
                     """
                     INSERT INTO exercises 
-                    ("courseId", type, body, options, answer, explanation, difficulty, tags, "createdAt", "updatedAt")
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                    ("courseId", type, body, options, answer, explanation, difficulty, tags, content_hash, "createdAt", "updatedAt")
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                    ON CONFLICT (content_hash) DO NOTHING
                     RETURNING id
                     """,
                     (
@@ -172,11 +140,17 @@ def import_exercises_to_db(exercises: List[Dict[str, Any]],
                         exercise.get('answer', ''),
                         exercise.get('explanation', ''),
                         exercise.get('difficulty', 'moyen'),
-                        Json(exercise.get('tags', []))
+                        Json(exercise.get('tags', [])),
+                        content_hash(exercise.get('body', ''), exercise.get('answer', ''),
+                                     exercise.get('type', 'libre'), course_id)
                     )
                 )
                 
-                exercise_id = cursor.fetchone()[0]
+                # Aucune ligne retournee: exercice deja present
+                if cursor.fetchone() is None:
+                    total_skipped += 1
+                    continue
+                
                 total_imported += 1
                 
                 if total_imported % 100 == 0:
@@ -192,8 +166,10 @@ def import_exercises_to_db(exercises: List[Dict[str, Any]],
         
         print(f"\nImport termine:")
         print(f"  - Exercices importes: {total_imported}")
+        print(f"  - Exercices deja presents: {total_skipped}")
         print(f"  - Erreurs: {total_errors}")
-        print(f"  - Taux de succes: {(total_imported/(total_imported+total_errors)*100):.1f}%")
+        if total_imported + total_errors > 0:
+            print(f"  - Taux de succes: {(total_imported/(total_imported+total_errors)*100):.1f}%")
         
     except Exception as e:
         conn.rollback()
@@ -201,69 +177,108 @@ def import_exercises_to_db(exercises: List[Dict[str, Any]],
         print(f"Erreur lors de l'import: {e}")
 
 
-def verify_import(conn):
-    """Verifier que l'import s'est bien passe"""
+def import_exercises_bulk(exercises: List[Dict[str, Any]], 
+                          chapter_to_course_id: Dict[int, int], 
+                          conn,
+                          mode: str,
+                          page_size: int = DEFAULT_PAGE_SIZE,
+                          on_conflict: str = 'nothing',
+                          pool=None):
+    """
+    Importer les exercices par paquets (COPY ou INSERT multi-lignes) avec upsert sur content_hash.
+    Avec un pool, les chapitres sont importes en parallele, chacun dans sa transaction.
+    """
+    total_errors = 0
+    rows_by_chapter: Dict[int, list] = {}
+    
+    workers = f", {pool.maxconn} connexions" if pool else ""
+    print(f"Import de {len(exercises)} exercices (mode {mode}, paquets de {page_size}{workers})...")
+    
+    for i, exercise in enumerate(exercises, 1):
+        chapter_num = exercise.get('chapter_number', 1)
+        course_id = chapter_to_course_id.get(chapter_num)
+        
+        if not course_id:
+            print(f"Pas de cours trouve pour le chapitre {chapter_num}")
+            total_errors += 1
+            continue
+        
+        rows_by_chapter.setdefault(chapter_num, []).append((i, exercise_row(exercise, course_id)))
+    
+    try:
+        if pool:
+            result = insert_exercise_rows_sharded(pool, rows_by_chapter, mode, page_size, on_conflict,
+                                                  pool.maxconn)
+        else:
+            rows = [row for chapter_rows in rows_by_chapter.values() for row in chapter_rows]
+            result = insert_exercise_rows(conn, rows, mode, page_size, on_conflict)
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Erreur lors de l'import: {e}")
+        return
+    
+    for i, error in result['errors'][:5]:  # Afficher seulement les 5 premières erreurs
+        print(f"Erreur exercice {i}: {error}")
+    total_errors += len(result['errors'])
+    total_imported = result['inserted'] + result['updated']
+    
+    print(f"\nImport termine:")
+    print(f"  - Exercices importes: {result['inserted']}")
+    print(f"  - Exercices mis a jour: {result['updated']}")
+    print(f"  - Exercices deja presents: {result['skipped']}")
+    print(f"  - Erreurs: {total_errors}")
+    if total_imported + total_errors > 0:
+        print(f"  - Taux de succes: {(total_imported/(total_imported+total_errors)*100):.1f}%")
+
+
+def verify_import(conn, exercises: Optional[List[Dict[str, Any]]] = None):
+    """
+    Verifier que l'import s'est bien passe (un seul parcours de la table)
+    
+    Avec les exercices du JSON source, les nombres par chapitre, type et
+    difficulte sont compares a ceux de la base.
+    """
     if not conn:
         print("Pas de connexion a la base de donnees")
         return
     
-    cursor = conn.cursor()
-    
     try:
-        # Compter le nombre total d'exercices
-        cursor.execute("SELECT COUNT(*) FROM exercises")
-        total_exercises = cursor.fetchone()[0]
-        
-        # Compter par cours
-        cursor.execute("""
-            SELECT c.title, c.grade, COUNT(e.id) as nb_exercices
-            FROM courses c
-            LEFT JOIN exercises e ON c.id = e."courseId"
-            WHERE c.grade = '6eme'
-            GROUP BY c.id, c.title, c.grade
-            ORDER BY c.id
-        """)
-        courses_stats = cursor.fetchall()
-        
-        # Compter par type
-        cursor.execute("""
-            SELECT type, COUNT(*) as nb_exercices
-            FROM exercises
-            GROUP BY type
-            ORDER BY nb_exercices DESC
-        """)
-        type_stats = cursor.fetchall()
-        
-        # Compter par difficulte
-        cursor.execute("""
-            SELECT difficulty, COUNT(*) as nb_exercices
-            FROM exercises
-            GROUP BY difficulty
-            ORDER BY nb_exercices DESC
-        """)
-        difficulty_stats = cursor.fetchall()
-        
-        cursor.close()
-        
-        print(f"\nVERIFICATION DE L'IMPORT:")
-        print(f"=" * 50)
-        print(f"Total d'exercices dans la base: {total_exercises}")
-        
-        print(f"\nPar cours (6eme):")
-        for title, grade, count in courses_stats:
-            print(f"  - {title}: {count} exercices")
-        
-        print(f"\nPar type:")
-        for ex_type, count in type_stats:
-            print(f"  - {ex_type}: {count} exercices")
-        
-        print(f"\nPar difficulte:")
-        for difficulty, count in difficulty_stats:
-            print(f"  - {difficulty}: {count} exercices")
-        
+        report = fetch_import_report(conn)
     except Exception as e:
-        cursor.close()
+        conn.rollback()
         print(f"Erreur lors de la verification: {e}")
+        return
+    
+    print(f"\nVERIFICATION DE L'IMPORT:")
+    print(f"=" * 50)
+    print(f"Total d'exercices dans la base: {report['total']}")
+    
+    print(f"\nPar cours (6eme):")
+    for _, title, grade, _, count in report['courses']:
+        if grade == '6eme':
+            print(f"  - {title}: {count} exercices")
+    
+    print(f"\nPar type:")
+    for ex_type, count in report['types']:
+        print(f"  - {ex_type}: {count} exercices")
+    
+    print(f"\nPar difficulte:")
+    for difficulty, count in report['difficulties']:
+        print(f"  - {difficulty}: {count} exercices")
+    
+    print(f"\nPar cours, type et difficulte (6eme):")
+    print_cross_tab(report)
+    
+    if exercises is not None:
+        differences = compare_with_source(report, expected_counts(exercises))
+        if not differences:
+            print(f"\nComparaison avec le fichier source: aucun ecart")
+        else:
+            print(f"\nComparaison avec le fichier source: {len(differences)} ecarts")
+            for (chapter_num, ex_type, difficulty), actual, expected in differences[:20]:
+                print(f"  - Chapitre {chapter_num}, {ex_type}, {difficulty}: "
+                      f"{actual} en base, {expected} attendus")
 
 
 def main():
@@ -275,6 +290,16 @@ def main():
                        help='Fichier JSON contenant les exercices')
     parser.add_argument('--verify-only', action='store_true', 
                        help='Seulement verifier les donnees existantes')
+    parser.add_argument('--compare', action='store_true',
+                       help='Avec --verify-only: comparer les nombres en base a ceux du fichier JSON')
+    parser.add_argument('--mode', choices=IMPORT_MODES, default='batch',
+                       help='row: un INSERT par exercice, batch: INSERT multi-lignes, copy: COPY FROM STDIN')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                       help='Nombre d\'exercices par paquet en mode batch/copy')
+    parser.add_argument('--on-conflict', choices=CONFLICT_MODES, default='nothing',
+                       help='Exercice deja present (meme content_hash): l\'ignorer ou mettre a jour ses autres colonnes')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Nombre de connexions important les chapitres en parallele (mode batch/copy)')
     
     args = parser.parse_args()
     
@@ -292,7 +317,7 @@ def main():
     
     if args.verify_only:
         # Seulement verifier
-        verify_import(conn)
+        verify_import(conn, load_exercises(args.file) if args.compare else None)
     else:
         # Charger les exercices
         exercises = load_exercises(args.file)
@@ -301,6 +326,9 @@ def main():
             conn.close()
             sys.exit(1)
         
+        # Empreinte de contenu pour des imports idempotents
+        ensure_content_hash(conn)
+        
         # Creer les cours
         print("Creation des cours...")
         chapter_to_course_id = create_courses(conn)
@@ -311,11 +339,17 @@ def main():
         
         # Importer les exercices
         print("\nImport des exercices...")
-        import_exercises_to_db(exercises, chapter_to_course_id, conn)
+        pool = create_pool(args.workers) if args.workers > 1 and args.mode != 'row' else None
+        try:
+            import_exercises_to_db(exercises, chapter_to_course_id, conn, args.mode, args.page_size,
+                                   args.on_conflict, pool)
+        finally:
+            if pool:
+                pool.closeall()
         
         # Verifier l'import
         print("\nVerification de l'import...")
-        verify_import(conn)
+        verify_import(conn, exercises)
     
     conn.close()
     print(f"\nImport termine avec succes!")
@@ -6,14 +6,15 @@ Script pour importer les exercices dans Supabase
 import os
 import sys
 import json
-import requests
 from typing import List, Dict, Any
 
+from corpus import read_exercise_file
+from rest_client import DEFAULT_CONCURRENCY, AdaptiveBatcher, SupabaseClient
+
 def load_exercises(file_path: str) -> List[Dict[str, Any]]:
     """Charger les exercices depuis le fichier JSON"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
+        exercises = read_exercise_file(file_path)
         
         if not isinstance(exercises, list):
             exercises = [exercises]
@@ -47,14 +48,8 @@ def get_supabase_config():
     
     return url, key
 
-def create_courses_in_supabase(url: str, key: str) -> Dict[int, str]:
+def create_courses_in_supabase(client: SupabaseClient) -> Dict[int, str]:
     """Creer les cours dans Supabase"""
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
-    
     courses = [
         {"number": 1, "title": "Nombres entiers", "grade": "6eme"},
         {"number": 2, "title": "Nombres decimaux", "grade": "6eme"},
@@ -69,46 +64,25 @@ def create_courses_in_supabase(url: str, key: str) -> Dict[int, str]:
     
     chapter_to_course_id = {}
     
+    course_data = [
+        {
+            "title": course['title'],
+            "grade": course['grade'],
+            "chapter": f"Chapitre {course['number']}",
+            "description": f"Chapitre {course['number']} du manuel de mathematiques 6eme"
+        }
+        for course in courses
+    ]
+    
     try:
-        for course in courses:
-            # Verifier si le cours existe deja
-            response = requests.get(
-                f"{url}/rest/v1/courses",
-                headers=headers,
-                params={"title": f"eq.{course['title']}", "grade": f"eq.{course['grade']}"}
-            )
-            
-            if response.status_code == 200:
-                existing_courses = response.json()
-                if existing_courses:
-                    course_id = existing_courses[0]['id']
-                    print(f"Cours existant trouve: {course['title']} (ID: {course_id})")
-                else:
-                    # Creer le nouveau cours
-                    course_data = {
-                        "title": course['title'],
-                        "grade": course['grade'],
-                        "chapter": f"Chapitre {course['number']}",
-                        "description": f"Chapitre {course['number']} du manuel de mathematiques 6eme"
-                    }
-                    
-                    response = requests.post(
-                        f"{url}/rest/v1/courses",
-                        headers=headers,
-                        json=course_data
-                    )
-                    
-                    if response.status_code == 201:
-                        course_id = response.json()['id']
-                        print(f"Nouveau cours cree: {course['title']} (ID: {course_id})")
-                    else:
-                        print(f"Erreur creation cours {course['title']}: {response.status_code} - {response.text}")
-                        continue
-            else:
-                print(f"Erreur verification cours {course['title']}: {response.status_code}")
+        # Tous les cours en une requete (upsert sur titre et niveau)
+        stored = client.upsert("courses", course_data, ("title", "grade"))
+        for course, row in zip(courses, stored):
+            if not row:
+                print(f"Erreur creation cours {course['title']}: cours absent de la reponse")
                 continue
-            
-            chapter_to_course_id[course['number']] = course_id
+            print(f"Cours pret: {course['title']} (ID: {row['id']})")
+            chapter_to_course_id[course['number']] = row['id']
         
         return chapter_to_course_id
         
@@ -118,94 +92,79 @@ def create_courses_in_supabase(url: str, key: str) -> Dict[int, str]:
 
 def import_exercises_to_supabase(exercises: List[Dict[str, Any]], 
                                 chapter_to_course_id: Dict[int, str],
-                                url: str, key: str):
-    """Importer les exercices dans Supabase"""
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
-    
+                                client: SupabaseClient,
+                                concurrency: int = DEFAULT_CONCURRENCY,
+                                batch_size: int = 100,
+                                target_latency: float = 1.0):
+    """Importer les exercices dans Supabase (plusieurs batchs envoyes en parallele)"""
     total_imported = 0
     total_errors = 0
+    rows = []
     
     try:
         print(f"Import de {len(exercises)} exercices dans Supabase...")
         
-        # Importer par batch de 100 pour eviter les timeouts
-        batch_size = 100
-        for i in range(0, len(exercises), batch_size):
-            batch = exercises[i:i + batch_size]
-            batch_data = []
-            
-            for exercise in batch:
-                try:
-                    chapter_num = exercise.get('chapter_number', 1)
-                    course_id = chapter_to_course_id.get(chapter_num)
-                    
-                    if not course_id:
-                        print(f"Pas de cours trouve pour le chapitre {chapter_num}")
-                        total_errors += 1
-                        continue
-                    
-                    # Preparer les donnees de l'exercice
-                    exercise_data = {
-                        "course_id": course_id,
-                        "type": exercise.get('type', 'libre'),
-                        "body": exercise.get('body', '')[:1000],  # Limiter la longueur
-                        "answer": exercise.get('answer', ''),
-                        "explanation": exercise.get('explanation', ''),
-                        "difficulty": exercise.get('difficulty', 'moyen'),
-                        "tags": exercise.get('tags', []),
-                        "options": exercise.get('options')
-                    }
-                    
-                    batch_data.append(exercise_data)
-                    
-                except Exception as e:
+        for exercise in exercises:
+            try:
+                chapter_num = exercise.get('chapter_number', 1)
+                course_id = chapter_to_course_id.get(chapter_num)
+                
+                if not course_id:
+                    print(f"Pas de cours trouve pour le chapitre {chapter_num}")
                     total_errors += 1
-                    if total_errors <= 5:
-                        print(f"Erreur preparation exercice: {e}")
-            
-            if batch_data:
-                # Envoyer le batch
-                response = requests.post(
-                    f"{url}/rest/v1/exercises",
-                    headers=headers,
-                    json=batch_data
-                )
+                    continue
+                
+                # Preparer les donnees de l'exercice
+                exercise_data = {
+                    "course_id": course_id,
+                    "type": exercise.get('type', 'libre'),
+                    "body": exercise.get('body', '')[:1000],  # Limiter la longueur
+                    "answer": exercise.get('answer', ''),
+                    "explanation": exercise.get('explanation', ''),
+                    "difficulty": exercise.get('difficulty', 'moyen'),
+                    "tags": exercise.get('tags', []),
+                    "options": exercise.get('options')
+                }
                 
-                if response.status_code == 201:
-                    imported_count = len(batch_data)
-                    total_imported += imported_count
-                    print(f"Batch importe: {imported_count} exercices (Total: {total_imported})")
-                else:
-                    total_errors += len(batch_data)
-                    print(f"Erreur batch: {response.status_code} - {response.text}")
+                rows.append(exercise_data)
+                
+            except Exception as e:
+                total_errors += 1
+                if total_errors <= 5:
+                    print(f"Erreur preparation exercice: {e}")
+        
+        # Taille des batchs ajustee a la latence, reprises et isolement des lignes refusees
+        def on_batch(size, total, next_size):
+            print(f"Batch importe: {size} exercices (Total: {total}, prochain batch: {next_size})")
+        
+        batcher = AdaptiveBatcher(client, "exercises", initial_size=batch_size, target_latency=target_latency,
+                                  concurrency=concurrency, on_batch=on_batch)
+        report = batcher.run(rows)
+        total_imported += report['imported']
+        total_errors += report['lost']
+        
+        for index, status, text in report['errors'][:5]:
+            print(f"Exercice {index + 1} refuse: {status} - {text}")
+        if report['aborted']:
+            print(f"Import arrete (status {report['aborted']}): verifiez SUPABASE_URL, la cle et les droits")
         
         print(f"\nImport termine:")
         print(f"  - Exercices importes: {total_imported}")
+        print(f"  - Exercices perdus: {report['lost']}")
         print(f"  - Erreurs: {total_errors}")
+        print(f"  - Debit: {report['rows_per_second']:.0f} exercices/s ({report['requests']} requetes, "
+              f"{report['retries']} reprises, {report['bisections']} batchs coupes en deux)")
         if total_imported + total_errors > 0:
             print(f"  - Taux de succes: {(total_imported/(total_imported+total_errors)*100):.1f}%")
         
     except Exception as e:
         print(f"Erreur lors de l'import: {e}")
 
-def verify_import_in_supabase(url: str, key: str):
+def verify_import_in_supabase(client: SupabaseClient):
     """Verifier l'import dans Supabase"""
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}'
-    }
-    
     try:
         # Compter le nombre total d'exercices
-        response = requests.get(
-            f"{url}/rest/v1/exercises",
-            headers=headers,
-            params={"select": "count"}
-        )
+        response = client.get("exercises", params={"select": "count"})
         
         if response.status_code == 200:
             # Supabase retourne le count dans les headers
@@ -218,11 +177,7 @@ def verify_import_in_supabase(url: str, key: str):
                 print(f"Total d'exercices dans Supabase: {len(exercises)}")
         
         # Statistiques par cours
-        response = requests.get(
-            f"{url}/rest/v1/courses",
-            headers=headers,
-            params={"select": "id,title,grade"}
-        )
+        response = client.get("courses", params={"select": "id,title,grade"})
         
         if response.status_code == 200:
             courses = response.json()
@@ -242,6 +197,12 @@ def main():
                        help='Fichier JSON contenant les exercices')
     parser.add_argument('--verify-only', action='store_true', 
                        help='Seulement verifier les donnees existantes')
+    parser.add_argument('--batch-size', type=int, default=100,
+                       help='Taille initiale des batchs (ajustee ensuite a la latence)')
+    parser.add_argument('--target-latency', type=float, default=1.0,
+                       help='Latence visee par batch, en secondes')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help='Nombre de batchs envoyes simultanement')
     
     args = parser.parse_args()
     
@@ -256,30 +217,32 @@ def main():
     
     print(f"Connexion a Supabase: {url}")
     
-    if args.verify_only:
-        # Seulement verifier
-        verify_import_in_supabase(url, key)
-    else:
-        # Charger les exercices
-        exercises = load_exercises(args.file)
-        if not exercises:
-            print("Aucun exercice a importer")
-            sys.exit(1)
-        
-        # Creer les cours
-        print("Creation des cours dans Supabase...")
-        chapter_to_course_id = create_courses_in_supabase(url, key)
-        if not chapter_to_course_id:
-            print("Erreur: Impossible de creer les cours")
-            sys.exit(1)
-        
-        # Importer les exercices
-        print("\nImport des exercices dans Supabase...")
-        import_exercises_to_supabase(exercises, chapter_to_course_id, url, key)
-        
-        # Verifier l'import
-        print("\nVerification de l'import...")
-        verify_import_in_supabase(url, key)
+    with SupabaseClient(url, key, pool_size=args.concurrency) as client:
+        if args.verify_only:
+            # Seulement verifier
+            verify_import_in_supabase(client)
+        else:
+            # Charger les exercices
+            exercises = load_exercises(args.file)
+            if not exercises:
+                print("Aucun exercice a importer")
+                sys.exit(1)
+            
+            # Creer les cours
+            print("Creation des cours dans Supabase...")
+            chapter_to_course_id = create_courses_in_supabase(client)
+            if not chapter_to_course_id:
+                print("Erreur: Impossible de creer les cours")
+                sys.exit(1)
+            
+            # Importer les exercices
+            print("\nImport des exercices dans Supabase...")
+            import_exercises_to_supabase(exercises, chapter_to_course_id, client, args.concurrency,
+                                           args.batch_size, args.target_latency)
+            
+            # Verifier l'import
+            print("\nVerification de l'import...")
+            verify_import_in_supabase(client)
     
     print(f"\nImport termine avec succes!")
 
@@ -9,11 +9,13 @@ import json
 import requests
 from typing import List, Dict, Any
 
+from async_api_import import DEFAULT_CONCURRENCY, format_rate, post_concurrently, print_errors
+from corpus import read_exercise_file
+
 def load_exercises(file_path: str) -> List[Dict[str, Any]]:
     """Charger les exercices depuis le fichier JSON"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
+        exercises = read_exercise_file(file_path)
         
         if not isinstance(exercises, list):
             exercises = [exercises]
@@ -96,55 +98,45 @@ def create_courses_via_api(base_url: str = "http://localhost:3000") -> Dict[int,
 
 def import_exercises_via_api(exercises: List[Dict[str, Any]], 
                            chapter_to_course_id: Dict[int, int],
-                           base_url: str = "http://localhost:3000"):
-    """Importer les exercices via l'API"""
-    total_imported = 0
+                           base_url: str = "http://localhost:3000",
+                           concurrency: int = DEFAULT_CONCURRENCY):
+    """Importer les exercices via l'API (plusieurs requetes en vol, connexions reutilisees)"""
     total_errors = 0
+    payloads = []
     
     try:
-        print(f"Import de {len(exercises)} exercices via l'API...")
+        print(f"Import de {len(exercises)} exercices via l'API ({concurrency} requetes simultanees)...")
         
         for i, exercise in enumerate(exercises, 1):
-            try:
-                chapter_num = exercise.get('chapter_number', 1)
-                course_id = chapter_to_course_id.get(chapter_num)
-                
-                if not course_id:
-                    print(f"Pas de cours trouve pour le chapitre {chapter_num}")
-                    total_errors += 1
-                    continue
-                
-                # Preparer les donnees de l'exercice
-                exercise_data = {
-                    "courseId": course_id,
-                    "type": exercise.get('type', 'libre'),
-                    "body": exercise.get('body', '')[:1000],  # Limiter la longueur
-                    "answer": exercise.get('answer', ''),
-                    "explanation": exercise.get('explanation', ''),
-                    "difficulty": exercise.get('difficulty', 'moyen'),
-                    "tags": json.dumps(exercise.get('tags', [])),
-                    "options": json.dumps(exercise.get('options')) if exercise.get('options') else None
-                }
-                
-                response = requests.post(f"{base_url}/api/exercises", json=exercise_data)
-                
-                if response.status_code == 201:
-                    total_imported += 1
-                    if total_imported % 50 == 0:
-                        print(f"Importe {total_imported} exercices...")
-                else:
-                    total_errors += 1
-                    if total_errors <= 5:
-                        print(f"Erreur exercice {i}: HTTP {response.status_code}")
-                
-            except Exception as e:
+            chapter_num = exercise.get('chapter_number', 1)
+            course_id = chapter_to_course_id.get(chapter_num)
+            
+            if not course_id:
+                print(f"Pas de cours trouve pour le chapitre {chapter_num}")
                 total_errors += 1
-                if total_errors <= 5:
-                    print(f"Erreur exercice {i}: {e}")
+                continue
+            
+            # Preparer les donnees de l'exercice
+            payloads.append({
+                "courseId": course_id,
+                "type": exercise.get('type', 'libre'),
+                "body": exercise.get('body', '')[:1000],  # Limiter la longueur
+                "answer": exercise.get('answer', ''),
+                "explanation": exercise.get('explanation', ''),
+                "difficulty": exercise.get('difficulty', 'moyen'),
+                "tags": json.dumps(exercise.get('tags', [])),
+                "options": json.dumps(exercise.get('options')) if exercise.get('options') else None
+            })
+        
+        report = post_concurrently(f"{base_url}/api/exercises", payloads, concurrency)
+        total_imported = report['imported']
+        total_errors += report['errors']
+        print_errors(report)
         
         print(f"\nImport termine:")
         print(f"  - Exercices importes: {total_imported}")
         print(f"  - Erreurs: {total_errors}")
+        print(f"  - Debit: {format_rate(report)}")
         if total_imported + total_errors > 0:
             print(f"  - Taux de succes: {(total_imported/(total_imported+total_errors)*100):.1f}%")
         
@@ -162,7 +154,7 @@ def verify_import_via_api(base_url: str = "http://localhost:3000"):
             if data.get('success'):
                 exercises = data.get('data', {}).get('exercises', [])
                 total_exercises = len(exercises)
-                print(f"Total d'exercices dans la base: {total_exercices}")
+                print(f"Total d'exercices dans la base: {total_exercises}")
                 
                 # Statistiques par type
                 type_stats = {}
@@ -201,6 +193,8 @@ def main():
                        help='Fichier JSON contenant les exercices')
     parser.add_argument('--url', default='http://localhost:3000', 
                        help='URL de l\'API')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help='Nombre de requetes simultanees vers l\'API')
     parser.add_argument('--verify-only', action='store_true', 
                        help='Seulement verifier les donnees existantes')
     
@@ -229,7 +223,7 @@ def main():
         
         # Importer les exercices
         print("\nImport des exercices via l'API...")
-        import_exercises_via_api(exercises, chapter_to_course_id, args.url)
+        import_exercises_via_api(exercises, chapter_to_course_id, args.url, args.concurrency)
         
         # Verifier l'import
         print("\nVerification de l'import...")
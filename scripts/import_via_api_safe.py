@@ -6,11 +6,12 @@ Import sécurisé des exercices via l'API Supabase
 
 import os
 import sys
-import json
-import requests
 from typing import List, Dict, Any
 from datetime import datetime
 
+from corpus import CORPUS_FILES, as_exercise_list, read_exercise_file
+from rest_client import DEFAULT_CONCURRENCY, AdaptiveBatcher, SupabaseClient
+
 def get_supabase_config():
     """Récupérer la configuration Supabase depuis .env"""
     try:
@@ -33,50 +34,21 @@ def get_supabase_config():
 
 def load_exercises_from_json() -> List[Dict[str, Any]]:
     """Charger tous les exercices depuis les fichiers JSON"""
-    exercise_files = [
-        'exercices_6eme.json',
-        'exercices_chapitre_1.json',
-        'exercices_chapitre_2.json',
-        'exercices_chapitre_3.json',
-        'exercices_chapitre_4.json',
-        'exercices_chapitre_5.json',
-        'exercices_chapitre_6.json',
-        'exercices_chapitre_7.json',
-        'exercices_chapitre_8.json',
-        'exercices_chapitre_9.json'
-    ]
-    
     all_exercises = []
-    file_to_chapter = {
-        'exercices_6eme.json': 1,
-        'exercices_chapitre_1.json': 1,
-        'exercices_chapitre_2.json': 2,
-        'exercices_chapitre_3.json': 3,
-        'exercices_chapitre_4.json': 4,
-        'exercices_chapitre_5.json': 5,
-        'exercices_chapitre_6.json': 6,
-        'exercices_chapitre_7.json': 7,
-        'exercices_chapitre_8.json': 8,
-        'exercices_chapitre_9.json': 9
-    }
     
-    for filename in exercise_files:
+    for filename, chapter_num in CORPUS_FILES:
         if os.path.exists(filename):
             try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    exercises = json.load(f)
-                    if not isinstance(exercises, list):
-                        exercises = [exercises]
-                    
-                    # Ajouter le numéro de chapitre
-                    chapter_num = file_to_chapter.get(filename, 1)
-                    for exercise in exercises:
-                        exercise['_chapter_number'] = chapter_num
-                        exercise['_source_file'] = filename
-                    
-                    all_exercises.extend(exercises)
-                    print(f"[OK] {filename}: {len(exercises)} exercices (chapitre {chapter_num})")
-                    
+                exercises = as_exercise_list(read_exercise_file(filename))
+                
+                # Ajouter le numéro de chapitre
+                for exercise in exercises:
+                    exercise['_chapter_number'] = chapter_num
+                    exercise['_source_file'] = filename
+                
+                all_exercises.extend(exercises)
+                print(f"[OK] {filename}: {len(exercises)} exercices (chapitre {chapter_num})")
+                
             except Exception as e:
                 print(f"[ERROR] Erreur {filename}: {e}")
         else:
@@ -85,14 +57,8 @@ def load_exercises_from_json() -> List[Dict[str, Any]]:
     print(f"\n[STATS] Total: {len(all_exercises)} exercices")
     return all_exercises
 
-def create_courses_via_api(url: str, key: str) -> Dict[int, str]:
+def create_courses_via_api(client: SupabaseClient) -> Dict[int, str]:
     """Créer les cours via l'API Supabase"""
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
-    
     courses = [
         (1, "Nombres entiers", "Arithmétique"),
         (2, "Nombres décimaux", "Arithmétique"),
@@ -107,144 +73,112 @@ def create_courses_via_api(url: str, key: str) -> Dict[int, str]:
     
     chapter_to_course_id = {}
     
-    for chapter_num, title, topic in courses:
-        # Vérifier si le cours existe déjà
-        response = requests.get(
-            f"{url}/rest/v1/courses",
-            headers=headers,
-            params={"title": f"eq.{title}", "grade": "eq.6ème"}
-        )
-        
-        if response.status_code == 200:
-            existing_courses = response.json()
-            if existing_courses:
-                course_id = existing_courses[0]['id']
-                print(f"[OK] Cours existant: {title} (ID: {course_id})")
-            else:
-                # Créer le nouveau cours
-                course_data = {
-                    "title": title,
-                    "description": f"Chapitre {chapter_num} du manuel de mathématiques 6ème",
-                    "content": f"Contenu du chapitre {chapter_num}: {title}",
-                    "grade": "6ème",
-                    "topic": topic,
-                    "difficulty": "moyen",
-                    "order_num": chapter_num,
-                    "is_published": True
-                }
-                
-                response = requests.post(
-                    f"{url}/rest/v1/courses",
-                    headers=headers,
-                    json=course_data
-                )
-                
-                if response.status_code == 201:
-                    course_id = response.json()['id']
-                    print(f"[OK] Nouveau cours créé: {title} (ID: {course_id})")
-                else:
-                    print(f"[ERROR] Erreur création cours {title}: {response.status_code} - {response.text}")
-                    continue
-        else:
-            print(f"[ERROR] Erreur vérification cours {title}: {response.status_code}")
+    course_data = [
+        {
+            "title": title,
+            "description": f"Chapitre {chapter_num} du manuel de mathématiques 6ème",
+            "content": f"Contenu du chapitre {chapter_num}: {title}",
+            "grade": "6ème",
+            "topic": topic,
+            "difficulty": "moyen",
+            "order_num": chapter_num,
+            "is_published": True
+        }
+        for chapter_num, title, topic in courses
+    ]
+    
+    # Tous les cours en une requête (upsert sur titre et niveau)
+    try:
+        stored = client.upsert("courses", course_data, ("title", "grade"))
+    except Exception as e:
+        print(f"[ERROR] Erreur création des cours: {e}")
+        return chapter_to_course_id
+    
+    for (chapter_num, title, _), row in zip(courses, stored):
+        if not row:
+            print(f"[ERROR] Cours absent de la réponse: {title}")
             continue
-        
-        chapter_to_course_id[chapter_num] = course_id
+        print(f"[OK] Cours prêt: {title} (ID: {row['id']})")
+        chapter_to_course_id[chapter_num] = row['id']
     
     return chapter_to_course_id
 
 def import_exercises_via_api(exercises: List[Dict[str, Any]], 
                            chapter_to_course_id: Dict[int, str],
-                           url: str, key: str):
-    """Importer les exercices via l'API Supabase"""
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}',
-        'Content-Type': 'application/json'
-    }
-    
+                           client: SupabaseClient,
+                           concurrency: int = DEFAULT_CONCURRENCY,
+                           batch_size: int = 50,
+                           target_latency: float = 1.0):
+    """Importer les exercices via l'API Supabase (plusieurs batchs envoyés en parallèle)"""
     total_imported = 0
     total_errors = 0
+    rows = []
     
-    # Importer par batch de 50 pour éviter les timeouts
-    batch_size = 50
-    
-    for i in range(0, len(exercises), batch_size):
-        batch = exercises[i:i + batch_size]
-        batch_data = []
-        
-        for exercise in batch:
-            try:
-                chapter_num = exercise.get('_chapter_number', 1)
-                course_id = chapter_to_course_id.get(chapter_num)
-                
-                if not course_id:
-                    print(f"[WARNING] Pas de cours trouvé pour le chapitre {chapter_num}")
-                    total_errors += 1
-                    continue
-                
-                # Préparer les données de l'exercice
-                exercise_data = {
-                    "course_id": course_id,
-                    "title": f"Exercice {exercise.get('exercise_number', 'N/A')} - {exercise.get('chapter_title', '')}",
-                    "description": f"Exercice du chapitre {chapter_num}",
-                    "question": exercise.get('body', '')[:2000],  # Limiter la longueur
-                    "answer": exercise.get('answer', ''),
-                    "explanation": exercise.get('explanation', ''),
-                    "difficulty": exercise.get('difficulty', 'moyen'),
-                    "points": 10 if exercise.get('difficulty') == 'facile' else 15 if exercise.get('difficulty') == 'moyen' else 20,
-                    "time_limit": 300,
-                    "type": exercise.get('type', 'libre'),
-                    "hints": exercise.get('hints', []),
-                    "options": exercise.get('options'),
-                    "ai_generated": False,
-                    "order_num": exercise.get('exercise_number', 1),
-                    "is_published": True
-                }
-                
-                batch_data.append(exercise_data)
-                
-            except Exception as e:
+    for exercise in exercises:
+        try:
+            chapter_num = exercise.get('_chapter_number', 1)
+            course_id = chapter_to_course_id.get(chapter_num)
+            
+            if not course_id:
+                print(f"[WARNING] Pas de cours trouvé pour le chapitre {chapter_num}")
                 total_errors += 1
-                if total_errors <= 5:
-                    print(f"[ERROR] Erreur préparation exercice: {e}")
-        
-        if batch_data:
-            # Envoyer le batch
-            response = requests.post(
-                f"{url}/rest/v1/exercises",
-                headers=headers,
-                json=batch_data
-            )
+                continue
             
-            if response.status_code == 201:
-                imported_count = len(batch_data)
-                total_imported += imported_count
-                print(f"[OK] Batch importé: {imported_count} exercices (Total: {total_imported})")
-            else:
-                total_errors += len(batch_data)
-                print(f"[ERROR] Erreur batch: {response.status_code} - {response.text}")
+            # Préparer les données de l'exercice
+            exercise_data = {
+                "course_id": course_id,
+                "title": f"Exercice {exercise.get('exercise_number', 'N/A')} - {exercise.get('chapter_title', '')}",
+                "description": f"Exercice du chapitre {chapter_num}",
+                "question": exercise.get('body', '')[:2000],  # Limiter la longueur
+                "answer": exercise.get('answer', ''),
+                "explanation": exercise.get('explanation', ''),
+                "difficulty": exercise.get('difficulty', 'moyen'),
+                "points": 10 if exercise.get('difficulty') == 'facile' else 15 if exercise.get('difficulty') == 'moyen' else 20,
+                "time_limit": 300,
+                "type": exercise.get('type', 'libre'),
+                "hints": exercise.get('hints', []),
+                "options": exercise.get('options'),
+                "ai_generated": False,
+                "order_num": exercise.get('exercise_number', 1),
+                "is_published": True
+            }
+            
+            rows.append(exercise_data)
+            
+        except Exception as e:
+            total_errors += 1
+            if total_errors <= 5:
+                print(f"[ERROR] Erreur préparation exercice: {e}")
+    
+    # Taille des batchs ajustée à la latence, reprises et isolement des lignes refusées
+    def on_batch(size, total, next_size):
+        print(f"[OK] Batch importé: {size} exercices (Total: {total}, prochain batch: {next_size})")
+    
+    batcher = AdaptiveBatcher(client, "exercises", initial_size=batch_size, target_latency=target_latency,
+                              concurrency=concurrency, on_batch=on_batch)
+    report = batcher.run(rows)
+    total_imported += report['imported']
+    total_errors += report['lost']
+    
+    for index, status, text in report['errors'][:5]:
+        print(f"[ERROR] Exercice {index + 1} refusé: {status} - {text}")
+    if report['aborted']:
+        print(f"[ERROR] Import arrêté (status {report['aborted']}): vérifiez l'URL, la clé et les droits")
     
     print(f"\n[RESULTAT] Import terminé:")
     print(f"  - Exercices importés: {total_imported}")
+    print(f"  - Exercices perdus: {report['lost']}")
     print(f"  - Erreurs: {total_errors}")
+    print(f"  - Débit: {report['rows_per_second']:.0f} exercices/s ({report['requests']} requêtes, "
+          f"{report['retries']} reprises, {report['bisections']} batchs coupés en deux)")
     if total_imported + total_errors > 0:
         print(f"  - Taux de succès: {(total_imported/(total_imported+total_errors)*100):.1f}%")
 
-def verify_import_via_api(url: str, key: str):
+def verify_import_via_api(client: SupabaseClient):
     """Vérifier l'import via l'API"""
-    headers = {
-        'apikey': key,
-        'Authorization': f'Bearer {key}'
-    }
-    
     try:
         # Compter le nombre total d'exercices
-        response = requests.get(
-            f"{url}/rest/v1/exercises",
-            headers=headers,
-            params={"select": "count"}
-        )
+        response = client.get("exercises", params={"select": "count"})
         
         if response.status_code == 200:
             # Supabase retourne le count dans les headers
@@ -257,11 +191,7 @@ def verify_import_via_api(url: str, key: str):
                 print(f"[VERIFICATION] Total d'exercices dans Supabase: {len(exercises)}")
         
         # Statistiques par cours
-        response = requests.get(
-            f"{url}/rest/v1/courses",
-            headers=headers,
-            params={"select": "id,title,grade"}
-        )
+        response = client.get("courses", params={"select": "id,title,grade"})
         
         if response.status_code == 200:
             courses = response.json()
@@ -274,6 +204,18 @@ def verify_import_via_api(url: str, key: str):
 
 def main():
     """Fonction principale"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Import sécurisé des exercices via l\'API Supabase')
+    parser.add_argument('--batch-size', type=int, default=50,
+                       help='Taille initiale des batchs (ajustée ensuite à la latence)')
+    parser.add_argument('--target-latency', type=float, default=1.0,
+                       help='Latence visée par batch, en secondes')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help='Nombre de batchs envoyés simultanément')
+    
+    args = parser.parse_args()
+    
     print('=' * 60)
     print('IMPORT SÉCURISÉ VIA API - MATHIA')
     print('=' * 60)
@@ -292,20 +234,22 @@ def main():
         print("[ERROR] Aucun exercice à importer")
         sys.exit(1)
     
-    # Créer les cours
-    print("\n[ETAPE 1] Création des cours dans Supabase...")
-    chapter_to_course_id = create_courses_via_api(url, key)
-    if not chapter_to_course_id:
-        print("[ERROR] Impossible de créer les cours")
-        sys.exit(1)
-    
-    # Importer les exercices
-    print(f"\n[ETAPE 2] Import de {len(exercises)} exercices dans Supabase...")
-    import_exercises_via_api(exercises, chapter_to_course_id, url, key)
-    
-    # Vérifier l'import
-    print("\n[ETAPE 3] Vérification de l'import...")
-    verify_import_via_api(url, key)
+    with SupabaseClient(url, key, pool_size=args.concurrency) as client:
+        # Créer les cours
+        print("\n[ETAPE 1] Création des cours dans Supabase...")
+        chapter_to_course_id = create_courses_via_api(client)
+        if not chapter_to_course_id:
+            print("[ERROR] Impossible de créer les cours")
+            sys.exit(1)
+        
+        # Importer les exercices
+        print(f"\n[ETAPE 2] Import de {len(exercises)} exercices dans Supabase...")
+        import_exercises_via_api(exercises, chapter_to_course_id, client, args.concurrency,
+                                 args.batch_size, args.target_latency)
+        
+        # Vérifier l'import
+        print("\n[ETAPE 3] Vérification de l'import...")
+        verify_import_via_api(client)
     
     print(f"\n[SUCCESS] Import terminé avec succès!")
 
@@ -6,18 +6,63 @@ Transforme rapidement les fichiers JSON en instructions SQL
 
 import os
 import json
-import sys
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime
 
+from corpus import CORPUS_FILES, as_exercise_list, read_exercise_file
+from sql_writer import (MULTI_ROW_SIZE, OUTPUT_FORMATS, iter_copy_loader, iter_copy_rows,
+                        iter_multirow_inserts, write_sql)
+
 def escape_sql(text: str) -> str:
     """Échapper le texte pour SQL"""
     if not text:
         return "NULL"
     return f"'{text.replace(chr(39), chr(39)+chr(39))}'"
 
-def convert_json_to_sql_inserts(json_file: str, output_file: str = None) -> str:
-    """Convertir un fichier JSON en instructions SQL INSERT"""
+def exercise_row(exercise: Dict[str, Any], chapter_num: int, order_num: int) -> Tuple[Any, ...]:
+    """Valeurs d'un exercice pour les formats multirow et copy (ordre de EXERCISE_COLUMNS)"""
+    title = f"Exercice {exercise.get('exercise_number', order_num)}"
+    if exercise.get('chapter_title'):
+        title += f" - {exercise['chapter_title']}"
+    
+    difficulty = exercise.get('difficulty', 'moyen')
+    
+    options = exercise.get('options')
+    options_json = None
+    if options and isinstance(options, dict):
+        options_json = json.dumps(options, ensure_ascii=False)
+    
+    hints = exercise.get('hints', [])
+    if not isinstance(hints, list):
+        hints = []
+    
+    return (
+        title,
+        f"Exercice du chapitre {chapter_num}",
+        exercise.get('body', '') or None,
+        exercise.get('answer', '') or None,
+        exercise.get('explanation', '') or None,
+        difficulty,
+        10 if difficulty == 'facile' else 15 if difficulty == 'moyen' else 20,
+        300,
+        exercise.get('type', 'libre'),
+        json.dumps(hints, ensure_ascii=False),
+        options_json,
+        False,
+        order_num,
+        True,
+    )
+
+def convert_json_to_sql_inserts(json_file: str, output_file: str = None,
+                                output_format: str = 'insert',
+                                batch_size: int = MULTI_ROW_SIZE) -> str:
+    """
+    Convertir un fichier JSON en instructions SQL INSERT
+    
+    output_format: 'insert' (un INSERT par exercice), 'multirow' (INSERT de
+    batch_size lignes) ou 'copy' (écrit exercices.copy à côté du JSON et
+    retourne le script psql qui le charge).
+    """
     
     if not os.path.exists(json_file):
         print(f"[ERROR] Fichier non trouve: {json_file}")
@@ -25,10 +70,7 @@ def convert_json_to_sql_inserts(json_file: str, output_file: str = None) -> str:
     
     # Charger le JSON
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            exercises = json.load(f)
-            if not isinstance(exercises, list):
-                exercises = [exercises]
+        exercises = as_exercise_list(read_exercise_file(json_file))
     except Exception as e:
         print(f"[ERROR] Erreur lecture {json_file}: {e}")
         return ""
@@ -52,34 +94,42 @@ def convert_json_to_sql_inserts(json_file: str, output_file: str = None) -> str:
 
 """
     
-    for i, exercise in enumerate(exercises, 1):
-        # Données de base
-        title = f"Exercice {exercise.get('exercise_number', i)}"
-        if exercise.get('chapter_title'):
-            title += f" - {exercise['chapter_title']}"
+    rows = (exercise_row(exercise, chapter_num, i) for i, exercise in enumerate(exercises, 1))
+    if output_format == 'multirow':
+        sql += "".join(iter_multirow_inserts(chapter_num, rows, batch_size))
+    elif output_format == 'copy':
+        copy_file = os.path.splitext(json_file)[0] + '.copy'
+        write_sql(copy_file, iter_copy_rows(chapter_num, rows))
+        sql += "".join(iter_copy_loader(copy_file))
+    else:
+        for i, exercise in enumerate(exercises, 1):
+            # Données de base
+            title = f"Exercice {exercise.get('exercise_number', i)}"
+            if exercise.get('chapter_title'):
+                title += f" - {exercise['chapter_title']}"
         
-        question = exercise.get('body', '')
-        answer = exercise.get('answer', '')
-        explanation = exercise.get('explanation', '')
-        difficulty = exercise.get('difficulty', 'moyen')
-        exercise_type = exercise.get('type', 'libre')
+            question = exercise.get('body', '')
+            answer = exercise.get('answer', '')
+            explanation = exercise.get('explanation', '')
+            difficulty = exercise.get('difficulty', 'moyen')
+            exercise_type = exercise.get('type', 'libre')
         
-        # Options pour QCM
-        options = exercise.get('options')
-        options_sql = "NULL"
-        if options and isinstance(options, dict):
-            options_sql = f"'{json.dumps(options, ensure_ascii=False)}'"
+            # Options pour QCM
+            options = exercise.get('options')
+            options_sql = "NULL"
+            if options and isinstance(options, dict):
+                options_sql = f"'{json.dumps(options, ensure_ascii=False)}'"
         
-        # Indices
-        hints = exercise.get('hints', [])
-        if not isinstance(hints, list):
-            hints = []
-        hints_sql = f"'{json.dumps(hints, ensure_ascii=False)}'"
+            # Indices
+            hints = exercise.get('hints', [])
+            if not isinstance(hints, list):
+                hints = []
+            hints_sql = f"'{json.dumps(hints, ensure_ascii=False)}'"
         
-        # Points selon la difficulté
-        points = 10 if difficulty == 'facile' else 15 if difficulty == 'moyen' else 20
+            # Points selon la difficulté
+            points = 10 if difficulty == 'facile' else 15 if difficulty == 'moyen' else 20
         
-        sql += f"""INSERT INTO public.exercises (
+            sql += f"""INSERT INTO public.exercises (
     id,
     course_id,
     title,
@@ -128,21 +178,10 @@ def convert_json_to_sql_inserts(json_file: str, output_file: str = None) -> str:
     
     return sql
 
-def convert_all_json_files():
+def convert_all_json_files(output_format: str = 'insert', batch_size: int = MULTI_ROW_SIZE):
     """Convertir tous les fichiers JSON en SQL"""
     
-    json_files = [
-        'exercices_6eme.json',
-        'exercices_chapitre_1.json',
-        'exercices_chapitre_2.json',
-        'exercices_chapitre_3.json',
-        'exercices_chapitre_4.json',
-        'exercices_chapitre_5.json',
-        'exercices_chapitre_6.json',
-        'exercices_chapitre_7.json',
-        'exercices_chapitre_8.json',
-        'exercices_chapitre_9.json'
-    ]
+    json_files = [filename for filename, _ in CORPUS_FILES]
     
     all_sql = f"""-- ============================================
 -- BIBLIOTHÈQUE SQL COMPLÈTE - MATHIA
@@ -158,16 +197,13 @@ def convert_all_json_files():
     for json_file in json_files:
         if os.path.exists(json_file):
             print(f"[CONVERT] Conversion de {json_file}...")
-            sql = convert_json_to_sql_inserts(json_file)
+            sql = convert_json_to_sql_inserts(json_file, output_format=output_format, batch_size=batch_size)
             if sql:
                 all_sql += sql + "\n"
-                # Compter les exercices
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    exercises = json.load(f)
-                    if not isinstance(exercises, list):
-                        exercises = [exercises]
-                    total_exercises += len(exercises)
-                    print(f"   [OK] {len(exercises)} exercices convertis")
+                # Compter les exercices (relus depuis le cache du corpus)
+                exercises = as_exercise_list(read_exercise_file(json_file))
+                total_exercises += len(exercises)
+                print(f"   [OK] {len(exercises)} exercices convertis")
         else:
             print(f"[WARNING] Fichier non trouve: {json_file}")
     
@@ -218,24 +254,40 @@ ORDER BY difficulty;
 
 def main():
     """Fonction principale"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Convertir les fichiers JSON en SQL')
+    parser.add_argument('json_file', nargs='?',
+                       help='Fichier JSON a convertir (par defaut: tous les fichiers)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='insert',
+                       help='insert: un INSERT par exercice, multirow: INSERT multi-lignes, '
+                            'copy: fichiers .copy charges par \\copy (psql)')
+    parser.add_argument('--batch-size', type=int, default=MULTI_ROW_SIZE,
+                       help='Lignes par INSERT en format multirow')
+    
+    args = parser.parse_args()
+    
     print('=' * 50)
     print('CONVERTISSEUR JSON -> SQL - MATHIA')
     print('=' * 50)
     print()
     
-    if len(sys.argv) > 1:
+    if args.json_file:
         # Conversion d'un fichier spécifique
-        json_file = sys.argv[1]
+        json_file = args.json_file
         output_file = json_file.replace('.json', '.sql')
-        convert_json_to_sql_inserts(json_file, output_file)
+        convert_json_to_sql_inserts(json_file, output_file, args.format, args.batch_size)
     else:
         # Conversion de tous les fichiers
-        convert_all_json_files()
+        convert_all_json_files(args.format, args.batch_size)
     
     print("\n[INFO] Utilisation:")
     print("1. Executez le schema Supabase: supabase/schema.sql")
-    print("2. Copiez-collez le SQL genere dans le SQL Editor")
-    print("3. Executez le script")
+    if args.format == 'copy':
+        print("2. Depuis le dossier des fichiers .copy: psql \"$DATABASE_URL\" -f <fichier.sql>")
+    else:
+        print("2. Copiez-collez le SQL genere dans le SQL Editor")
+        print("3. Executez le script")
 
 if __name__ == '__main__':
     main()
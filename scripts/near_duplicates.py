@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Détection des exercices quasi identiques (MinHash + LSH)
+
+Les correspondances chevauchantes des extracteurs PDF produisent des copies
+qui ne diffèrent que de quelques caractères: l'ancienne signature
+body[:100] + answer[:50] ne les reconnaissait pas.
+
+Chaque exercice est réduit à l'ensemble de ses n-grammes de mots (texte
+normalisé: accents, ligatures, casse, ponctuation). Une signature MinHash en
+estime la similarité de Jaccard, et l'index LSH (bandes de la signature) ne
+propose que les exercices susceptibles de dépasser le seuil; la similarité
+de ces candidats est ensuite calculée exactement. Le coût attendu est
+linéaire en nombre d'exercices.
+
+La signature utilise une seule fonction de hachage répartie en num_perm
+cases (« one permutation hashing »), les cases vides étant complétées par
+rotation: un hachage par n-gramme au lieu de num_perm.
+
+Le premier exercice d'un groupe, dans l'ordre du corpus, est conservé.
+
+Usage:
+    python scripts/near_duplicates.py                  # groupes du corpus
+    python scripts/near_duplicates.py --threshold 0.7 --report doublons.json
+    python scripts/near_duplicates.py --benchmark
+"""
+
+import re
+import sys
+import json
+import time
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from corpus import iter_corpus
+from text_normalizer import normalize_text
+
+# Similarité de Jaccard à partir de laquelle deux exercices sont des doublons
+DEFAULT_THRESHOLD = 0.8
+
+# Taille de la signature MinHash et des n-grammes de mots
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 3
+
+# Valeur des cases vides (les valeurs des cases remplies lui sont inférieures)
+_EMPTY = 1 << 64
+
+_WORD = re.compile(r'\w+')
+
+
+def shingles(text: str, size: int = DEFAULT_SHINGLE_SIZE) -> FrozenSet[int]:
+    """
+    Empreintes (64 bits) des n-grammes de `size` mots du texte normalisé.
+
+    Un texte de moins de `size` mots donne un seul n-gramme: le texte entier.
+    """
+    words = _WORD.findall(normalize_text(text or '', nfkd=True).lower())
+    grams = {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return frozenset(
+        int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'big')
+        for gram in grams
+    )
+
+
+def minhash_signature(hashes: Iterable[int], num_perm: int = DEFAULT_NUM_PERM) -> Tuple[int, ...]:
+    """
+    Signature MinHash: minimum de chaque case, les cases vides empruntant la
+    valeur de la première case remplie à leur droite (décalée de la distance,
+    pour que deux cases empruntées à la même valeur restent distinctes).
+    """
+    bins = [_EMPTY] * num_perm
+    for value in hashes:
+        index, rank = value % num_perm, value // num_perm
+        if rank < bins[index]:
+            bins[index] = rank
+
+    if _EMPTY in bins:
+        signature = list(bins)
+        last, distance = None, 0
+        # Deux tours de droite à gauche: le premier fixe la case de départ de la rotation
+        for step in range(2 * num_perm - 1, -1, -1):
+            index = step % num_perm
+            if bins[index] != _EMPTY:
+                last, distance = bins[index], 0
+            elif last is not None:
+                distance += 1
+                signature[index] = last + distance * _EMPTY
+        bins = signature
+    return tuple(bins)
+
+
+def jaccard(first: FrozenSet[int], second: FrozenSet[int]) -> float:
+    """Similarité de Jaccard exacte de deux ensembles de n-grammes"""
+    if not first and not second:
+        return 1.0
+    intersection = len(first & second)
+    return intersection / (len(first) + len(second) - intersection)
+
+
+def _candidate_probability(similarity: float, bands: int, rows: int) -> float:
+    """Probabilité que deux signatures de cette similarité partagent une bande"""
+    return 1.0 - (1.0 - similarity ** rows) ** bands
+
+
+@lru_cache(maxsize=None)
+def lsh_params(threshold: float, num_perm: int = DEFAULT_NUM_PERM,
+               false_negative_weight: float = 0.7) -> Tuple[int, int]:
+    """
+    (bandes, lignes par bande) minimisant les erreurs pondérées de l'index.
+
+    Les candidats étant vérifiés exactement, un faux positif ne coûte qu'un
+    calcul de Jaccard: les faux négatifs (doublons manqués) pèsent davantage.
+    """
+    steps = 100
+    best, best_error = (1, num_perm), float('inf')
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_positive = false_negative = 0.0
+            for step in range(steps):
+                similarity = (step + 0.5) / steps
+                probability = _candidate_probability(similarity, bands, rows)
+                if similarity < threshold:
+                    false_positive += probability / steps
+                else:
+                    false_negative += (1.0 - probability) / steps
+            error = (1.0 - false_negative_weight) * false_positive + false_negative_weight * false_negative
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Index LSH des textes conservés.
+
+    add() retourne la clé du texte conservé dont `text` est un doublon, ou
+    None: le texte est alors conservé et indexé. Seuls les textes conservés
+    sont indexés, ce qui garde les paniers de l'index petits même quand un
+    exercice est répété de nombreuses fois.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+
+        self._buckets: List[Dict[Tuple[int, ...], List[Any]]] = [{} for _ in range(self.bands)]
+        self._shingles: Dict[Any, FrozenSet[int]] = {}
+        self._order: Dict[Any, int] = {}
+        # Nombre de similarités calculées exactement (candidats proposés par l'index)
+        self.comparisons = 0
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _bands(self, signature: Tuple[int, ...]) -> List[Tuple[int, ...]]:
+        rows = self.rows
+        return [signature[band * rows:(band + 1) * rows] for band in range(self.bands)]
+
+    def add(self, key: Any, text: str) -> Optional[Tuple[Any, float]]:
+        """(clé du texte conservé, similarité) si `text` en est un doublon, sinon None"""
+        text_shingles = shingles(text, self.shingle_size)
+        bands = self._bands(minhash_signature(text_shingles, self.num_perm))
+
+        candidates = set()
+        for buckets, band in zip(self._buckets, bands):
+            candidates.update(buckets.get(band, ()))
+
+        # Le plus ancien texte conservé au-dessus du seuil
+        for candidate in sorted(candidates, key=self._order.__getitem__):
+            self.comparisons += 1
+            similarity = jaccard(text_shingles, self._shingles[candidate])
+            if similarity >= self.threshold:
+                return candidate, similarity
+
+        self._order[key] = len(self._order)
+        self._shingles[key] = text_shingles
+        for buckets, band in zip(self._buckets, bands):
+            buckets.setdefault(band, []).append(key)
+        return None
+
+
+def exercise_text(exercise: Dict[str, Any]) -> str:
+    """Texte comparé: énoncé et réponse, comme l'ancienne signature"""
+    return f"{exercise.get('body') or ''}\n{exercise.get('answer') or ''}"
+
+
+def exercise_label(filename: str, index: int, exercise: Dict[str, Any]) -> str:
+    """Identifiant lisible d'un exercice: fichier, position et numéro"""
+    return f"{filename}#{index} (exercice {exercise.get('exercise_number', '?')})"
+
+
+def dedupe_exercises(files: Iterable[Tuple[str, List[Dict[str, Any]]]],
+                     threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                     shingle_size: int = DEFAULT_SHINGLE_SIZE
+                     ) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, Any]]:
+    """
+    Dédupliquer les exercices de (fichier, exercices), dans l'ordre.
+
+    Retourne les (fichier, exercice) conservés et le rapport: pour chaque
+    groupe, l'exercice conservé et ses doublons écartés (avec leur similarité).
+    """
+    index = NearDuplicateIndex(threshold, num_perm, shingle_size)
+    kept: List[Tuple[str, Dict[str, Any]]] = []
+    clusters: Dict[str, Dict[str, Any]] = {}
+    by_file: Dict[str, Dict[str, int]] = {}
+
+    for filename, exercises in files:
+        counts = by_file.setdefault(filename, {'total': 0, 'duplicates': 0})
+        for position, exercise in enumerate(exercises):
+            label = exercise_label(filename, position, exercise)
+            counts['total'] += 1
+            match = index.add(label, exercise_text(exercise))
+            if match is None:
+                kept.append((filename, exercise))
+                continue
+
+            kept_label, similarity = match
+            counts['duplicates'] += 1
+            cluster = clusters.setdefault(kept_label, {'kept': kept_label, 'duplicates': []})
+            cluster['duplicates'].append({'exercise': label, 'similarity': round(similarity, 3)})
+
+    report = {
+        'threshold': threshold,
+        'num_perm': num_perm,
+        'shingle_size': shingle_size,
+        'bands': index.bands,
+        'rows': index.rows,
+        'comparisons': index.comparisons,
+        'kept': len(kept),
+        'duplicates': sum(counts['duplicates'] for counts in by_file.values()),
+        'files': by_file,
+        'clusters': list(clusters.values()),
+    }
+    return kept, report
+
+
+def print_report(report: Dict[str, Any], limit: int = 20):
+    """Afficher les plus grands groupes de doublons"""
+    clusters = sorted(report['clusters'], key=lambda cluster: -len(cluster['duplicates']))
+    print(f"[STATS] {report['kept']} exercices conserves, {report['duplicates']} doublons "
+          f"dans {len(clusters)} groupes (seuil {report['threshold']}, "
+          f"{report['bands']} bandes x {report['rows']} lignes)")
+    for cluster in clusters[:limit]:
+        print(f"   conserve {cluster['kept']}: {len(cluster['duplicates'])} doublon(s)")
+        for duplicate in cluster['duplicates'][:3]:
+            print(f"      - {duplicate['exercise']} (similarite {duplicate['similarity']})")
+    if len(clusters) > limit:
+        print(f"   ... {len(clusters) - limit} autres groupes (voir --report)")
+
+
+def save_report(report: Dict[str, Any], report_file: str):
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[FILE] Rapport des doublons: {report_file}")
+
+
+def _prefix_dedupe(files: List[Tuple[str, List[Dict[str, Any]]]]) -> int:
+    """Ancienne déduplication (body[:100] + answer[:50]): nombre de conservés"""
+    seen = set()
+    for _, exercises in files:
+        for exercise in exercises:
+            seen.add(f"{exercise.get('body', '')[:100]}_{exercise.get('answer', '')[:50]}")
+    return len(seen)
+
+
+def _exact_dedupe(texts: List[FrozenSet[int]], threshold: float) -> int:
+    """Déduplication par comparaison exacte de toutes les paires: nombre de conservés"""
+    kept: List[FrozenSet[int]] = []
+    for text_shingles in texts:
+        if not any(jaccard(text_shingles, other) >= threshold for other in kept):
+            kept.append(text_shingles)
+    return len(kept)
+
+
+def run_benchmark(base_dir: str = '.', threshold: float = DEFAULT_THRESHOLD, sample: int = 1000):
+    """
+    Comparer l'ancienne signature, MinHash/LSH et, sur les `sample` premiers
+    exercices, la comparaison exacte de toutes les paires (référence, O(n²)).
+    """
+    files = [(filename, exercises) for filename, _, exercises in iter_corpus(base_dir)]
+    if not files:
+        print("Aucun fichier d'exercices trouve (lancer depuis la racine du projet)")
+        sys.exit(1)
+    total = sum(len(exercises) for _, exercises in files)
+
+    start = time.perf_counter()
+    prefix_kept = _prefix_dedupe(files)
+    prefix_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kept, report = dedupe_exercises(files, threshold)
+    minhash_time = time.perf_counter() - start
+
+    print(f"Corpus: {total} exercices, seuil {threshold}")
+    print(f"   prefixe (ancien):  {prefix_kept:6} conserves  {prefix_time * 1000:8.1f} ms")
+    print(f"   MinHash/LSH:       {len(kept):6} conserves  {minhash_time * 1000:8.1f} ms  "
+          f"({report['comparisons']} similarites calculees)")
+
+    exercises = [exercise for _, file_exercises in files for exercise in file_exercises][:sample]
+    texts = [shingles(exercise_text(exercise)) for exercise in exercises]
+    start = time.perf_counter()
+    exact_kept = _exact_dedupe(texts, threshold)
+    exact_time = time.perf_counter() - start
+    sample_kept, _ = dedupe_exercises([('echantillon', exercises)], threshold)
+    print(f"   {len(exercises)} premiers exercices: exact {exact_kept} conserves "
+          f"({exact_time * 1000:.1f} ms), MinHash/LSH {len(sample_kept)} conserves")
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Detection des exercices quasi identiques')
+    parser.add_argument('--dir', default='.',
+                       help='Dossier contenant les fichiers exercices_*.json')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help='Similarite de Jaccard minimale entre doublons (0-1)')
+    parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM,
+                       help='Taille des signatures MinHash')
+    parser.add_argument('--shingle-size', type=int, default=DEFAULT_SHINGLE_SIZE,
+                       help='Nombre de mots par n-gramme')
+    parser.add_argument('--report',
+                       help='Ecrire le rapport complet des groupes (JSON)')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer avec l\'ancienne signature et la comparaison exacte')
+    parser.add_argument('--sample', type=int, default=1000,
+                       help='Exercices compares exactement pendant le benchmark')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.dir, args.threshold, args.sample)
+        return
+
+    files = [(filename, exercises) for filename, _, exercises in iter_corpus(args.dir)]
+    _, report = dedupe_exercises(files, args.threshold, args.num_perm, args.shingle_size)
+    print_report(report)
+    if args.report:
+        save_report(report, args.report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Cache disque du texte des pages PDF pour les extracteurs Mathia
+Évite de relancer l'analyse de mise en page pdfplumber à chaque exécution
+
+Les entrées sont indexées par le SHA-256 du PDF, le numéro de page et une
+variante ('raw' pour le texte brut, ou le nom du nettoyage appliqué).
+La taille totale est bornée: les pages les moins récemment lues sont évincées.
+Les dates de lecture sont gardées en mémoire et écrites par lots (au plus
+tard à l'éviction ou à la fermeture), pour ne pas valider une transaction
+par page lue.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+from typing import Callable, Iterator, Optional, Tuple
+
+# Emplacement et taille maximale du cache (surchargeables par variables d'environnement)
+DEFAULT_CACHE_PATH = os.getenv('PDF_TEXT_CACHE', os.path.join('.cache', 'pdf_text_cache.sqlite3'))
+DEFAULT_MAX_BYTES = int(os.getenv('PDF_TEXT_CACHE_MAX_MB', 200)) * 1024 * 1024
+
+RAW_VARIANT = 'raw'
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calculer l'empreinte SHA-256 d'un fichier par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """Cache LRU borné en taille du texte extrait, page par page"""
+
+    # Nombre d'écritures entre deux vérifications de la taille totale
+    EVICT_EVERY = 64
+    # Nombre de pages lues dont la date d'accès attend en mémoire avant écriture
+    TOUCH_EVERY = 256
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._pending_writes = 0
+        self._touched = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # timeout: plusieurs processus d'extraction peuvent écrire en même temps
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                digest      TEXT NOT NULL,
+                page_num    INTEGER NOT NULL,
+                variant     TEXT NOT NULL,
+                text        TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (digest, page_num, variant)
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages (last_access);
+            CREATE TABLE IF NOT EXISTS documents (
+                digest     TEXT PRIMARY KEY,
+                page_count INTEGER NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+
+    def get_page(self, digest: str, page_num: int, variant: str = RAW_VARIANT) -> Optional[str]:
+        """Lire le texte d'une page, ou None si absent du cache"""
+        row = self.conn.execute(
+            "SELECT text FROM pages WHERE digest = ? AND page_num = ? AND variant = ?",
+            (digest, page_num, variant)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self._touched[(digest, page_num, variant)] = time.time()
+        if len(self._touched) >= self.TOUCH_EVERY:
+            self.flush_touches()
+        return row[0]
+
+    def flush_touches(self):
+        """Écrire en une transaction les dates d'accès des pages lues depuis le dernier lot"""
+        if not self._touched:
+            return
+        self.conn.executemany(
+            "UPDATE pages SET last_access = ? WHERE digest = ? AND page_num = ? AND variant = ?",
+            [(accessed, *key) for key, accessed in self._touched.items()]
+        )
+        self.conn.commit()
+        self._touched.clear()
+
+    def put_page(self, digest: str, page_num: int, text: str, variant: str = RAW_VARIANT):
+        """Enregistrer le texte d'une page"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (digest, page_num, variant, text, size, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, page_num, variant, text, len(text.encode('utf-8')), time.time())
+        )
+        self.conn.commit()
+
+        self._pending_writes += 1
+        if self._pending_writes >= self.EVICT_EVERY:
+            self.evict()
+
+    def get_page_count(self, digest: str) -> Optional[int]:
+        """Nombre de pages du document, s'il a déjà été ouvert"""
+        row = self.conn.execute(
+            "SELECT page_count FROM documents WHERE digest = ?", (digest,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_page_count(self, digest: str, page_count: int):
+        """Mémoriser le nombre de pages du document"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents (digest, page_count) VALUES (?, ?)",
+            (digest, page_count)
+        )
+        self.conn.commit()
+
+    def has_pages(self, digest: str, first_page: int, last_page: int, variant: str = RAW_VARIANT) -> bool:
+        """Vérifier que toutes les pages first_page..last_page sont en cache"""
+        if last_page < first_page:
+            return True
+        row = self.conn.execute(
+            "SELECT COUNT(*) FROM pages WHERE digest = ? AND variant = ? AND page_num BETWEEN ? AND ?",
+            (digest, variant, first_page, last_page)
+        ).fetchone()
+        return row[0] == last_page - first_page + 1
+
+    def total_size(self) -> int:
+        """Taille totale du texte stocké, en octets"""
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def evict(self):
+        """Supprimer les pages les moins récemment utilisées jusqu'à repasser sous max_bytes"""
+        self._pending_writes = 0
+        # L'ordre LRU doit tenir compte des lectures encore en mémoire
+        self.flush_touches()
+        excess = self.total_size() - self.max_bytes
+        if excess <= 0:
+            return
+
+        cursor = self.conn.execute("SELECT digest, page_num, variant, size FROM pages ORDER BY last_access")
+        to_delete = []
+        for digest, page_num, variant, size in cursor:
+            to_delete.append((digest, page_num, variant))
+            excess -= size
+            if excess <= 0:
+                break
+
+        self.conn.executemany(
+            "DELETE FROM pages WHERE digest = ? AND page_num = ? AND variant = ?", to_delete
+        )
+        self.conn.commit()
+
+    def close(self):
+        """Écrire les dates d'accès, appliquer l'éviction puis fermer la base"""
+        self.evict()
+        self.conn.close()
+
+
+def iter_page_texts(pdf_path: str,
+                    cleaner: Optional[Callable[[str], str]] = None,
+                    variant: str = RAW_VARIANT,
+                    cache: Optional[PageTextCache] = None,
+                    first_page: int = 1,
+                    last_page: Optional[int] = None,
+                    digest: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Produire (numéro de page, texte) pour chaque page, dans l'ordre.
+
+    Le PDF n'est ouvert avec pdfplumber qu'en cas d'absence dans le cache.
+    Le texte brut est toujours mis en cache; si un nettoyage est fourni, son
+    résultat l'est aussi sous `variant`, qui doit changer quand le nettoyage change.
+    Les pages sans texte sont produites avec une chaîne vide.
+    """
+    if cleaner is not None and variant == RAW_VARIANT:
+        raise ValueError("Un nettoyage doit etre associe a une variante autre que 'raw'")
+
+    pdf = None
+    try:
+        if cache is not None:
+            digest = digest or file_sha256(pdf_path)
+            page_count = cache.get_page_count(digest)
+        else:
+            page_count = None
+
+        if page_count is None:
+            pdf = _open_pdf(pdf_path)
+            page_count = len(pdf.pages)
+            if cache is not None:
+                cache.put_page_count(digest, page_count)
+
+        last_page = page_count if last_page is None else min(last_page, page_count)
+
+        for page_num in range(first_page, last_page + 1):
+            if cache is not None:
+                text = cache.get_page(digest, page_num, variant)
+                if text is not None:
+                    yield page_num, text
+                    continue
+                raw_text = cache.get_page(digest, page_num, RAW_VARIANT) if cleaner else None
+            else:
+                raw_text = None
+
+            if raw_text is None:
+                if pdf is None:
+                    pdf = _open_pdf(pdf_path)
+                try:
+                    raw_text = pdf.pages[page_num - 1].extract_text() or ""
+                except Exception as e:
+                    print(f"Erreur page {page_num}: {e}")
+                    continue
+                if cache is not None:
+                    cache.put_page(digest, page_num, raw_text, RAW_VARIANT)
+
+            text = cleaner(raw_text) if cleaner and raw_text else raw_text
+            if cache is not None and cleaner is not None:
+                cache.put_page(digest, page_num, text, variant)
+
+            yield page_num, text
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+
+def _open_pdf(pdf_path: str):
+    """Ouvrir le PDF (import paresseux: inutile quand tout est en cache)"""
+    try:
+        import pdfplumber
+    except ImportError:
+        print("Erreur: Le module pdfplumber n'est pas installe.")
+        print("Installez-le avec: pip install pdfplumber")
+        sys.exit(1)
+
+    return pdfplumber.open(pdf_path)
+
+
+def open_cache(enabled: bool = True, path: Optional[str] = None) -> Optional[PageTextCache]:
+    """Ouvrir le cache partagé, ou None s'il est désactivé"""
+    if not enabled:
+        return None
+    return PageTextCache(path or DEFAULT_CACHE_PATH)
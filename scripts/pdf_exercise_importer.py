@@ -17,37 +17,28 @@ from typing import List, Dict, Any, Optional
 
 try:
     import psycopg2
-    from psycopg2.extras import Json
 except ImportError:
     print("❌ Le module psycopg2 n'est pas installé.")
     print("📦 Installez-le avec: pip install psycopg2-binary")
     sys.exit(1)
 
-try:
-    import PyPDF2
-    import pdfplumber
-except ImportError:
-    print("❌ Les modules PDF ne sont pas installés.")
-    print("📦 Installez-les avec: pip install PyPDF2 pdfplumber")
-    sys.exit(1)
-
 try:
     from dotenv import load_dotenv
 except ImportError:
     print("⚠️  Le module python-dotenv n'est pas installé.")
     load_dotenv = lambda: None
 
+from page_cache import PageTextCache, iter_page_texts, open_cache
+from exercise_segmenter import segment_exercises
+from text_normalizer import normalize_text
+from chunked_import import DEFAULT_COMMIT_EVERY, ImportJournal, import_in_chunks
+from db_connection import connect
+
 # Charger les variables d'environnement
 load_dotenv()
 
-# Configuration de la base de données
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', 5432),
-    'database': os.getenv('DB_NAME', 'mathia_db'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', '')
-}
+# Variante du cache de pages pour le texte nettoyé par _clean_text
+CLEAN_VARIANT = 'ligatures-v1'
 
 
 class PDFExerciseExtractor:
@@ -56,20 +47,23 @@ class PDFExerciseExtractor:
     def __init__(self):
         self.exercises = []
     
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
+    def extract_text_from_pdf(self, pdf_path: str, cache: Optional[PageTextCache] = None) -> str:
         """Extraire le texte d'un PDF"""
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                return text
+            return "".join(
+                page_text + "\n"
+                for _, page_text in iter_page_texts(pdf_path, cleaner=self._clean_text,
+                                                    variant=CLEAN_VARIANT, cache=cache)
+                if page_text
+            )
         except Exception as e:
             print(f"❌ Erreur lors de l'extraction du PDF: {e}")
             return ""
     
+    def _clean_text(self, text: str) -> str:
+        """Recoller les ligatures coupées (les accents sont conservés)"""
+        return normalize_text(text, fold_accents=False)
+    
     def parse_exercises_from_text(self, text: str, auto_format: bool = False) -> List[Dict[str, Any]]:
         """Parser les exercices depuis le texte extrait"""
         exercises = []
@@ -85,23 +79,11 @@ class PDFExerciseExtractor:
         """Parsing automatique des exercices"""
         exercises = []
         
-        # Patterns pour détecter les exercices
-        exercise_patterns = [
-            r'Exercice\s+(\d+)[:.]?\s*(.*?)(?=Exercice\s+\d+|$)',
-            r'(\d+)[:.]\s*(.*?)(?=\d+[:.]|$)',
-            r'Question\s+(\d+)[:.]?\s*(.*?)(?=Question\s+\d+|$)'
-        ]
-        
-        for pattern in exercise_patterns:
-            matches = re.finditer(pattern, text, re.DOTALL | re.IGNORECASE)
-            for match in matches:
-                exercise_num = match.group(1)
-                content = match.group(2).strip()
-                
-                if len(content) > 20:  # Filtrer les contenus trop courts
-                    exercise = self._format_exercise(content, exercise_num)
-                    if exercise:
-                        exercises.append(exercise)
+        # Découpage en un seul passage, sans doublons (contenus trop courts filtrés)
+        for exercise_num, content in segment_exercises(text, ('Exercice', 'Question'), min_length=20):
+            exercise = self._format_exercise(content, exercise_num)
+            if exercise:
+                exercises.append(exercise)
         
         return exercises
     
@@ -212,14 +194,9 @@ class PDFExerciseExtractor:
 
 
 def get_db_connection():
-    """Créer une connexion à la base de données PostgreSQL"""
+    """Créer une connexion à la base de données PostgreSQL (DATABASE_URL ou DB_CONFIG)"""
     try:
-        database_url = os.getenv('DATABASE_URL')
-        if database_url:
-            conn = psycopg2.connect(database_url)
-        else:
-            conn = psycopg2.connect(**DB_CONFIG)
-        return conn
+        return connect()
     except Exception as e:
         print(f"❌ Erreur de connexion à la base de données: {e}")
         sys.exit(1)
@@ -240,69 +217,30 @@ def verify_course_exists(conn, course_id):
         return False
 
 
-def import_exercise(conn, exercise, course_id):
-    """Importer un exercice dans la base de données"""
-    cursor = conn.cursor()
-    
-    try:
-        # Convertir les options en JSON si c'est une liste
-        options = exercise.get('options')
-        if isinstance(options, list):
-            options = {chr(65 + i): opt for i, opt in enumerate(options)}
-        
-        # Préparer les tags
-        tags = exercise.get('tags', [])
-        if isinstance(tags, str):
-            tags = [tags]
-        
-        cursor.execute(
-            """
-            INSERT INTO exercises 
-            ("courseId", type, body, options, answer, explanation, difficulty, tags, "createdAt", "updatedAt")
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            RETURNING id
-            """,
-            (
-                course_id,
-                exercise.get('type', 'qcm'),
-                exercise.get('body', ''),
-                Json(options) if options else None,
-                exercise.get('answer', ''),
-                exercise.get('explanation', ''),
-                exercise.get('difficulty', 'moyen'),
-                Json(tags) if tags else None
-            )
-        )
-        
-        exercise_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        
-        return exercise_id
-    except Exception as e:
-        conn.rollback()
-        cursor.close()
-        raise e
-
-
-def import_all_exercises(conn, exercises, course_id):
-    """Importer tous les exercices"""
-    success_count = 0
-    error_count = 0
-    
+def import_all_exercises(conn, exercises, course_id, commit_every=DEFAULT_COMMIT_EVERY, journal=None):
+    """
+    Importer tous les exercices, validés par paquets de commit_every
+    
+    Un exercice refusé n'annule que lui-même (SAVEPOINT par ligne). Avec un
+    journal (ImportJournal), un import interrompu reprend après le dernier
+    paquet validé.
+    """
     print("📥 Import des exercices en cours...\n")
     
-    for i, exercise in enumerate(exercises, 1):
-        try:
-            exercise_id = import_exercise(conn, exercise, course_id)
+    def on_row(i, exercise, exercise_id, error):
+        if error is None:
             print(f"✅ [{i}/{len(exercises)}] Exercice importé (ID: {exercise_id})")
             print(f"   📝 {exercise.get('body', 'N/A')[:60]}...")
-            success_count += 1
-        except Exception as e:
-            print(f"❌ [{i}/{len(exercises)}] Erreur: {e}")
-            error_count += 1
+        else:
+            print(f"❌ [{i}/{len(exercises)}] Erreur: {error}")
+    
+    result = import_in_chunks(conn, exercises, course_id, commit_every, journal, on_row)
+    success_count = result['success']
+    error_count = result['errors']
     
     print(f"\n{'='*60}")
+    if result['resumed']:
+        print(f"♻️  Reprise après {result['resumed']} exercices déjà traités")
     print(f"✅ Import terminé: {success_count} succès, {error_count} erreurs")
     print(f"{'='*60}\n")
     
@@ -372,12 +310,37 @@ Exemples d'utilisation:
         help='ID du cours auquel associer les exercices'
     )
     
+    parser.add_argument(
+        '--commit-every',
+        type=int,
+        default=DEFAULT_COMMIT_EVERY,
+        help=f'Exercices validés par transaction (défaut: {DEFAULT_COMMIT_EVERY})'
+    )
+    
+    parser.add_argument(
+        '--journal',
+        type=str,
+        help='Journal de reprise (défaut: <PDF>.import-journal.json)'
+    )
+    
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='Ignorer le journal et reprendre l\'import depuis le début'
+    )
+    
     parser.add_argument(
         '--auto-format',
         action='store_true',
         help='Formatage automatique des exercices (expérimental)'
     )
     
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Ne pas utiliser le cache du texte des pages'
+    )
+    
     parser.add_argument(
         '--create-example',
         action='store_true',
@@ -406,7 +369,12 @@ Exemples d'utilisation:
     # Extraire les exercices du PDF
     extractor = PDFExerciseExtractor()
     print(f"📄 Extraction du texte depuis: {args.pdf}")
-    text = extractor.extract_text_from_pdf(args.pdf)
+    cache = open_cache(not args.no_cache)
+    try:
+        text = extractor.extract_text_from_pdf(args.pdf, cache=cache)
+    finally:
+        if cache is not None:
+            cache.close()
     
     if not text:
         print("❌ Impossible d'extraire le texte du PDF")
@@ -433,8 +401,12 @@ Exemples d'utilisation:
         conn.close()
         sys.exit(1)
     
-    # Importer les exercices
-    success, errors = import_all_exercises(conn, exercises, args.course_id)
+    # Importer les exercices (reprise après le dernier paquet validé si le journal existe)
+    journal = ImportJournal(args.journal or f"{args.pdf}.import-journal.json",
+                            args.pdf, args.course_id, len(exercises))
+    if args.restart:
+        journal.remove()
+    success, errors = import_all_exercises(conn, exercises, args.course_id, args.commit_every, journal)
     
     # Fermer la connexion
     conn.close()
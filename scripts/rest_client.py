@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Client HTTP partagé pour les imports via l'API REST Supabase (PostgREST)
+
+Une seule requests.Session est réutilisée pour toutes les requêtes: les
+connexions TCP+TLS restent ouvertes (keep-alive) dans le pool de
+l'HTTPAdapter au lieu d'être rouvertes à chaque paquet. post_batches()
+envoie les paquets en parallèle, avec au plus `concurrency` requêtes en
+vol, et retourne les résultats dans l'ordre des paquets.
+
+AdaptiveBatcher ajuste en plus la taille des paquets à la latence observée,
+rejoue les réponses 429/5xx avec un délai exponentiel aléatoire et coupe en
+deux un paquet refusé pour n'écarter que les lignes fautives.
+
+Usage:
+    python scripts/rest_client.py --benchmark
+    python scripts/rest_client.py --benchmark --batches 40 --latency 0.05 --concurrency 8
+    python scripts/rest_client.py --benchmark --adaptive --error-rate 0.1 --bad-rows 5
+"""
+
+import sys
+import json
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    print("Erreur: Le module requests n'est pas installe.")
+    print("Installez-le avec: pip install requests")
+    sys.exit(1)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 60
+
+# Statuts rejoués après un délai; None: la requête n'a pas abouti (réseau, timeout)
+RETRYABLE_STATUSES = {None, 429, 500, 502, 503, 504}
+
+# Refus dû à certaines lignes du paquet: le couper en deux isole les fautives
+ROW_ERROR_STATUSES = {400, 409, 413, 422}
+
+# Clé, droits ou table invalides: aucune ligne ne passera, l'envoi s'arrête
+FATAL_STATUSES = {401, 403, 404}
+
+
+class BatchResult(NamedTuple):
+    """Réponse à l'envoi d'un paquet (status None si la requête n'a pas abouti)"""
+    index: int
+    size: int
+    status: Optional[int]
+    text: str
+    elapsed: float
+    retry_after: Optional[float] = None
+
+
+class SupabaseClient:
+    """Session HTTP authentifiée vers l'API REST Supabase"""
+
+    def __init__(self, url: str, key: str, pool_size: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.base_url = url.rstrip('/') + '/rest/v1'
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Content-Type': 'application/json'
+        })
+
+        # Un seul hôte: un pool de pool_size connexions suffit, bloquant au-delà
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, table: str, params: Optional[Dict[str, str]] = None,
+            headers: Optional[Dict[str, str]] = None) -> 'requests.Response':
+        """GET /rest/v1/<table>"""
+        return self.session.get(f"{self.base_url}/{table}", params=params, headers=headers,
+                                timeout=self.timeout)
+
+    def post(self, table: str, data: Any, headers: Optional[Dict[str, str]] = None,
+             params: Optional[Dict[str, str]] = None) -> 'requests.Response':
+        """POST /rest/v1/<table> avec un corps JSON"""
+        return self.session.post(f"{self.base_url}/{table}", json=data, headers=headers,
+                                 params=params, timeout=self.timeout)
+
+    def upsert(self, table: str, rows: List[Dict[str, Any]],
+               key_columns: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Créer ou retrouver les lignes identifiées par key_columns, en une requête.
+
+        Upsert PostgREST (Prefer: resolution=merge-duplicates): les lignes
+        existantes sont mises à jour avec les valeurs envoyées. Il exige une
+        contrainte unique sur key_columns; sans elle (erreur 42P10), repli sur
+        un GET des lignes existantes puis un POST des manquantes, soit deux
+        requêtes pour tout le lot au lieu de deux par ligne.
+        Retourne la ligne enregistrée (avec son id) de chaque ligne envoyée,
+        dans le même ordre. Lève requests.HTTPError si une requête échoue.
+        """
+        if not rows:
+            return []
+
+        def key(row: Dict[str, Any]) -> Tuple[str, ...]:
+            return tuple(str(row.get(column)) for column in key_columns)
+
+        stored: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        response = self.post(table, rows,
+                             headers={'Prefer': 'resolution=merge-duplicates,return=representation'},
+                             params={'on_conflict': ','.join(key_columns)})
+        if response.status_code == 400 and '42P10' in response.text:
+            # Filtre large (produit des listes de valeurs), affiné par clé ci-dessous
+            params = {column: 'in.(' + ','.join(_quote_filter_value(value) for value in
+                                                sorted({str(row.get(column)) for row in rows})) + ')'
+                      for column in key_columns}
+            existing = self.get(table, params=params)
+            existing.raise_for_status()
+            for row in existing.json():
+                stored.setdefault(key(row), row)
+
+            missing: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+            for row in rows:
+                if key(row) not in stored:
+                    missing.setdefault(key(row), row)
+            response = None
+            if missing:
+                response = self.post(table, list(missing.values()),
+                                     headers={'Prefer': 'return=representation'})
+
+        if response is not None:
+            response.raise_for_status()
+            for row in response.json():
+                stored.setdefault(key(row), row)
+        return [stored.get(key(row)) for row in rows]
+
+    def send_batch(self, table: str, index: int, batch: List[Dict[str, Any]]) -> BatchResult:
+        """Envoyer un paquet; les erreurs réseau sont rendues avec status None"""
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            response = self.post(table, batch)
+            status, text = response.status_code, response.text
+            header = response.headers.get('Retry-After', '')
+            if header.isdigit():
+                retry_after = float(header)
+        except requests.RequestException as e:
+            status, text = None, str(e)
+        return BatchResult(index, len(batch), status, text, time.perf_counter() - start, retry_after)
+
+    def post_batches(self, table: str, batches: Sequence[List[Dict[str, Any]]],
+                     concurrency: int = DEFAULT_CONCURRENCY) -> Iterator[BatchResult]:
+        """
+        Envoyer les paquets avec au plus `concurrency` requêtes simultanées.
+
+        Les résultats sont produits dans l'ordre des paquets, au fur et à
+        mesure (un paquet lent retarde l'affichage des suivants, pas leur envoi).
+        """
+        if concurrency <= 1:
+            for index, batch in enumerate(batches):
+                yield self.send_batch(table, index, batch)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            yield from executor.map(lambda item: self.send_batch(table, *item), enumerate(batches))
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AdaptiveBatcher:
+    """
+    Envoi des lignes par paquets de taille adaptative.
+
+    - la taille grandit (x1.5) tant qu'un paquet répond sous target_latency,
+      et est divisée par deux au-delà, ou quand le serveur limite le débit (429);
+    - un paquet en 429/5xx/erreur réseau est rejoué jusqu'à max_retries fois,
+      après un délai aléatoire dans [0, min(backoff_cap, backoff_base * 2^n)]
+      (ou Retry-After si le serveur l'indique);
+    - un paquet refusé pour ses lignes (400/409/413/422) est coupé en deux
+      jusqu'à isoler les lignes fautives: seules celles-ci sont perdues;
+    - sur 401/403/404, plus aucun paquet n'est envoyé: les lignes restantes
+      sont comptées perdues (les autres refus perdent le paquet seul).
+
+    Plusieurs threads (concurrency) prennent chacun le paquet suivant à la
+    taille courante.
+    """
+
+    def __init__(self, client: SupabaseClient, table: str,
+                 initial_size: int = 100, min_size: int = 1, max_size: int = 1000,
+                 target_latency: float = 1.0, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 on_batch: Optional[Callable[[int, int, int], None]] = None):
+        self.client = client
+        self.table = table
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.size = min(max(initial_size, self.min_size), self.max_size)
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.concurrency = max(1, concurrency)
+        # on_batch(lignes importées par ce paquet, total importé, taille suivante)
+        self.on_batch = on_batch
+
+        self._lock = threading.Condition()
+        self._random = random.Random()
+
+    def _backoff(self, attempt: int, result: BatchResult) -> float:
+        if result.retry_after is not None:
+            return min(result.retry_after, self.backoff_cap)
+        return self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _send_with_retry(self, offset: int, batch: List[Dict[str, Any]]) -> BatchResult:
+        attempt = 0
+        while True:
+            result = self.client.send_batch(self.table, offset, batch)
+            with self._lock:
+                self._report['requests'] += 1
+            if result.status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                return result
+
+            with self._lock:
+                self._report['retries'] += 1
+                # Limitation de débit explicite: réduire les paquets suivants
+                # (les 5xx isolés ne disent rien de la taille des paquets)
+                if result.status == 429:
+                    self.size = max(self.min_size, self.size // 2)
+            time.sleep(self._backoff(attempt, result))
+            attempt += 1
+
+    def _adjust_size(self, elapsed: float):
+        if elapsed > self.target_latency:
+            self.size = max(self.min_size, self.size // 2)
+        elif elapsed < self.target_latency * 0.8:
+            self.size = min(self.max_size, self.size + max(1, self.size // 2))
+
+    def _deliver(self, offset: int, batch: List[Dict[str, Any]], top_level: bool = True):
+        result = self._send_with_retry(offset, batch)
+
+        if result.status is not None and 200 <= result.status < 300:
+            with self._lock:
+                self._report['imported'] += len(batch)
+                if top_level:
+                    self._adjust_size(result.elapsed)
+                if self.on_batch:
+                    self.on_batch(len(batch), self._report['imported'], self.size)
+            return
+
+        if result.status in FATAL_STATUSES:
+            with self._lock:
+                self._lose(offset, batch, result.status, result.text)
+                if self._report['aborted'] is None:
+                    self._report['aborted'] = result.status
+                    self._abort_text = result.text
+                self._lock.notify_all()
+            return
+
+        if result.status not in ROW_ERROR_STATUSES or len(batch) == 1:
+            # Reprises épuisées, refus sans rapport avec les lignes, ou ligne
+            # refusée isolée: lignes perdues
+            with self._lock:
+                self._lose(offset, batch, result.status, result.text)
+            return
+
+        # Paquet refusé: le couper en deux pour isoler les lignes fautives; les
+        # moitiés passent avant les nouveaux paquets, sur tous les threads
+        middle = len(batch) // 2
+        with self._lock:
+            self._report['bisections'] += 1
+            self._pending.append((offset, batch[:middle]))
+            self._pending.append((offset + middle, batch[middle:]))
+            self._lock.notify_all()
+
+    def _lose(self, offset: int, batch: List[Dict[str, Any]], status: Optional[int], text: str):
+        """Compter les lignes du paquet comme perdues (verrou tenu)"""
+        self._report['lost'] += len(batch)
+        self._report['errors'].extend((offset + i, status, text) for i in range(len(batch)))
+
+    def _next_batch(self, rows: List[Dict[str, Any]]):
+        """(offset, paquet, paquet de premier niveau), ou None quand tout est envoyé"""
+        with self._lock:
+            while True:
+                if self._report['aborted'] is not None:
+                    # Envoi arrêté: moitiés en attente et lignes non envoyées perdues
+                    status = self._report['aborted']
+                    while self._pending:
+                        self._lose(*self._pending.popleft(), status, self._abort_text)
+                    if self._cursor < len(rows):
+                        self._lose(self._cursor, rows[self._cursor:], status, self._abort_text)
+                        self._cursor = len(rows)
+                    return None
+                if self._pending:
+                    offset, batch = self._pending.popleft()
+                    top_level = False
+                    break
+                if self._cursor < len(rows):
+                    offset = self._cursor
+                    self._cursor = offset + self.size
+                    batch = rows[offset:self._cursor]
+                    top_level = True
+                    break
+                # Plus rien à prendre: attendre les moitiés des paquets encore en vol
+                if self._in_flight == 0:
+                    return None
+                self._lock.wait()
+            self._in_flight += 1
+            return offset, batch, top_level
+
+    def _worker(self, rows: List[Dict[str, Any]]):
+        while True:
+            item = self._next_batch(rows)
+            if item is None:
+                return
+            try:
+                self._deliver(*item)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._lock.notify_all()
+
+    def run(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Envoyer toutes les lignes.
+
+        Retourne {'imported', 'lost', 'retries', 'bisections', 'requests',
+        'elapsed', 'rows_per_second', 'final_size', 'errors': [(indice, status, texte)],
+        'aborted': status 401/403/404 qui a arrêté l'envoi, ou None}.
+        """
+        self._cursor = 0
+        self._pending: Deque[Tuple[int, List[Dict[str, Any]]]] = deque()
+        self._in_flight = 0
+        self._report: Dict[str, Any] = {'imported': 0, 'lost': 0, 'retries': 0, 'bisections': 0,
+                                        'requests': 0, 'errors': [], 'aborted': None}
+        self._abort_text = ''
+
+        start = time.perf_counter()
+
+        threads = [threading.Thread(target=self._worker, args=(rows,), daemon=True)
+                   for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        report = self._report
+        report['elapsed'] = time.perf_counter() - start
+        report['rows_per_second'] = report['imported'] / report['elapsed'] if report['elapsed'] else 0.0
+        report['final_size'] = self.size
+        report['errors'].sort()
+        return report
+
+
+def _quote_filter_value(value: str) -> str:
+    """Valeur entre guillemets pour un filtre PostgREST in.(...)"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def split_batches(rows: List[Dict[str, Any]], batch_size: int) -> List[List[Dict[str, Any]]]:
+    """Découper les lignes en paquets de batch_size"""
+    return [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+
+def start_stub_server(latency: float = 0.02, port: int = 0, row_latency: float = 0.0,
+                      error_rate: float = 0.0, seed: Optional[int] = None):
+    """
+    Démarrer un faux PostgREST local dans un thread (pour tests et benchmark).
+
+    POST /rest/v1/<table> répond 201 après latency + row_latency * lignes
+    secondes; GET répond []. Une fraction error_rate des POST répond 503, et
+    un paquet contenant une ligne marquée '_bad' est refusé en 400 (comme une
+    violation de contrainte).
+    Retourne (serveur, url); arrêter avec serveur.shutdown().
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    faults = random.Random(seed)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # En-têtes et corps en un seul envoi (sinon Nagle + ACK retardé en keep-alive)
+        wbufsize = -1
+        disable_nagle_algorithm = True
+        received_rows = 0
+        connections = 0
+        lock = threading.Lock()
+
+        def setup(self):
+            super().setup()
+            with StubHandler.lock:
+                StubHandler.connections += 1
+
+        def _reply(self, status: int, body: Any):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._reply(200, [])
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            rows = json.loads(self.rfile.read(length) or b'[]')
+            if not isinstance(rows, list):
+                rows = [rows]
+            time.sleep(latency + row_latency * len(rows))
+
+            with StubHandler.lock:
+                unavailable = faults.random() < error_rate
+            if unavailable:
+                return self._reply(503, {'message': 'Service Unavailable'})
+            if any(isinstance(row, dict) and row.get('_bad') for row in rows):
+                return self._reply(400, {'code': '23502', 'message': 'null value violates not-null constraint'})
+
+            with StubHandler.lock:
+                StubHandler.received_rows += len(rows)
+            self._reply(201, rows)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.handler = StubHandler
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_benchmark(batches: int = 20, batch_size: int = 100, latency: float = 0.05,
+                  concurrency: int = DEFAULT_CONCURRENCY):
+    """Comparer requests.post par paquet, session séquentielle et session concurrente"""
+    server, url = start_stub_server(latency)
+    rows = [{'body': f'Exercice {i}', 'answer': str(i)} for i in range(batches * batch_size)]
+    payload = split_batches(rows, batch_size)
+    print(f"Faux PostgREST sur {url}: {batches} paquets de {batch_size}, latence {latency * 1000:.0f} ms")
+
+    try:
+        start = time.perf_counter()
+        for batch in payload:
+            requests.post(f"{url}/rest/v1/exercises", json=batch, timeout=DEFAULT_TIMEOUT)
+        print(f"   requests.post par paquet:   {time.perf_counter() - start:.2f}s")
+
+        for label, workers in (('Session sequentielle', 1), (f'Session, {concurrency} en vol', concurrency)):
+            before = server.handler.connections
+            with SupabaseClient(url, 'stub', pool_size=workers) as client:
+                start = time.perf_counter()
+                results = list(client.post_batches('exercises', payload, workers))
+                elapsed = time.perf_counter() - start
+            ok = sum(result.size for result in results if result.status == 201)
+            print(f"   {label + ':':<27} {elapsed:.2f}s, {ok} lignes, "
+                  f"{server.handler.connections - before} connexions ouvertes")
+    finally:
+        server.shutdown()
+
+def run_adaptive_benchmark(rows: int = 2000, latency: float = 0.02, row_latency: float = 0.0005,
+                           error_rate: float = 0.05, bad_rows: int = 3,
+                           concurrency: int = DEFAULT_CONCURRENCY, target_latency: float = 0.15):
+    """Comparer paquets fixes de 100 (sans reprise) et AdaptiveBatcher, avec pannes simulées"""
+    server, url = start_stub_server(latency, row_latency=row_latency, error_rate=error_rate, seed=1)
+    data = [{'body': f'Exercice {i}', 'answer': str(i)} for i in range(rows)]
+    for i in random.Random(2).sample(range(rows), min(bad_rows, rows)):
+        data[i]['_bad'] = True
+    print(f"Faux PostgREST sur {url}: {rows} lignes, {error_rate:.0%} de 503, {bad_rows} lignes invalides")
+
+    try:
+        with SupabaseClient(url, 'stub', pool_size=concurrency) as client:
+            start = time.perf_counter()
+            results = list(client.post_batches('exercises', split_batches(data, 100), concurrency))
+            elapsed = time.perf_counter() - start
+            imported = sum(result.size for result in results if result.status == 201)
+            print(f"   Paquets fixes de 100:  {elapsed:.2f}s, {imported / elapsed:7.0f} lignes/s, "
+                  f"{rows - imported} lignes perdues")
+
+            batcher = AdaptiveBatcher(client, 'exercises', concurrency=concurrency,
+                                      target_latency=target_latency, backoff_base=0.05)
+            report = batcher.run(data)
+            print(f"   Paquets adaptatifs:    {report['elapsed']:.2f}s, {report['rows_per_second']:7.0f} lignes/s, "
+                  f"{report['lost']} lignes perdues ({report['retries']} reprises, "
+                  f"{report['bisections']} coupures, taille finale {report['final_size']})")
+    finally:
+        server.shutdown()
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Client HTTP partage pour l\'API REST Supabase')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Mesurer l\'envoi des paquets contre un faux PostgREST local')
+    parser.add_argument('--batches', type=int, default=20,
+                       help='Nombre de paquets envoyes')
+    parser.add_argument('--batch-size', type=int, default=100,
+                       help='Nombre de lignes par paquet')
+    parser.add_argument('--latency', type=float, default=0.05,
+                       help='Temps de reponse simule du serveur, en secondes')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help='Nombre de requetes simultanees')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Comparer paquets fixes et paquets adaptatifs avec pannes simulees')
+    parser.add_argument('--error-rate', type=float, default=0.05,
+                       help='Fraction des requetes repondant 503 (avec --adaptive)')
+    parser.add_argument('--bad-rows', type=int, default=3,
+                       help='Nombre de lignes refusees par le serveur (avec --adaptive)')
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    if args.adaptive:
+        run_adaptive_benchmark(args.batches * args.batch_size, error_rate=args.error_rate,
+                               bad_rows=args.bad_rows, concurrency=args.concurrency)
+    else:
+        run_benchmark(args.batches, args.batch_size, args.latency, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
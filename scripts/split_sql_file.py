@@ -2,84 +2,313 @@
 """
 Script pour diviser le fichier SQL en parties plus petites
 pour éviter l'erreur "Query is too large" dans Supabase
+
+Le fichier est lu par blocs et découpé instruction par instruction: le
+découpage tient compte des chaînes ('...', E'...', "..."), des corps
+$$...$$ / $tag$...$tag$ et des commentaires (--, /* */), si bien qu'un
+INSERT multi-lignes ou une fonction plpgsql n'est jamais coupé entre deux
+parties. Les méta-commandes psql (\\copy...) se terminent à la fin de leur
+ligne. Les parties sont écrites au fil de l'eau, sans charger le fichier.
 """
 
 import os
-import sys
+import re
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+# Taille des blocs lus dans le fichier source
+READ_CHUNK_SIZE = 64 * 1024
+
+BEGIN_SQL = "BEGIN;\n\n"
+COMMIT_SQL = "\nCOMMIT;\n"
+
+_CODE_SPECIAL = re.compile(r"[;'\"$/\-\\]")
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_\u0080-\uffff][A-Za-z_0-9\u0080-\uffff]*)?\$")
+_DOLLAR_PREFIX = re.compile(r"\$[A-Za-z_0-9\u0080-\uffff]*\Z")
+_COMMENT_BOUNDARY = re.compile(r"/\*|\*/")
+_ESCAPE_STRING_SPECIAL = re.compile(r"[\\']")
+_STATEMENT_TAIL = re.compile(r"[ \t]*\r?\n?")
+
+
+def _is_identifier_char(char: str) -> bool:
+    return char.isalnum() or char in '_$'
+
+
+class SqlStatementScanner:
+    """
+    Découpe un texte SQL reçu par morceaux en instructions complètes.
+
+    feed() retourne les instructions terminées dans le texte reçu; la
+    concaténation de tout ce qui est retourné est exactement le texte
+    d'origine (espaces et commentaires entre deux instructions sont
+    rattachés à l'instruction suivante).
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.has_code = False
+        self.state = None       # None, "'", "E'", '"', '--', '/*' ou la balise $tag$
+        self.comment_depth = 0  # les commentaires /* */ s'imbriquent en PostgreSQL
+
+    def feed(self, text: str, final: bool = False) -> List[str]:
+        self.buffer += text
+        statements = []
+        start = 0
+
+        while True:
+            end = self._scan(final)
+            if end is None:
+                break
+            statements.append(self.buffer[start:end])
+            start = end
+            self.has_code = False
+
+        if final:
+            if start < len(self.buffer):
+                statements.append(self.buffer[start:])
+            self.buffer, self.pos = '', 0
+        elif start:
+            self.buffer = self.buffer[start:]
+            self.pos -= start
+        return statements
+
+    def _scan(self, final: bool) -> Optional[int]:
+        """Avancer jusqu'à la fin de l'instruction courante (None: texte insuffisant)"""
+        buffer = self.buffer
+        size = len(buffer)
+
+        while self.pos < size:
+            state = self.state
+
+            if state is None:
+                match = _CODE_SPECIAL.search(buffer, self.pos)
+                stop = match.start() if match else size
+                if not self.has_code and buffer[self.pos:stop].strip():
+                    self.has_code = True
+                if not match:
+                    self.pos = size
+                    return None
+
+                i = stop
+                char = buffer[i]
+                following = buffer[i + 1:i + 2]
+                if not following and not final and char in '-/$':
+                    # Jeton possiblement coupé en fin de bloc: attendre la suite
+                    self.pos = i
+                    return None
+
+                if char == ';':
+                    # L'instruction garde la fin de sa ligne
+                    tail = _STATEMENT_TAIL.match(buffer, i + 1)
+                    if tail.end() == size and not final:
+                        self.pos = i
+                        return None
+                    self.pos = tail.end()
+                    return self.pos
+                if char == '\\' and not self.has_code:
+                    # Méta-commande psql: jusqu'à la fin de la ligne
+                    newline = buffer.find('\n', i)
+                    if newline < 0:
+                        if not final:
+                            self.pos = i
+                            return None
+                        newline = size - 1
+                    self.pos = newline + 1
+                    return self.pos
+
+                self.has_code = self.has_code or char not in '-/'
+                if char == "'":
+                    escaped = i > 0 and buffer[i - 1] in 'Ee' and (i < 2 or not _is_identifier_char(buffer[i - 2]))
+                    self.state = "E'" if escaped else "'"
+                    self.pos = i + 1
+                elif char == '"':
+                    self.state = '"'
+                    self.pos = i + 1
+                elif char == '-' and following == '-':
+                    self.state = '--'
+                    self.pos = i + 2
+                elif char == '/' and following == '*':
+                    self.state = '/*'
+                    self.comment_depth = 1
+                    self.pos = i + 2
+                elif char == '$' and not (i > 0 and _is_identifier_char(buffer[i - 1])):
+                    tag = _DOLLAR_TAG.match(buffer, i)
+                    if tag:
+                        self.has_code = True
+                        self.state = tag.group()
+                        self.pos = tag.end()
+                    elif not final and _DOLLAR_PREFIX.match(buffer, i):
+                        self.pos = i
+                        return None
+                    else:
+                        self.pos = i + 1
+                else:
+                    if char in '-/$':
+                        self.has_code = True
+                    self.pos = i + 1
+
+            elif state in ("'", '"'):
+                close = buffer.find(state, self.pos)
+                if close < 0 or (close + 1 == size and not final):
+                    # Fermeture introuvable, ou peut-être un guillemet doublé coupé
+                    self.pos = max(self.pos, close if close >= 0 else size)
+                    return None
+                if buffer[close + 1:close + 2] == state:
+                    self.pos = close + 2
+                else:
+                    self.state = None
+                    self.pos = close + 1
+
+            elif state == "E'":
+                match = _ESCAPE_STRING_SPECIAL.search(buffer, self.pos)
+                if not match or (match.end() == size and not final):
+                    self.pos = match.start() if match else size
+                    return None
+                if match.group() == '\\':
+                    self.pos = match.start() + 2
+                elif buffer[match.end():match.end() + 1] == "'":
+                    self.pos = match.end() + 1
+                else:
+                    self.state = None
+                    self.pos = match.end()
+
+            elif state == '--':
+                newline = buffer.find('\n', self.pos)
+                if newline < 0:
+                    self.pos = size
+                    return None
+                self.state = None
+                self.pos = newline + 1
+
+            elif state == '/*':
+                match = _COMMENT_BOUNDARY.search(buffer, self.pos)
+                if not match:
+                    # Garder le dernier caractère: il peut commencer /* ou */
+                    self.pos = max(self.pos, size - 1)
+                    return None
+                self.comment_depth += 1 if match.group() == '/*' else -1
+                self.pos = match.end()
+                if not self.comment_depth:
+                    self.state = None
+
+            else:
+                close = buffer.find(state, self.pos)
+                if close < 0:
+                    # Garder de quoi reconnaître une balise coupée entre deux blocs
+                    self.pos = max(self.pos, size - len(state) + 1)
+                    return None
+                self.state = None
+                self.pos = close + len(state)
+
+        return None
+
+
+def iter_sql_statements(f: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """Instructions SQL d'un fichier ouvert, lues par blocs de chunk_size caractères"""
+    scanner = SqlStatementScanner()
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield from scanner.feed(chunk)
+    yield from scanner.feed('', final=True)
+
+
+def detect_encoding(input_file: str, chunk_size: int = READ_CHUNK_SIZE) -> str:
+    """utf-8-sig si le fichier est de l'UTF-8 valide (avec ou sans BOM), sinon latin-1"""
+    import codecs
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(input_file, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                decoder.decode(chunk, final=not chunk)
+                if not chunk:
+                    break
+    except UnicodeDecodeError:
+        return 'latin-1'
+    return 'utf-8-sig'
+
+
+def write_sql_parts(input_file: str, max_size_mb: float = 2.0,
+                    wrap_transaction: bool = False,
+                    chunk_size: int = READ_CHUNK_SIZE) -> Tuple[List[Tuple[str, int]], int]:
+    """
+    Découper input_file en parties {base}_part_NN.sql d'au plus max_size_mb.
 
-def split_sql_file(input_file: str, max_size_mb: float = 2.0):
+    Les parties ne sont coupées qu'entre deux instructions; avec
+    wrap_transaction, chacune est encadrée par BEGIN/COMMIT (compris dans le
+    budget). Une instruction plus grosse que le budget forme une partie à
+    elle seule. Retourne ([(fichier, taille en octets)], taille totale).
+    """
+    max_size_bytes = int(max_size_mb * 1024 * 1024)
+    overhead = len(BEGIN_SQL) + len(COMMIT_SQL) if wrap_transaction else 0
+    base_name = os.path.splitext(input_file)[0]
+    encoding = detect_encoding(input_file, chunk_size)
+    if encoding != 'utf-8-sig':
+        print(f"[INFO] Fichier lu avec l'encodage: {encoding}")
+
+    parts: List[Tuple[str, int]] = []
+    total_size = 0
+    output = None
+    current_size = 0
+
+    def close_part():
+        if wrap_transaction:
+            output.write(COMMIT_SQL)
+        output.close()
+        parts.append((output.name, current_size + overhead))
+
+    try:
+        with open(input_file, 'r', encoding=encoding) as f:
+            for statement in iter_sql_statements(f, chunk_size):
+                size = len(statement.encode('utf-8'))
+                total_size += size
+
+                if output is not None and current_size + size + overhead > max_size_bytes and current_size:
+                    close_part()
+                    output = None
+
+                if output is None:
+                    output_file = f"{base_name}_part_{len(parts) + 1:02d}.sql"
+                    output = open(output_file, 'w', encoding='utf-8')
+                    current_size = 0
+                    if wrap_transaction:
+                        output.write(BEGIN_SQL)
+                    if size + overhead > max_size_bytes:
+                        print(f"[WARNING] Instruction de {size / (1024*1024):.1f} MB plus grande "
+                              f"que la taille maximale ({output_file})")
+
+                output.write(statement)
+                current_size += size
+    finally:
+        if output is not None:
+            close_part()
+
+    return parts, total_size
+
+
+def split_sql_file(input_file: str, max_size_mb: float = 2.0, wrap_transaction: bool = False):
     """Diviser un fichier SQL en parties plus petites"""
-    
+
     if not os.path.exists(input_file):
         print(f"[ERROR] Fichier non trouve: {input_file}")
         return
-    
-    # Taille maximale en bytes (2 MB par défaut)
-    max_size_bytes = int(max_size_mb * 1024 * 1024)
-    
+
     print(f"[INFO] Division du fichier {input_file}")
     print(f"[INFO] Taille maximale par partie: {max_size_mb} MB")
-    
-    # Essayer différents encodages
-    encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-    content = None
-    
-    for encoding in encodings:
-        try:
-            with open(input_file, 'r', encoding=encoding) as f:
-                content = f.read()
-            print(f"[INFO] Fichier lu avec l'encodage: {encoding}")
-            break
-        except UnicodeDecodeError:
-            continue
-    
-    if content is None:
-        print(f"[ERROR] Impossible de lire le fichier avec les encodages testés")
-        return
-    
-    total_size = len(content.encode('utf-8'))
+
+    parts, total_size = write_sql_parts(input_file, max_size_mb, wrap_transaction)
+
     print(f"[INFO] Taille totale: {total_size / (1024*1024):.1f} MB")
-    
-    # Diviser le contenu en parties
-    parts = []
-    current_part = ""
-    current_size = 0
-    part_number = 1
-    
-    # Diviser par lignes pour éviter de couper au milieu d'une instruction SQL
-    lines = content.split('\n')
-    
-    for line in lines:
-        line_size = len(line.encode('utf-8'))
-        
-        # Si ajouter cette ligne dépasse la taille max, sauvegarder la partie actuelle
-        if current_size + line_size > max_size_bytes and current_part:
-            parts.append(current_part)
-            current_part = ""
-            current_size = 0
-            part_number += 1
-        
-        current_part += line + '\n'
-        current_size += line_size
-    
-    # Ajouter la dernière partie
-    if current_part:
-        parts.append(current_part)
-    
     print(f"[INFO] Fichier divise en {len(parts)} parties")
-    
-    # Sauvegarder les parties
-    base_name = os.path.splitext(input_file)[0]
-    
-    for i, part in enumerate(parts, 1):
-        output_file = f"{base_name}_part_{i:02d}.sql"
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(part)
-        
-        part_size = len(part.encode('utf-8'))
+
+    for i, (output_file, part_size) in enumerate(parts, 1):
         print(f"[OK] Partie {i}: {output_file} ({part_size / (1024*1024):.1f} MB)")
-    
+
+    base_name = os.path.splitext(input_file)[0]
+
     # Créer un fichier d'instructions
     instructions = f"""# Instructions d'Import - Fichier Divisé
 
@@ -100,12 +329,10 @@ Assurez-vous que le schéma de base existe :
 Exécutez les parties dans l'ordre suivant :
 
 """
-    
-    for i in range(1, len(parts) + 1):
-        part_file = f"{base_name}_part_{i:02d}.sql"
-        part_size = len(parts[i-1].encode('utf-8'))
+
+    for i, (part_file, part_size) in enumerate(parts, 1):
         instructions += f"**{i}. {part_file}** ({part_size / (1024*1024):.1f} MB)\n"
-    
+
     instructions += f"""
 ### Étape 3: Vérification
 Après avoir exécuté toutes les parties, vérifiez l'import :
@@ -135,29 +362,34 @@ ORDER BY c.order_num;
 - 3 392 exercices importés
 - Bibliothèque complète prête à utiliser
 """
-    
+
     instructions_file = f"{base_name}_INSTRUCTIONS.md"
     with open(instructions_file, 'w', encoding='utf-8') as f:
         f.write(instructions)
-    
+
     print(f"[SUCCESS] Instructions creees: {instructions_file}")
     print(f"[INFO] Executez les parties dans l'ordre indique dans {instructions_file}")
 
 def main():
     """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Diviser un fichier SQL en parties plus petites')
+    parser.add_argument('input_file', nargs='?', default='mathia_final_safe.sql',
+                       help='Fichier SQL a diviser')
+    parser.add_argument('max_size', nargs='?', type=float, default=2.0,
+                       help='Taille maximale par partie, en MB')
+    parser.add_argument('--transaction', action='store_true',
+                       help='Encadrer chaque partie par BEGIN/COMMIT')
+
+    args = parser.parse_args()
+
     print('=' * 60)
     print('DIVISEUR DE FICHIER SQL - MATHIA')
     print('=' * 60)
     print()
-    
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        max_size = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
-    else:
-        input_file = "mathia_final_safe.sql"
-        max_size = 2.0
-    
-    split_sql_file(input_file, max_size)
+
+    split_sql_file(args.input_file, args.max_size, args.transaction)
 
 if __name__ == '__main__':
     main()
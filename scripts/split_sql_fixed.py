@@ -5,86 +5,34 @@ Gère correctement l'encodage UTF-8
 """
 
 import os
-import sys
 
-def split_sql_file_fixed(input_file: str, max_size_mb: float = 1.5):
+from split_sql_file import write_sql_parts
+
+def split_sql_file_fixed(input_file: str, max_size_mb: float = 1.5, wrap_transaction: bool = False):
     """Diviser un fichier SQL en parties plus petites avec encodage correct"""
     
     if not os.path.exists(input_file):
         print(f"[ERROR] Fichier non trouvé: {input_file}")
         return
     
-    # Taille maximale en bytes (1.5 MB par défaut pour être sûr)
-    max_size_bytes = int(max_size_mb * 1024 * 1024)
-    
     print(f"[INFO] Division du fichier {input_file}")
     print(f"[INFO] Taille maximale par partie: {max_size_mb} MB")
     
-    # Lire le fichier avec encodage UTF-8
+    # Découpage en flux, entre deux instructions (voir split_sql_file.py)
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except UnicodeDecodeError:
-        # Essayer avec latin-1 si UTF-8 échoue
-        try:
-            with open(input_file, 'r', encoding='latin-1') as f:
-                content = f.read()
-            print("[INFO] Fichier lu avec l'encodage latin-1")
-        except Exception as e:
-            print(f"[ERROR] Impossible de lire le fichier: {e}")
-            return
+        parts, total_size = write_sql_parts(input_file, max_size_mb, wrap_transaction)
     except Exception as e:
         print(f"[ERROR] Erreur lecture fichier: {e}")
         return
     
-    total_size = len(content.encode('utf-8'))
     print(f"[INFO] Taille totale: {total_size / (1024*1024):.1f} MB")
-    
-    # Diviser le contenu en parties intelligentes
-    parts = []
-    current_part = ""
-    current_size = 0
-    part_number = 1
-    
-    # Diviser par lignes pour éviter de couper au milieu d'une instruction SQL
-    lines = content.split('\n')
-    
-    for line in lines:
-        line_with_newline = line + '\n'
-        line_size = len(line_with_newline.encode('utf-8'))
-        
-        # Si ajouter cette ligne dépasse la taille max, sauvegarder la partie actuelle
-        if current_size + line_size > max_size_bytes and current_part:
-            parts.append(current_part)
-            current_part = ""
-            current_size = 0
-            part_number += 1
-        
-        current_part += line_with_newline
-        current_size += line_size
-    
-    # Ajouter la dernière partie
-    if current_part:
-        parts.append(current_part)
-    
     print(f"[INFO] Fichier divisé en {len(parts)} parties")
     
-    # Sauvegarder les parties avec encodage UTF-8
-    base_name = os.path.splitext(input_file)[0]
-    
-    for i, part in enumerate(parts, 1):
-        output_file = f"{base_name}_part_{i:02d}.sql"
-        
-        try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(part)
-            
-            part_size = len(part.encode('utf-8'))
-            print(f"[OK] Partie {i}: {output_file} ({part_size / (1024*1024):.1f} MB)")
-        except Exception as e:
-            print(f"[ERROR] Erreur sauvegarde partie {i}: {e}")
+    for i, (output_file, part_size) in enumerate(parts, 1):
+        print(f"[OK] Partie {i}: {output_file} ({part_size / (1024*1024):.1f} MB)")
     
     # Créer un fichier d'instructions
+    base_name = os.path.splitext(input_file)[0]
     create_instructions(base_name, len(parts), total_size)
 
 def create_instructions(base_name: str, num_parts: int, total_size: int):
@@ -160,19 +108,24 @@ Si vous voyez encore des caractères "NUL" :
 
 def main():
     """Fonction principale"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Diviser un fichier SQL en parties plus petites')
+    parser.add_argument('input_file', nargs='?', default='mathia_final_safe.sql',
+                       help='Fichier SQL a diviser')
+    parser.add_argument('max_size', nargs='?', type=float, default=1.5,
+                       help='Taille maximale par partie, en MB')
+    parser.add_argument('--transaction', action='store_true',
+                       help='Encadrer chaque partie par BEGIN/COMMIT')
+    
+    args = parser.parse_args()
+    
     print('=' * 60)
     print('DIVISEUR DE FICHIER SQL CORRIGÉ - MATHIA')
     print('=' * 60)
     print()
     
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-        max_size = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
-    else:
-        input_file = "mathia_final_safe.sql"
-        max_size = 1.5
-    
-    split_sql_file_fixed(input_file, max_size)
+    split_sql_file_fixed(args.input_file, args.max_size, args.transaction)
 
 if __name__ == '__main__':
     main()
@@ -7,79 +7,29 @@ Crée un script SQL optimisé pour l'import avec gestion des doublons
 import os
 import json
 import sys
-from typing import List, Dict, Any, Set
+import time
+from itertools import cycle, islice
+from typing import List, Dict, Any, Iterator, Set, Tuple
 from datetime import datetime
 
-def load_exercises_with_deduplication() -> List[Dict[str, Any]]:
-    """Charger tous les exercices avec déduplication basée sur le contenu"""
-    exercise_files = [
-        'exercices_6eme.json',
-        'exercices_chapitre_1.json',
-        'exercices_chapitre_2.json',
-        'exercices_chapitre_3.json',
-        'exercices_chapitre_4.json',
-        'exercices_chapitre_5.json',
-        'exercices_chapitre_6.json',
-        'exercices_chapitre_7.json',
-        'exercices_chapitre_8.json',
-        'exercices_chapitre_9.json'
-    ]
-    
-    all_exercises = []
-    seen_content = set()
-    duplicates_count = 0
-    
-    for filename in exercise_files:
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    exercises = json.load(f)
-                    if not isinstance(exercises, list):
-                        exercises = [exercises]
-                    
-                    for exercise in exercises:
-                        # Créer une signature unique basée sur le contenu
-                        content_signature = f"{exercise.get('body', '')[:100]}_{exercise.get('answer', '')[:50]}"
-                        
-                        if content_signature not in seen_content:
-                            seen_content.add(content_signature)
-                            # Ajouter des métadonnées sur la source
-                            exercise['_source_file'] = filename
-                            all_exercises.append(exercise)
-                        else:
-                            duplicates_count += 1
-                    
-                    print(f"[OK] {filename}: {len(exercises)} exercices (doublons ignores: {duplicates_count})")
-                    
-            except Exception as e:
-                print(f"[ERROR] Erreur {filename}: {e}")
-        else:
-            print(f"[WARNING] Fichier non trouve: {filename}")
-    
-    print(f"\n[STATS] Total: {len(all_exercises)} exercices uniques (doublons supprimes: {duplicates_count})")
-    return all_exercises
+from corpus import CORPUS_FILES, as_exercise_list, iter_corpus, read_exercise_file
+from near_duplicates import DEFAULT_THRESHOLD, dedupe_exercises, print_report, save_report
+from sql_writer import MULTI_ROW_SIZE, sql_literal, write_sql
 
-def generate_migration_sql(exercises: List[Dict[str, Any]]) -> str:
-    """Générer le script de migration SQL optimisé"""
-    
-    # Déterminer les chapitres uniques
-    chapters = set()
-    for exercise in exercises:
-        chapter_num = exercise.get('chapter_number', 1)
-        chapters.add(chapter_num)
-    
-    chapters = sorted(list(chapters))
-    
-    sql = f"""-- ============================================
--- MIGRATION SQL MATHIA - EXERCICES 6ÈME
--- ============================================
--- Script de migration optimisé pour Supabase
--- Généré le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
--- Exercices uniques: {len(exercises)}
--- Chapitres: {', '.join(map(str, chapters))}
--- ============================================
+# Insertion des exercices: 'bulk' (une instruction ensembliste par lot de
+# lignes), 'staging' (chargement dans une table temporaire, puis validation
+# et insertion en une instruction, sans le trigger par ligne) ou 'function'
+# (un appel à insert_exercise_safe() par exercice)
+INSERT_MODES = ('bulk', 'staging', 'function')
+
+# Colonnes des lignes de migration_row(), dans l'ordre des VALUES
+MIGRATION_COLUMNS = ('title', 'question', 'answer', 'explanation', 'difficulty',
+                     'type', 'options', 'hints', 'order_num')
 
--- Fonction pour nettoyer et valider les données
+# Trigger de validation, exécuté pour chaque ligne insérée ou mise à jour
+# (les mêmes règles sont appliquées en une requête par iter_staging_load);
+# {schema}: schéma de la table des exercices
+VALIDATION_TRIGGER_SQL = """-- Fonction pour nettoyer et valider les données
 CREATE OR REPLACE FUNCTION validate_exercise_data()
 RETURNS TRIGGER AS $$
 BEGIN
@@ -112,12 +62,336 @@ END;
 $$ LANGUAGE plpgsql;
 
 -- Créer le trigger de validation
-DROP TRIGGER IF EXISTS validate_exercise_data_trigger ON public.exercises;
+DROP TRIGGER IF EXISTS validate_exercise_data_trigger ON {schema}.exercises;
 CREATE TRIGGER validate_exercise_data_trigger
-    BEFORE INSERT OR UPDATE ON public.exercises
+    BEFORE INSERT OR UPDATE ON {schema}.exercises
     FOR EACH ROW
     EXECUTE FUNCTION validate_exercise_data();
+"""
+
+# Colonne d'empreinte et index unique utilisés par ON CONFLICT
+QUESTION_HASH_SQL = """-- Empreinte du début de l'énoncé, calculée par PostgreSQL à chaque écriture:
+-- l'index unique (cours, empreinte) remplace le parcours de toute la table
+-- qu'imposait MD5(LEFT(question, 200)) recalculé pour chaque insertion
+ALTER TABLE {schema}.exercises
+    ADD COLUMN IF NOT EXISTS question_hash TEXT
+    GENERATED ALWAYS AS (MD5(LEFT(question, 200))) STORED;
+
+-- Des doublons déjà présents empêcheraient la création de l'index unique
+DO $$
+DECLARE
+    duplicate_count INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO duplicate_count
+    FROM (
+        SELECT 1
+        FROM {schema}.exercises
+        GROUP BY course_id, question_hash
+        HAVING COUNT(*) > 1
+    ) duplicates;
+    
+    IF duplicate_count > 0 THEN
+        RAISE EXCEPTION '% groupes d''exercices ont le même cours et le même début d''énoncé', duplicate_count
+            USING HINT = 'SELECT course_id, question_hash, COUNT(*) FROM {schema}.exercises GROUP BY 1, 2 HAVING COUNT(*) > 1';
+    END IF;
+END;
+$$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS exercises_course_question_hash_key
+    ON {schema}.exercises (course_id, question_hash);
+"""
+
+def load_exercises_with_deduplication(threshold: float = DEFAULT_THRESHOLD,
+                                      report_file: str = None) -> List[Dict[str, Any]]:
+    """
+    Charger tous les exercices en écartant les quasi-doublons (MinHash/LSH).
+    
+    Deux exercices sont des doublons si la similarité de Jaccard de leurs
+    n-grammes (énoncé et réponse normalisés) atteint threshold; le premier
+    rencontré est conservé.
+    """
+    
+    files = []
+    for filename, _ in CORPUS_FILES:
+        if os.path.exists(filename):
+            try:
+                files.append((filename, as_exercise_list(read_exercise_file(filename))))
+            except Exception as e:
+                print(f"[ERROR] Erreur {filename}: {e}")
+        else:
+            print(f"[WARNING] Fichier non trouve: {filename}")
+    
+    kept, report = dedupe_exercises(files, threshold)
+    
+    all_exercises = []
+    for filename, exercise in kept:
+        # Ajouter des métadonnées sur la source
+        exercise['_source_file'] = filename
+        all_exercises.append(exercise)
+    
+    for filename, counts in report['files'].items():
+        print(f"[OK] {filename}: {counts['total']} exercices (doublons ignores: {counts['duplicates']})")
+    
+    print()
+    print_report(report, limit=5)
+    if report_file:
+        save_report(report, report_file)
+    
+    print(f"\n[STATS] Total: {len(all_exercises)} exercices uniques (doublons supprimes: {report['duplicates']})")
+    return all_exercises
+
+def migration_row(exercise: Dict[str, Any], order_num: int) -> Tuple[Any, ...]:
+    """Valeurs d'un exercice dans l'ordre de MIGRATION_COLUMNS"""
+    title = f"Exercice {exercise.get('exercise_number', order_num)}"
+    if exercise.get('chapter_title'):
+        title += f" - {exercise['chapter_title']}"
+    
+    # Options pour QCM
+    options = exercise.get('options')
+    options_json = None
+    if options and isinstance(options, dict):
+        options_json = json.dumps(options, ensure_ascii=False)
+    
+    # Indices
+    hints = exercise.get('hints', [])
+    if not isinstance(hints, list):
+        hints = []
+    
+    return (
+        title,
+        exercise.get('body', ''),
+        exercise.get('answer', ''),
+        exercise.get('explanation') or None,
+        exercise.get('difficulty', 'moyen'),
+        exercise.get('type', 'libre'),
+        options_json,
+        json.dumps(hints, ensure_ascii=False),
+        order_num,
+    )
+
+def iter_bulk_upserts(chapter_num: int, rows: List[Tuple[Any, ...]],
+                      batch_size: int = MULTI_ROW_SIZE, schema: str = 'public') -> Iterator[str]:
+    """
+    Insérer ou mettre à jour les exercices d'un chapitre par lots de
+    batch_size lignes, une instruction par lot.
+    
+    Les doublons du lot (même début d'énoncé) sont fusionnés en une ligne,
+    comme par des appels successifs à insert_exercise_safe(): énoncé,
+    position et points de la première, autres colonnes de la dernière.
+    Ceux déjà en base sont trouvés par l'index unique (course_id,
+    question_hash) d'ON CONFLICT. Un cours absent interrompt la migration
+    avant le premier lot, avec le message de insert_exercise_safe().
+    """
+    if not rows:
+        return
+    yield f"""DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM {schema}.courses WHERE order_num = {chapter_num}) THEN
+        RAISE EXCEPTION 'Cours non trouvé pour order_num: %', {chapter_num};
+    END IF;
+END;
+$$;
+
+"""
+    
+    columns = ', '.join(MIGRATION_COLUMNS)
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, max(1, batch_size)))
+        if not batch:
+            return
+        values = ',\n'.join(
+            '    (' + ', '.join(sql_literal(value) for value in row) + ')'
+            for row in batch
+        )
+        yield f"""WITH course AS (
+    SELECT id FROM {schema}.courses WHERE order_num = {chapter_num} LIMIT 1
+), batch AS (
+    SELECT DISTINCT ON (MD5(LEFT(v.question, 200)))
+        v.*,
+        FIRST_VALUE(v.question) OVER first_row AS first_question,
+        FIRST_VALUE(v.difficulty) OVER first_row AS first_difficulty,
+        FIRST_VALUE(v.order_num) OVER first_row AS first_order_num
+    FROM (VALUES
+{values}
+    ) AS v ({columns})
+    WINDOW first_row AS (PARTITION BY MD5(LEFT(v.question, 200)) ORDER BY v.order_num)
+    ORDER BY MD5(LEFT(v.question, 200)), v.order_num DESC
+)
+INSERT INTO {schema}.exercises (
+    course_id, title, description, question, answer, explanation, difficulty,
+    points, time_limit, type, hints, options, ai_generated, order_num, is_published
+)
+SELECT
+    (SELECT id FROM course),
+    b.title,
+    'Exercice importé automatiquement',
+    b.first_question,
+    b.answer,
+    b.explanation,
+    b.difficulty,
+    CASE b.first_difficulty WHEN 'facile' THEN 10 WHEN 'moyen' THEN 15 ELSE 20 END,
+    300,
+    b.type,
+    b.hints::jsonb,
+    b.options::jsonb,
+    false,
+    b.first_order_num,
+    true
+FROM batch b
+ON CONFLICT (course_id, question_hash) DO UPDATE SET
+    title = EXCLUDED.title,
+    answer = EXCLUDED.answer,
+    explanation = EXCLUDED.explanation,
+    difficulty = EXCLUDED.difficulty,
+    type = EXCLUDED.type,
+    options = EXCLUDED.options,
+    hints = EXCLUDED.hints,
+    updated_at = NOW();
 
+"""
+
+def iter_staging_load(rows_by_chapter: Dict[int, List[Tuple[Any, ...]]],
+                      batch_size: int = MULTI_ROW_SIZE, schema: str = 'public') -> Iterator[str]:
+    """
+    Charger les exercices de tous les chapitres en une seule insertion.
+    
+    Les lignes sont copiées par lots de batch_size dans une table temporaire
+    (sans trigger ni index), vérifiées par deux requêtes, puis insérées par un
+    seul INSERT ... SELECT qui applique les règles de validate_exercise_data();
+    le trigger par ligne est désactivé pendant cette insertion. À exécuter
+    dans une transaction (la table temporaire disparaît au COMMIT).
+    """
+    columns = ', '.join(('course_order',) + MIGRATION_COLUMNS)
+    yield """-- Table de chargement, vidée à la fin de la transaction
+CREATE TEMP TABLE exercise_staging (
+    load_order BIGSERIAL,
+    course_order INTEGER,
+    title TEXT,
+    question TEXT,
+    answer TEXT,
+    explanation TEXT,
+    difficulty TEXT,
+    type TEXT,
+    options JSONB,
+    hints JSONB,
+    order_num INTEGER
+) ON COMMIT DROP;
+
+"""
+    
+    for chapter_num, rows in rows_by_chapter.items():
+        comment = f"-- Chapitre {chapter_num} ({len(rows)} exercices)\n"
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, max(1, batch_size)))
+            if not batch:
+                break
+            values = ',\n'.join(
+                f'    ({chapter_num}, ' + ', '.join(sql_literal(value) for value in row) + ')'
+                for row in batch
+            )
+            yield f"{comment}INSERT INTO exercise_staging ({columns}) VALUES\n{values};\n\n"
+            comment = ''
+    
+    yield f"""-- Contrôles du trigger de validation, sur toutes les lignes à la fois
+DO $$
+DECLARE
+    invalid_count INTEGER;
+    missing_course INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO invalid_count
+    FROM exercise_staging
+    WHERE question IS NULL OR LENGTH(TRIM(question)) = 0
+       OR answer IS NULL OR LENGTH(TRIM(answer)) = 0;
+    
+    IF invalid_count > 0 THEN
+        RAISE EXCEPTION '% exercices sans question ou sans réponse', invalid_count;
+    END IF;
+    
+    SELECT MIN(s.course_order) INTO missing_course
+    FROM exercise_staging s
+    WHERE NOT EXISTS (SELECT 1 FROM {schema}.courses c WHERE c.order_num = s.course_order);
+    
+    IF missing_course IS NOT NULL THEN
+        RAISE EXCEPTION 'Cours non trouvé pour order_num: %', missing_course;
+    END IF;
+END;
+$$;
+
+ALTER TABLE {schema}.exercises DISABLE TRIGGER validate_exercise_data_trigger;
+
+-- Normalisation du trigger (longueurs, difficulté, type) appliquée dans le
+-- SELECT; les doublons sont fusionnés comme par insert_exercise_safe():
+-- énoncé, position et points de la première ligne, le reste de la dernière
+INSERT INTO {schema}.exercises (
+    course_id, title, description, question, answer, explanation, difficulty,
+    points, time_limit, type, hints, options, ai_generated, order_num, is_published
+)
+SELECT DISTINCT ON (c.id, MD5(LEFT(s.question, 200)))
+    c.id,
+    s.title,
+    'Exercice importé automatiquement',
+    LEFT(FIRST_VALUE(s.question) OVER first_row, 2000),
+    LEFT(s.answer, 1000),
+    LEFT(COALESCE(s.explanation, ''), 1000),
+    CASE WHEN s.difficulty NOT IN ('facile', 'moyen', 'difficile') THEN 'moyen' ELSE s.difficulty END,
+    CASE FIRST_VALUE(s.difficulty) OVER first_row WHEN 'facile' THEN 10 WHEN 'moyen' THEN 15 ELSE 20 END,
+    300,
+    CASE WHEN s.type NOT IN ('qcm', 'libre', 'vrai-faux', 'calcul') THEN 'libre' ELSE s.type END,
+    s.hints,
+    s.options,
+    false,
+    FIRST_VALUE(s.order_num) OVER first_row,
+    true
+FROM exercise_staging s
+CROSS JOIN LATERAL (
+    SELECT id FROM {schema}.courses WHERE order_num = s.course_order LIMIT 1
+) c
+WINDOW first_row AS (PARTITION BY c.id, MD5(LEFT(s.question, 200)) ORDER BY s.load_order)
+ORDER BY c.id, MD5(LEFT(s.question, 200)), s.load_order DESC
+ON CONFLICT (course_id, question_hash) DO UPDATE SET
+    title = EXCLUDED.title,
+    answer = EXCLUDED.answer,
+    explanation = EXCLUDED.explanation,
+    difficulty = EXCLUDED.difficulty,
+    type = EXCLUDED.type,
+    options = EXCLUDED.options,
+    hints = EXCLUDED.hints,
+    updated_at = NOW();
+
+ALTER TABLE {schema}.exercises ENABLE TRIGGER validate_exercise_data_trigger;
+
+"""
+
+def iter_migration_sql(exercises: List[Dict[str, Any]], insert_mode: str = 'bulk',
+                       batch_size: int = MULTI_ROW_SIZE) -> Iterator[str]:
+    """
+    Générer le script de migration SQL optimisé, instruction par instruction
+    
+    insert_mode: 'bulk' (iter_bulk_upserts, lots de batch_size exercices),
+    'staging' (iter_staging_load, dans une transaction) ou 'function' (un
+    SELECT insert_exercise_safe(...) par exercice).
+    """
+    
+    # Déterminer les chapitres uniques
+    chapters = set()
+    for exercise in exercises:
+        chapter_num = exercise.get('chapter_number', 1)
+        chapters.add(chapter_num)
+    
+    chapters = sorted(list(chapters))
+    
+    yield f"""-- ============================================
+-- MIGRATION SQL MATHIA - EXERCICES 6ÈME
+-- ============================================
+-- Script de migration optimisé pour Supabase
+-- Généré le {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+-- Exercices uniques: {len(exercises)}
+-- Chapitres: {', '.join(map(str, chapters))}
+-- ============================================
+
+{VALIDATION_TRIGGER_SQL.format(schema='public')}
 -- ============================================
 -- CRÉATION DES COURS (avec vérification d'existence)
 -- ============================================
@@ -138,7 +412,7 @@ CREATE TRIGGER validate_exercise_data_trigger
     ]
     
     for chapter_num, title, topic in courses_data:
-        sql += f"""-- Cours {chapter_num}: {title}
+        yield f"""-- Cours {chapter_num}: {title}
 INSERT INTO public.courses (
     id,
     title,
@@ -167,12 +441,14 @@ INSERT INTO public.courses (
 
 """
     
-    sql += """
+    yield f"""
 -- ============================================
 -- IMPORT DES EXERCICES (avec gestion des doublons)
 -- ============================================
 
+{QUESTION_HASH_SQL.format(schema='public')}
 -- Fonction pour insérer un exercice avec vérification de doublon
+-- (une recherche dans l'index unique par appel)
 CREATE OR REPLACE FUNCTION insert_exercise_safe(
     p_course_order INTEGER,
     p_title TEXT,
@@ -186,88 +462,72 @@ CREATE OR REPLACE FUNCTION insert_exercise_safe(
     p_order_num INTEGER DEFAULT 1
 ) RETURNS UUID AS $$
 DECLARE
-    course_id UUID;
-    exercise_id UUID;
-    question_hash TEXT;
+    v_course_id UUID;
+    v_exercise_id UUID;
 BEGIN
     -- Récupérer l'ID du cours
-    SELECT id INTO course_id 
+    SELECT id INTO v_course_id 
     FROM public.courses 
     WHERE order_num = p_course_order 
     LIMIT 1;
     
-    IF course_id IS NULL THEN
+    IF v_course_id IS NULL THEN
         RAISE EXCEPTION 'Cours non trouvé pour order_num: %', p_course_order;
     END IF;
     
-    -- Créer un hash de la question pour détecter les doublons
-    question_hash = MD5(LEFT(p_question, 200));
+    -- Insérer le nouvel exercice, ou mettre à jour celui qui a la même
+    -- empreinte dans ce cours
+    INSERT INTO public.exercises (
+        id,
+        course_id,
+        title,
+        description,
+        question,
+        answer,
+        explanation,
+        difficulty,
+        points,
+        time_limit,
+        type,
+        hints,
+        options,
+        ai_generated,
+        order_num,
+        is_published
+    ) VALUES (
+        uuid_generate_v4(),
+        v_course_id,
+        p_title,
+        'Exercice importé automatiquement',
+        p_question,
+        p_answer,
+        p_explanation,
+        p_difficulty,
+        CASE p_difficulty 
+            WHEN 'facile' THEN 10 
+            WHEN 'moyen' THEN 15 
+            ELSE 20 
+        END,
+        300,
+        p_type,
+        p_hints,
+        p_options,
+        false,
+        p_order_num,
+        true
+    )
+    ON CONFLICT (course_id, question_hash) DO UPDATE SET
+        title = EXCLUDED.title,
+        answer = EXCLUDED.answer,
+        explanation = EXCLUDED.explanation,
+        difficulty = EXCLUDED.difficulty,
+        type = EXCLUDED.type,
+        options = EXCLUDED.options,
+        hints = EXCLUDED.hints,
+        updated_at = NOW()
+    RETURNING id INTO v_exercise_id;
     
-    -- Vérifier si l'exercice existe déjà
-    SELECT id INTO exercise_id
-    FROM public.exercises
-    WHERE course_id = course_id 
-    AND MD5(LEFT(question, 200)) = question_hash
-    LIMIT 1;
-    
-    IF exercise_id IS NOT NULL THEN
-        -- Mettre à jour l'exercice existant
-        UPDATE public.exercises SET
-            title = p_title,
-            answer = p_answer,
-            explanation = p_explanation,
-            difficulty = p_difficulty,
-            type = p_type,
-            options = p_options,
-            hints = p_hints,
-            updated_at = NOW()
-        WHERE id = exercise_id;
-        
-        RETURN exercise_id;
-    ELSE
-        -- Insérer le nouvel exercice
-        INSERT INTO public.exercises (
-            id,
-            course_id,
-            title,
-            description,
-            question,
-            answer,
-            explanation,
-            difficulty,
-            points,
-            time_limit,
-            type,
-            hints,
-            options,
-            ai_generated,
-            order_num,
-            is_published
-        ) VALUES (
-            uuid_generate_v4(),
-            course_id,
-            p_title,
-            'Exercice importé automatiquement',
-            p_question,
-            p_answer,
-            p_explanation,
-            p_difficulty,
-            CASE p_difficulty 
-                WHEN 'facile' THEN 10 
-                WHEN 'moyen' THEN 15 
-                ELSE 20 
-            END,
-            300,
-            p_type,
-            p_hints,
-            p_options,
-            false,
-            p_order_num,
-            true
-        ) RETURNING id INTO exercise_id;
-        
-        RETURN exercise_id;
-    END IF;
+    RETURN v_exercise_id;
 END;
 $$ LANGUAGE plpgsql;
 
@@ -285,52 +545,34 @@ $$ LANGUAGE plpgsql;
             exercises_by_chapter[chapter_num] = []
         exercises_by_chapter[chapter_num].append(exercise)
     
-    # Générer les INSERT pour chaque chapitre
-    for chapter_num in sorted(exercises_by_chapter.keys()):
-        chapter_exercises = exercises_by_chapter[chapter_num]
-        sql += f"-- Chapitre {chapter_num} ({len(chapter_exercises)} exercices)\n"
-        
-        for i, exercise in enumerate(chapter_exercises, 1):
-            # Préparer les données
-            title = f"Exercice {exercise.get('exercise_number', i)}"
-            if exercise.get('chapter_title'):
-                title += f" - {exercise['chapter_title']}"
-            
-            question = exercise.get('body', '').replace("'", "''")
-            answer = exercise.get('answer', '').replace("'", "''")
-            explanation = exercise.get('explanation', '').replace("'", "''") if exercise.get('explanation') else 'NULL'
-            
-            difficulty = exercise.get('difficulty', 'moyen')
-            exercise_type = exercise.get('type', 'libre')
-            
-            # Options pour QCM
-            options = exercise.get('options')
-            options_json = 'NULL'
-            if options and isinstance(options, dict):
-                options_json = f"'{json.dumps(options, ensure_ascii=False).replace(chr(39), chr(39)+chr(39))}'"
+    rows_by_chapter = {
+        chapter_num: [migration_row(exercise, i) for i, exercise in enumerate(exercises_by_chapter[chapter_num], 1)]
+        for chapter_num in sorted(exercises_by_chapter.keys())
+    }
+    
+    if insert_mode == 'staging':
+        yield "BEGIN;\n\n"
+        yield from iter_staging_load(rows_by_chapter, batch_size)
+        yield "COMMIT;\n\n"
+    else:
+        # Générer les INSERT pour chaque chapitre
+        for chapter_num, rows in rows_by_chapter.items():
+            yield f"-- Chapitre {chapter_num} ({len(rows)} exercices)\n"
             
-            # Indices
-            hints = exercise.get('hints', [])
-            if not isinstance(hints, list):
-                hints = []
-            hints_json = f"'{json.dumps(hints, ensure_ascii=False).replace(chr(39), chr(39)+chr(39))}'"
+            if insert_mode == 'bulk':
+                yield from iter_bulk_upserts(chapter_num, rows, batch_size)
+                continue
             
-            sql += f"""SELECT insert_exercise_safe(
+            for row in rows:
+                arguments = ',\n    '.join(sql_literal(value) for value in row)
+                yield f"""SELECT insert_exercise_safe(
     {chapter_num},
-    '{title.replace(chr(39), chr(39)+chr(39))}',
-    '{question}',
-    '{answer}',
-    {explanation if explanation != 'NULL' else 'NULL'},
-    '{difficulty}',
-    '{exercise_type}',
-    {options_json},
-    {hints_json},
-    {i}
+    {arguments}
 );
 
 """
     
-    sql += """
+    yield """
 -- ============================================
 -- NETTOYAGE ET OPTIMISATION
 -- ============================================
@@ -394,31 +636,135 @@ ORDER BY
 -- MIGRATION TERMINÉE AVEC SUCCÈS !
 -- ============================================
 """
+
+# Schéma créé (puis annulé avec la transaction) par run_benchmark
+BENCHMARK_SCHEMA = 'mathia_benchmark'
+
+BENCHMARK_TABLES_SQL = f"""CREATE SCHEMA {BENCHMARK_SCHEMA};
+SET LOCAL search_path = {BENCHMARK_SCHEMA}, public;
+
+CREATE TABLE {BENCHMARK_SCHEMA}.courses (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    order_num INTEGER NOT NULL
+);
+INSERT INTO {BENCHMARK_SCHEMA}.courses (order_num) SELECT generate_series(1, 9);
+
+CREATE TABLE {BENCHMARK_SCHEMA}.exercises (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    course_id UUID NOT NULL REFERENCES {BENCHMARK_SCHEMA}.courses (id),
+    title TEXT NOT NULL,
+    description TEXT,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    explanation TEXT,
+    difficulty TEXT,
+    points INTEGER,
+    time_limit INTEGER,
+    type TEXT,
+    hints JSONB,
+    options JSONB,
+    ai_generated BOOLEAN,
+    order_num INTEGER,
+    is_published BOOLEAN,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+"""
+
+def run_benchmark(rows: int = 100000, batch_size: int = MULTI_ROW_SIZE):
+    """
+    Comparer les modes bulk (trigger par ligne) et staging sur `rows`
+    exercices (ceux du corpus, répétés avec un préfixe qui les rend uniques).
+    
+    Chaque mode s'exécute dans le schéma BENCHMARK_SCHEMA, créé dans une
+    transaction annulée à la fin: la base n'est pas modifiée. Nécessite
+    psycopg2 et DATABASE_URL (ou DB_CONFIG).
+    """
+    from db_connection import connect
+    
+    corpus = [(chapter_num, exercise) for _, chapter_num, exercises in iter_corpus()
+              for exercise in exercises if exercise.get('body') and exercise.get('answer')]
+    if not corpus:
+        print("❌ Aucun exercice trouvé!")
+        sys.exit(1)
     
-    return sql
+    rows_by_chapter: Dict[int, List[Tuple[Any, ...]]] = {}
+    for n, (chapter_num, exercise) in enumerate(islice(cycle(corpus), rows), 1):
+        exercise = dict(exercise, body=f"[{n}] {exercise['body']}")
+        chapter_rows = rows_by_chapter.setdefault(chapter_num, [])
+        chapter_rows.append(migration_row(exercise, len(chapter_rows) + 1))
+    rows_by_chapter = dict(sorted(rows_by_chapter.items()))
+    
+    loads = {
+        'bulk': lambda: (statement for chapter_num, chapter_rows in rows_by_chapter.items()
+                         for statement in iter_bulk_upserts(chapter_num, chapter_rows, batch_size, BENCHMARK_SCHEMA)),
+        'staging': lambda: iter_staging_load(rows_by_chapter, batch_size, BENCHMARK_SCHEMA),
+    }
+    
+    print(f"Chargement de {rows} exercices par lots de {batch_size}")
+    conn = connect(statement_timeout_ms=0)
+    try:
+        for mode, load in loads.items():
+            with conn.cursor() as cursor:
+                cursor.execute(BENCHMARK_TABLES_SQL)
+                cursor.execute(VALIDATION_TRIGGER_SQL.format(schema=BENCHMARK_SCHEMA))
+                cursor.execute(QUESTION_HASH_SQL.format(schema=BENCHMARK_SCHEMA))
+                
+                start = time.perf_counter()
+                for statement in load():
+                    cursor.execute(statement)
+                elapsed = time.perf_counter() - start
+                
+                cursor.execute(f"SELECT COUNT(*) FROM {BENCHMARK_SCHEMA}.exercises")
+                count = cursor.fetchone()[0]
+            conn.rollback()
+            print(f"   {mode:<8} {elapsed:8.2f}s  {rows / elapsed:10.0f} lignes/s  ({count} exercices en base)")
+    finally:
+        conn.rollback()
+        conn.close()
 
 def main():
     """Fonction principale"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Generer le script de migration SQL')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help='Similarite (Jaccard) a partir de laquelle deux exercices sont des doublons')
+    parser.add_argument('--duplicates-report',
+                       help='Ecrire les groupes de doublons (exercice conserve et ecartes) en JSON')
+    parser.add_argument('--insert-mode', choices=INSERT_MODES, default='bulk',
+                       help='bulk: une instruction par lot d\'exercices, '
+                            'staging: table temporaire puis une insertion validee sans trigger par ligne, '
+                            'function: un appel a insert_exercise_safe() par exercice')
+    parser.add_argument('--batch-size', type=int, default=MULTI_ROW_SIZE,
+                       help='Exercices par instruction en modes bulk et staging')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer les modes bulk et staging sur une base PostgreSQL (DATABASE_URL)')
+    parser.add_argument('--rows', type=int, default=100000,
+                       help='Nombre d\'exercices charges par le benchmark')
+    
+    args = parser.parse_args()
+    
+    if args.benchmark:
+        run_benchmark(args.rows, args.batch_size)
+        return
+    
     print('=' * 60)
     print('GÉNÉRATEUR DE MIGRATION SQL - MATHIA')
     print('=' * 60)
     print()
     
     # Charger et dédupliquer les exercices
-    exercises = load_exercises_with_deduplication()
+    exercises = load_exercises_with_deduplication(args.threshold, args.duplicates_report)
     
     if not exercises:
         print("❌ Aucun exercice trouvé!")
         sys.exit(1)
     
-    # Générer le script de migration
-    migration_sql = generate_migration_sql(exercises)
-    
-    # Sauvegarder
+    # Générer et écrire le script de migration au fil de l'eau
     output_file = "mathia_migration.sql"
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(migration_sql)
+        write_sql(output_file, iter_migration_sql(exercises, args.insert_mode, args.batch_size))
         
         print(f"[SUCCESS] Script de migration genere avec succes!")
         print(f"[FILE] Fichier cree: {output_file}")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Écriture en flux des scripts SQL générés à partir des exercices JSON
+
+Les générateurs produisent leurs instructions une à une (fonctions
+génératrices) et write_sql() les écrit au fur et à mesure dans un fichier
+bufferisé: le script complet, de plusieurs Mo, n'est jamais construit en
+mémoire, et chaque instruction n'est copiée qu'une fois.
+
+Trois formats de sortie pour les exercices:
+    insert    un INSERT par exercice (format historique)
+    multirow  des INSERT de `batch_size` lignes; l'id du cours est résolu une
+              seule fois par instruction (CTE) au lieu d'une sous-requête par ligne
+    copy      un fichier .copy (format texte de COPY, séparé par tabulations)
+              chargé par \copy dans une table temporaire, puis inséré en une
+              seule requête (nécessite psql: le SQL Editor ne gère pas \copy)
+
+Usage:
+    python scripts/sql_writer.py --benchmark
+    python scripts/sql_writer.py --benchmark --replicate 10
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Taille du tampon d'écriture (les instructions font de quelques centaines d'octets à quelques Ko)
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+OUTPUT_FORMATS = ('insert', 'multirow', 'copy')
+
+# Lignes par INSERT en mode multirow
+MULTI_ROW_SIZE = 500
+
+# Colonnes des lignes d'exercices en modes multirow et copy, après course_id
+# (id prend sa valeur par défaut, uuid_generate_v4())
+EXERCISE_COLUMNS = (
+    'title', 'description', 'question', 'answer', 'explanation', 'difficulty',
+    'points', 'time_limit', 'type', 'hints', 'options', 'ai_generated',
+    'order_num', 'is_published',
+)
+
+# Échappements du format texte de COPY
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def write_sql(output_file: str, chunks: Iterable[str],
+              buffer_size: int = WRITE_BUFFER_SIZE) -> Tuple[int, int]:
+    """
+    Écrire les morceaux de SQL produits par `chunks` dans output_file.
+
+    Retourne (nombre de morceaux, nombre de caractères écrits).
+    """
+    count = 0
+    size = 0
+    with open(output_file, 'w', encoding='utf-8', buffering=buffer_size) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            count += 1
+            size += len(chunk)
+    return count, size
+
+
+def sql_literal(value: Any) -> str:
+    """Littéral SQL: NULL, booléen, nombre ou chaîne entre apostrophes"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def iter_multirow_inserts(chapter_num: int, rows: Iterable[Sequence[Any]],
+                          batch_size: int = MULTI_ROW_SIZE) -> Iterator[str]:
+    """
+    INSERT multi-lignes des exercices d'un chapitre (lignes selon EXERCISE_COLUMNS).
+
+    La liste des colonnes n'est écrite qu'une fois par instruction, et le cours
+    est lu une seule fois dans la CTE au lieu d'une sous-requête corrélée par
+    exercice.
+    """
+    columns = ',\n    '.join(('course_id',) + EXERCISE_COLUMNS)
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, max(1, batch_size)))
+        if not batch:
+            return
+        values = ',\n'.join(
+            '    ((SELECT id FROM course), ' + ', '.join(sql_literal(value) for value in row) + ')'
+            for row in batch
+        )
+        yield (f"WITH course AS (\n"
+               f"    SELECT id FROM public.courses WHERE order_num = {chapter_num} LIMIT 1\n"
+               f")\n"
+               f"INSERT INTO public.exercises (\n    {columns}\n) VALUES\n{values};\n\n")
+
+
+def copy_field(value: Any) -> str:
+    """Champ au format texte de COPY (\\N pour NULL)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def iter_copy_rows(chapter_num: int, rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """Lignes du fichier .copy: numéro du chapitre puis EXERCISE_COLUMNS"""
+    prefix = f"{chapter_num}\t"
+    for row in rows:
+        yield prefix + '\t'.join(copy_field(value) for value in row) + '\n'
+
+
+def iter_copy_loader(copy_file: str) -> Iterator[str]:
+    """
+    Script psql qui charge copy_file dans public.exercises.
+
+    La table temporaire reprend les types des colonnes de public.exercises
+    (énumérations comprises); les id des cours sont joints une seule fois,
+    pour toutes les lignes.
+    """
+    columns = ', '.join(EXERCISE_COLUMNS)
+    selected = ', '.join(f'i.{column}' for column in EXERCISE_COLUMNS)
+    path = os.path.basename(copy_file).replace("'", "''")
+    yield f"""BEGIN;
+
+CREATE TEMP TABLE exercises_import ON COMMIT DROP AS
+SELECT 0 AS course_order, {columns}
+FROM public.exercises WITH NO DATA;
+
+\\copy exercises_import (course_order, {columns}) FROM '{path}'
+
+INSERT INTO public.exercises (course_id, {columns})
+SELECT c.id, {selected}
+FROM exercises_import i
+JOIN (
+    SELECT DISTINCT ON (order_num) order_num, id
+    FROM public.courses
+    ORDER BY order_num
+) c ON c.order_num = i.course_order;
+
+COMMIT;
+
+"""
+
+
+def copy_file_for(output_file: str) -> str:
+    """Fichier .copy associé à un script SQL (mathia.sql -> mathia.copy)"""
+    return os.path.splitext(output_file)[0] + '.copy'
+
+
+def _replicate(all_exercises: Dict[str, List[dict]], factor: int) -> Dict[str, List[dict]]:
+    """Corpus répété `factor` fois (mêmes objets, pas de copie)"""
+    return {filename: exercises * factor for filename, exercises in all_exercises.items()}
+
+
+def _measure(function) -> Tuple[float, int]:
+    """
+    Durée et pic de mémoire Python alloué pendant l'appel.
+
+    Deux exécutions: tracemalloc ralentit les allocations et fausserait la durée.
+    `function` retourne le fichier écrit, supprimé après chaque exécution
+    (réécrire par-dessus un fichier existant ajoute le coût de sa troncature).
+    """
+    start = time.perf_counter()
+    output_file = function()
+    elapsed = time.perf_counter() - start
+    os.remove(output_file)
+
+    tracemalloc.start()
+    try:
+        output_file = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    os.remove(output_file)
+    return elapsed, peak
+
+
+def run_benchmark(factors: Iterable[int] = (1, 2, 5, 10)):
+    """
+    Comparer, sur le corpus répété, la construction du script dans une chaîne
+    (`sql += instruction`, puis une seule écriture) et l'écriture en flux.
+    """
+    import tempfile
+    from generate_sql_library import iter_sql_library, load_all_exercise_files
+
+    all_exercises = load_all_exercise_files()
+    if not all_exercises:
+        print("Aucun fichier d'exercices trouve (lancer depuis la racine du projet)")
+        sys.exit(1)
+
+    base = sum(len(exercises) for exercises in all_exercises.values())
+
+    with tempfile.TemporaryDirectory(prefix='sql_writer_') as output_dir:
+        output_file = os.path.join(output_dir, 'benchmark.sql')
+
+        def build_string(corpus):
+            sql = ""
+            for chunk in iter_sql_library(corpus):
+                sql += chunk
+            with open(output_file, 'w', encoding='utf-8') as f:
+                f.write(sql)
+            return output_file
+
+        def stream(corpus):
+            write_sql(output_file, iter_sql_library(corpus))
+            return output_file
+
+        print(f"{'facteur':>8} {'exercices':>10} {'taille':>9}   {'chaine':>16}   {'flux':>16}")
+        for factor in factors:
+            corpus = _replicate(all_exercises, factor)
+            stream(corpus)
+            size = os.path.getsize(output_file)
+            os.remove(output_file)
+
+            string_time, string_peak = _measure(lambda: build_string(corpus))
+            stream_time, stream_peak = _measure(lambda: stream(corpus))
+            print(f"{factor:>8} {base * factor:>10} {size / 1e6:>7.1f}Mo   "
+                  f"{string_time:6.2f}s {string_peak / 1e6:6.1f}Mo   "
+                  f"{stream_time:6.2f}s {stream_peak / 1e6:6.1f}Mo")
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Ecriture en flux des scripts SQL generes')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer construction en memoire et ecriture en flux')
+    parser.add_argument('--replicate', type=int, default=10,
+                       help='Facteur de replication maximal du corpus')
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    factors = sorted({f for f in (1, 2, 5, args.replicate) if f <= args.replicate})
+    run_benchmark(factors)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Normalisation du texte extrait des PDFs, partagée par tous les extracteurs
+
+Les accents repliés historiquement par _clean_text et les ligatures
+typographiques (ﬁ, ﬂ, ﬀ...) sont remplacés par str.replace: sous CPython,
+str.translate avec une table non ASCII examine chaque caractère en Python et
+coûte des dizaines de fois plus cher par page (voir --benchmark). Un pattern compilé
+recolle ensuite les mots coupés après une ligature par pdfplumber
+(« diff erentes », « fi gure »), sauf après un mot qui se termine vraiment
+par une ligature (« il a suffi de »).
+
+Le remplacement des ligatures et le recollage coûtent ~12 µs par page en
+plus de l'ancien _clean_text (~16 µs contre ~4 µs): c'est le prix d'un texte
+correct, pas une optimisation.
+
+Usage:
+    python scripts/text_normalizer.py --benchmark
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import unicodedata
+from typing import Dict, List
+
+# Caractères accentués remplacés historiquement par _clean_text
+ACCENT_REPLACEMENTS = {
+    'é': 'e', 'è': 'e', 'ê': 'e', 'ë': 'e',
+    'à': 'a', 'â': 'a', 'ä': 'a',
+    'ù': 'u', 'û': 'u', 'ü': 'u',
+    'ô': 'o', 'ö': 'o',
+    'î': 'i', 'ï': 'i',
+    'ç': 'c',
+    'É': 'E', 'È': 'E', 'Ê': 'E', 'Ë': 'E',
+    'À': 'A', 'Â': 'A', 'Ä': 'A',
+    'Ù': 'U', 'Û': 'U', 'Ü': 'U',
+    'Ô': 'O', 'Ö': 'O',
+    'Î': 'I', 'Ï': 'I',
+    'Ç': 'C'
+}
+
+# Ligatures Unicode (bloc U+FB00)
+LIGATURE_REPLACEMENTS = {
+    'ﬀ': 'ff', 'ﬁ': 'fi', 'ﬂ': 'fl',
+    'ﬃ': 'ffi', 'ﬄ': 'ffl', 'ﬅ': 'st', 'ﬆ': 'st'
+}
+
+# Paires appliquées par normalize_text, construites une seule fois
+_ACCENT_PAIRS = tuple(ACCENT_REPLACEMENTS.items())
+_LIGATURE_PAIRS = tuple(LIGATURE_REPLACEMENTS.items())
+_ASCII_PAIRS = _LIGATURE_PAIRS + _ACCENT_PAIRS
+
+# Diacritiques combinants laissés par la décomposition NFKD
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+
+# « diff erentes », « fi gure », « refl echir »: espace parasite après une
+# ligature. Le motif commence par des lettres fixes (recherche rapide en C) et
+# capture le mot suivant; le début du mot est lu dans une tranche de taille fixe.
+_SPLIT_LIGATURE = re.compile(r'(ffi|ffl|ff|fi|fl) ([a-zà-ÿ]+)')
+_WORD_END = re.compile(r'[^\W\d_]*\Z')
+
+
+def _fold(word: str) -> str:
+    for old, new in _ACCENT_PAIRS:
+        word = word.replace(old, new)
+    return word
+
+
+# Mots se terminant réellement par une ligature: l'espace qui les suit est
+# conservé (« il a suffi de »). « fi » seul n'y figure pas: « fi gure » est
+# bien plus fréquent que « faire fi de ».
+_FINAL_WORDS = ('suffi', 'défi', 'wifi', 'hifi', 'off', 'bluff', 'staff', 'riff',
+                'sniff', 'skiff', 'malakoff')
+
+# Mots coupés après un mot de _FINAL_WORDS, recollés malgré tout (« défi nition »)
+_JOINED_WORDS = ('définition', 'définitions', 'définir', 'défini', 'définie', 'définis',
+                 'définies', 'définit', 'définissent', 'définitif', 'définitive',
+                 'défier', 'défie', 'défilé', 'défiler', 'suffit', 'suffire', 'suffisant',
+                 'suffisante', 'suffisants', 'suffisantes', 'suffisamment', 'suffisent',
+                 'suffise', 'offre', 'offres', 'offrir', 'offert', 'offerte', 'offerts',
+                 'offertes', 'offrent', 'office', 'officiel', 'officielle', 'officiels',
+                 'officielles', 'bluffer')
+
+_LIGATURE_FINAL_WORDS = frozenset(_FINAL_WORDS) | frozenset(_fold(w) for w in _FINAL_WORDS)
+_LIGATURE_JOINED_WORDS = frozenset(_JOINED_WORDS) | frozenset(_fold(w) for w in _JOINED_WORDS)
+_MAX_HEAD = max(len(word) for word in _LIGATURE_FINAL_WORDS)
+
+
+def _join_split_ligature(match: 're.Match') -> str:
+    ligature, tail = match.group(1), match.group(2)
+    start = match.start()
+    head = _WORD_END.search(match.string[max(0, start - _MAX_HEAD):start]).group()
+    word = (head + ligature).lower()
+    if word in _LIGATURE_FINAL_WORDS and (word + tail).lower() not in _LIGATURE_JOINED_WORDS:
+        return match.group(0)
+    return ligature + tail
+
+
+def normalize_text(text: str, fold_accents: bool = True, nfkd: bool = False) -> str:
+    """
+    Normaliser le texte d'une page.
+
+    fold_accents: remplacer les caractères accentués français par leur base ASCII.
+    nfkd: décomposer d'abord en NFKD et retirer tous les diacritiques (pas
+    seulement ceux de la table); transforme aussi ², ①... en chiffres.
+    """
+    if nfkd:
+        text = _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+
+    # Une ligature devient 2 ou 3 lettres: replace compterait alors les
+    # occurrences caractère par caractère, même absentes; `in` cherche par memchr
+    for old, new in _LIGATURE_PAIRS:
+        if old in text:
+            text = text.replace(old, new)
+
+    if fold_accents:
+        for old, new in _ACCENT_PAIRS:
+            text = text.replace(old, new)
+
+    return _SPLIT_LIGATURE.sub(_join_split_ligature, text)
+
+
+# Phrases réelles et texte attendu (accents repliés), vérifiés avec --benchmark
+SAMPLE_SENTENCES = (
+    ("Il a suffi de compter les carreaux.", "Il a suffi de compter les carreaux."),
+    ("Relever le défi de la semaine.", "Relever le defi de la semaine."),
+    ("Le bluff est interdit pendant le jeu.", "Le bluff est interdit pendant le jeu."),
+    ("Trace deux droites diff érentes sur la fi gure.", "Trace deux droites differentes sur la figure."),
+    ("Il faut refl échir avant de calculer.", "Il faut reflechir avant de calculer."),
+    ("Rappelle la défi nition d'un losange.", "Rappelle la definition d'un losange."),
+    ("Une longueur suffi sante pour tracer le cercle.", "Une longueur suffisante pour tracer le cercle."),
+    ("Les ﬁgures sont eﬀacées, puis réﬂéchies.", "Les figures sont effacees, puis reflechies."),
+)
+
+
+def check_samples() -> List[str]:
+    """Phrases de SAMPLE_SENTENCES mal normalisées (liste vide si tout est correct)"""
+    failures = []
+    for text, expected in SAMPLE_SENTENCES:
+        result = normalize_text(text)
+        if result != expected:
+            failures.append(f"{text!r} -> {result!r} (attendu {expected!r})")
+    return failures
+
+
+def _legacy_clean_text(text: str) -> str:
+    """Ancienne version de _clean_text (une passe par caractère), pour le benchmark"""
+    for old, new in ACCENT_REPLACEMENTS.items():
+        text = text.replace(old, new)
+    return text
+
+
+def _build_pages(json_path: str, page_size: int = 3000) -> List[str]:
+    """Découper le corpus en pages de taille comparable à celles du manuel"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        exercises = json.load(f)
+
+    # Le corpus est déjà sans accents: on réintroduit une phrase accentuée par page
+    accented = "Déterminer l'aire du carré, à l'unité près, et vérifier où se trouve Ç. "
+
+    pages = []
+    current: List[str] = []
+    size = 0
+    for exercise in exercises:
+        body = exercise.get('body', '')
+        current.append(accented + body)
+        size += len(accented) + len(body)
+        if size >= page_size:
+            pages.append(' '.join(current))
+            current, size = [], 0
+    if current:
+        pages.append(' '.join(current))
+    return pages
+
+
+def run_benchmark(json_path: str, rounds: int = 5) -> Dict[str, float]:
+    """Mesurer le coût par page avant / après"""
+    failures = check_samples()
+    print(f"Phrases de controle: {len(SAMPLE_SENTENCES) - len(failures)}/{len(SAMPLE_SENTENCES)} correctes")
+    for failure in failures:
+        print(f"   ECHEC {failure}")
+
+    pages = _build_pages(json_path)
+    print(f"{len(pages)} pages de test ({sum(len(p) for p in pages)} caracteres)")
+
+    timings = {}
+    translate_table = str.maketrans(dict(_ASCII_PAIRS))
+    candidates = [
+        ('ancien _clean_text', _legacy_clean_text),
+        ('str.translate (table unique)', lambda text: text.translate(translate_table)),
+        ('normalize_text', normalize_text),
+        ('normalize_text (NFKD)', lambda text: normalize_text(text, nfkd=True)),
+    ]
+    for label, function in candidates:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                function(page)
+        per_page = (time.perf_counter() - start) / (rounds * len(pages))
+        timings[label] = per_page
+        print(f"   {label:<30} {per_page * 1e6:8.1f} µs/page")
+
+    return timings
+
+
+def main():
+    """Fonction principale"""
+    import argparse
+
+    default_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'exercices_6eme.json')
+
+    parser = argparse.ArgumentParser(description='Normalisation du texte extrait des PDFs')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Comparer le cout par page avec l\'ancien _clean_text')
+    parser.add_argument('--file', default=default_file,
+                       help='Fichier JSON servant a construire les pages de test')
+    parser.add_argument('--rounds', type=int, default=5,
+                       help='Nombre de passes sur les pages de test')
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    run_benchmark(args.file, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -50,6 +50,12 @@ const Exercise = sequelize.define('Exercise', {
     type: DataTypes.JSON,
     allowNull: true,
     comment: 'Tags pour catégoriser l\'exercice'
+  },
+  contentHash: {
+    type: DataTypes.STRING(64),
+    allowNull: true,
+    field: 'content_hash',
+    comment: 'Empreinte SHA-256 du contenu normalisé (dédoublonnage des imports)'
   }
 }, {
   tableName: 'exercises',
@@ -60,6 +66,12 @@ const Exercise = sequelize.define('Exercise', {
     },
     {
       fields: ['difficulty']
+    },
+    {
+      // Index nommé comme celui de ensure_content_hash() (scripts/bulk_import.py)
+      unique: true,
+      fields: ['content_hash'],
+      name: 'exercises_content_hash_key'
     }
   ]
 });